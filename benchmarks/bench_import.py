@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measures the time to import the modules of IronPyCompiler.
+
+Every import is measured in a fresh interpreter. This benchmark also fails
+if importing :mod:`ironpycompiler.detect` loads a module which should be
+imported only when it is used.
+
+Usage::
+
+    python benchmarks/bench_import.py [--repeat N] [--runs N]
+                                      [--update-baseline]
+"""
+
+import subprocess
+import sys
+
+import benchutil
+
+#: The modules whose import time is measured.
+MODULES = ["ironpycompiler", "ironpycompiler.datatypes",
+           "ironpycompiler.detect", "ironpycompiler.compiler"]
+
+#: The modules which must not be imported by ironpycompiler.detect.
+DEFERRED = ["distutils", "subprocess", "multiprocessing", "modulefinder",
+            "shutil", "tempfile", "mmap", "json"]
+
+_MEASURE = """
+import sys, time
+sys.path.insert(0, {root!r})
+before = set(sys.modules)
+start = time.time()
+import {module}
+print time.time() - start
+print " ".join(m for m in set(sys.modules) - before
+               if sys.modules[m] is not None)
+"""
+
+
+def measure(module):
+    """Imports the module in a fresh interpreter.
+
+    Returns the time in seconds and the set of the newly imported modules.
+    """
+
+    output = subprocess.check_output(
+        [sys.executable, "-c",
+         _MEASURE.format(root=benchutil.ROOT_DIR, module=module)])
+    (seconds, imported) = output.split("\n", 1)
+    return (float(seconds), set(imported.split()))
+
+
+def main():
+    """This function will be used when this module is run as a script.
+
+    """
+
+    args = benchutil.parse_args(__doc__.splitlines()[0], repeat=10)
+
+    def run():
+        results = {}
+        for module in MODULES:
+            timings = []
+            for i in range(args.repeat):
+                (seconds, imported) = measure(module)
+                timings.append(seconds)
+            results["import " + module] = min(timings)
+            if module == "ironpycompiler.detect":
+                loaded = sorted(m for m in DEFERRED if m in imported)
+                if loaded:
+                    print "ironpycompiler.detect imports: {}".format(
+                        ", ".join(loaded))
+                    sys.exit(1)
+        return results
+
+    benchutil.report("import", benchutil.median_results(args.runs, run),
+                     args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measures how detection, analysis, and compilation scale with projects.
+
+Synthetic projects (see :mod:`synthetic`) are compiled with a stand-in
+IronPython, so this benchmark runs without IronPython. Each project size
+is measured in a fresh interpreter, so that the peak memory is that of
+the size. The benchmark reports:
+
+* ``detect``: :func:`ironpycompiler.detect.auto_detect` with an empty and
+  a warm detection cache.
+* ``analyze``: :meth:`ModuleCompiler.check_compilability` with an empty
+  and a warm import cache, and the throughput in modules per second.
+* ``compile``: :meth:`ModuleCompiler.create_asm` with an empty and a warm
+  build cache. The stand-in pyc.py sleeps for each module. The detection
+  cache is warmed beforehand, so that only the compilation is measured.
+* ``peak rss``: The peak resident set size of the interpreter analyzing
+  and compiling the project.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py [--sizes 10,100,1000,10000]
+                                        [--repeat N] [--runs N]
+                                        [--update-baseline]
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import benchutil
+import synthetic
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _add_arguments(parser):
+    """Adds the options of this benchmark.
+
+    """
+
+    parser.add_argument("--sizes", default="10,100,1000,10000",
+                        help="Comma-separated numbers of modules.")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="Depth of the packages.")
+    parser.add_argument("--fanout", type=int, default=3,
+                        help="Number of modules imported by each module.")
+    parser.add_argument("--cycles", type=float, default=0.05,
+                        help="Ratio of modules importing an earlier one.")
+    parser.add_argument("--site-packages", type=int, default=1000,
+                        help="Number of modules which are not required.")
+    parser.add_argument("--startup", type=float, default=0.2,
+                        help="Seconds taken to start the stand-in ipy.exe.")
+    parser.add_argument("--per-module", type=float, default=0.0005,
+                        help="Seconds taken to compile each module.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of processes for analysis.")
+
+
+def _best(repeat, func):
+    """Calls the function repeatedly and returns the shortest time.
+
+    """
+
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        func(i)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def _maxrss():
+    """Returns the peak resident set size of this process in KiB.
+
+    """
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # macOSではバイト単位
+        maxrss //= 1024
+    return maxrss
+
+
+def measure_detect(config):
+    """Measures the detection of the stand-in IronPython.
+
+    """
+
+    import ironpycompiler.detect as detect
+
+    def cold(i):
+        detect.invalidate_cache()
+        detect.auto_detect()
+
+    return {"detect cold (s)": _best(config["repeat"], cold),
+            "detect warm (s)": _best(config["repeat"],
+                                     lambda i: detect.auto_detect())}
+
+
+def measure_project(config):
+    """Measures the analysis and compilation of a synthetic project.
+
+    """
+
+    import ironpycompiler.compiler as compiler
+    import ironpycompiler.constants as constants
+    import ironpycompiler.detect as detect
+
+    work_dir = config["work_dir"]
+    modules = config["modules"]
+    project = synthetic.generate_project(
+        os.path.join(work_dir, "project"), modules=modules,
+        depth=config["depth"], fanout=config["fanout"],
+        cycles=int(modules * config["cycles"]),
+        site_packages=config["site_packages"])
+    out = os.path.join(work_dir, "out", "app.dll")
+    os.makedirs(os.path.dirname(out))
+
+    def new_compiler(cache_name):
+        return compiler.ModuleCompiler(
+            [project["script"]], ipy_dir=config["ipy_dir"],
+            cache_dir=os.path.join(work_dir, cache_name), jobs=config["jobs"])
+
+    def analyze_cold(i):
+        mc = new_compiler("cache-analyze{}".format(i))
+        mc.check_compilability(project["dirs"])
+        # パッケージの__init__.pyも含まれる
+        if len(mc.compilable_modules) < modules:
+            raise AssertionError("Only {} of {} modules were found.".format(
+                len(mc.compilable_modules), modules))
+
+    def analyze_warm(i):
+        new_compiler("cache-analyze0").check_compilability(project["dirs"])
+
+    def compile_asm(cache_name):
+        mc = new_compiler(cache_name)
+        mc.check_compilability(project["dirs"])
+        start = time.time()
+        mc.create_asm(out=out)
+        return time.time() - start
+
+    results = {}
+    label = "n={:>5}".format(modules)
+    results["analyze cold {} (s)".format(label)] = _best(config["repeat"],
+                                                         analyze_cold)
+    results["analyze warm {} (s)".format(label)] = _best(config["repeat"],
+                                                         analyze_warm)
+    # 最初の計測に検出の時間が含まれないよう、検出キャッシュを温める
+    detect.validate_pythonexe(os.path.join(config["ipy_dir"],
+                                           constants.EXECUTABLE))
+    results["compile cold {} (s)".format(label)] = min(
+        compile_asm("cache-compile{}".format(i))
+        for i in range(config["repeat"]))
+    results["compile warm {} (s)".format(label)] = min(
+        compile_asm("cache-compile0") for i in range(config["repeat"]))
+    if resource is not None:
+        results["peak rss {} (KiB)".format(label)] = _maxrss()
+    return results
+
+
+def run_child(config):
+    """Runs a measurement in a fresh interpreter.
+
+    """
+
+    env = dict(os.environ)
+    # スタンドインのIronPythonだけが検出されるようにする
+    env["PATH"] = config["ipy_dir"]
+    env["IRONPYCOMPILER_CACHE_DIR"] = os.path.join(config["work_dir"],
+                                                   "detection")
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--child",
+         json.dumps(config)], env=env)
+    return json.loads(output)
+
+
+def main():
+    """This function will be used when this module is run as a script.
+
+    """
+
+    if sys.argv[1:2] == ["--child"]:
+        config = json.loads(sys.argv[2])
+        if config["modules"] is None:
+            results = measure_detect(config)
+        else:
+            results = measure_project(config)
+        print json.dumps(results)
+        return
+
+    args = benchutil.parse_args(__doc__.splitlines()[0], repeat=3,
+                                add_arguments=_add_arguments)
+    base_dir = tempfile.mkdtemp(prefix="ipc-bench-")
+    try:
+        ipy_dir = os.path.join(base_dir, "ipy")
+        synthetic.write_standin(ipy_dir, startup=args.startup,
+                                per_module=args.per_module)
+        sizes = [None] + [int(s) for s in args.sizes.split(",")]
+
+        def run():
+            results = {}
+            for modules in sizes:
+                work_dir = os.path.join(base_dir, "n{}".format(modules))
+                os.makedirs(work_dir)
+                config = {"modules": modules, "work_dir": work_dir,
+                          "ipy_dir": ipy_dir, "repeat": args.repeat,
+                          "depth": args.depth, "fanout": args.fanout,
+                          "cycles": args.cycles,
+                          "site_packages": args.site_packages,
+                          "jobs": args.jobs}
+                results.update(run_child(config))
+                shutil.rmtree(work_dir)
+            return results
+
+        results = benchutil.median_results(args.runs, run)
+    finally:
+        shutil.rmtree(base_dir)
+    info = {}
+    for (key, seconds) in results.items():
+        if key.startswith("analyze") and seconds > 0:
+            modules = int(key.split("n=")[1].split()[0])
+            info[key.replace("(s)", "(modules/s)")] = modules / seconds
+    benchutil.report("pipeline", results, args, info)
+
+if __name__ == "__main__":
+    main()
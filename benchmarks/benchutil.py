@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Utilities shared by the benchmarks of IronPyCompiler.
+
+Each benchmark measures some values, like timings in seconds or memory
+in KiB, and compares them with the baseline stored in
+``baselines/<name>.json``. A value larger than the baseline multiplied by
+the tolerance, and by more than the minimum difference, is reported as a
+regression. To reduce the noise, a benchmark can be run several times, and
+the median of each value is used; the baseline is updated from 5 runs by
+default.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+#: The directory containing this script.
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#: The root directory of the repository.
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# ベンチマークは作業ツリーのironpycompilerを使う
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def baseline_path(name):
+    """Returns the path to the baseline of the benchmark.
+
+    """
+
+    return os.path.join(BENCH_DIR, "baselines", name + ".json")
+
+
+def load_baseline(name):
+    """Loads the baseline, or returns None if it does not exist.
+
+    """
+
+    try:
+        with open(baseline_path(name)) as f:
+            return json.load(f)
+    except IOError:
+        return None
+
+
+def save_baseline(name, results):
+    """Saves the results as the new baseline.
+
+    The values which were not measured this time, e.g. those of the sizes
+    not selected by ``--sizes``, are kept.
+    """
+
+    baseline = load_baseline(name) or {}
+    baseline.update((k, round(v, 6)) for (k, v) in results.items())
+    with open(baseline_path(name), "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True,
+                  separators=(",", ": "))
+        f.write("\n")
+
+
+def parse_args(description, repeat=5, add_arguments=None):
+    """Parses the options common to the benchmarks.
+
+    :param add_arguments: (optional) A function called with the parser to
+                          add the options of the benchmark.
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-r", "--repeat", type=int, default=repeat,
+                        help="Number of measurements; the best is used.")
+    parser.add_argument("-t", "--tolerance", type=float, default=1.5,
+                        help="Allowed ratio to the baseline.")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="Differences in seconds ignored as noise.")
+    parser.add_argument("--runs", type=int, default=None,
+                        help="Number of runs; the median is used. "
+                             "Defaults to 5 with --update-baseline, or 1.")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Save the results as the new baseline.")
+    if add_arguments is not None:
+        add_arguments(parser)
+    args = parser.parse_args()
+    if args.runs is None:
+        args.runs = 5 if args.update_baseline else 1
+    return args
+
+
+def median_results(runs, measure):
+    """Calls the function repeatedly and returns the median of each value.
+
+    :param int runs: The number of the calls.
+    :param measure: A function returning a dictionary of the values.
+    """
+
+    all_results = [measure() for i in range(runs)]
+    results = {}
+    for key in all_results[0]:
+        values = sorted(r[key] for r in all_results)
+        middle = len(values) // 2
+        if len(values) % 2:
+            results[key] = values[middle]
+        else:
+            results[key] = (values[middle - 1] + values[middle]) / 2.0
+    return results
+
+
+def report(name, results, args, info=None):
+    """Prints the results, compares them with the baseline, and exits.
+
+    The exit status is 1 if any value regressed.
+
+    :param dict info: (optional) Values which are printed, but neither
+                      compared nor saved, like throughputs.
+    """
+
+    baseline = load_baseline(name)
+    regressions = []
+    print "{:<40} {:>12} {:>12}".format("benchmark", "value", "baseline")
+    for key in sorted(results):
+        base = baseline.get(key) if baseline is not None else None
+        mark = ""
+        if base is not None and results[key] > base * args.tolerance and \
+           results[key] - base > args.min_delta:
+            regressions.append(key)
+            mark = "  REGRESSION"
+        print "{:<40} {:>12.6f} {:>12}{}".format(
+            key, results[key],
+            "{:.6f}".format(base) if base is not None else "-", mark)
+    for key in sorted(info or {}):
+        print "{:<40} {:>12.1f}".format(key, info[key])
+
+    if args.update_baseline:
+        save_baseline(name, results)
+        print "Saved the baseline: {}".format(baseline_path(name))
+    elif regressions:
+        print "{} benchmark(s) regressed by more than {}x.".format(
+            len(regressions), args.tolerance)
+        sys.exit(1)
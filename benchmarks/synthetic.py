@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Generates synthetic projects and a stand-in IronPython for benchmarks.
+
+A project consists of:
+
+* ``app/main.py``: The main script importing the root module.
+* ``lib/synth``: The modules required by the script. Module ``i`` imports
+  modules ``fanout * i + 1`` to ``fanout * i + fanout``, so that all the
+  modules are reachable, and ``cycles`` modules also import an earlier
+  module. The modules are put in chains of nested packages whose depth is
+  ``depth``.
+* ``site-packages``: Modules which are not required, but are in the
+  directories searched for modules.
+* ``ipy``: The stand-in IronPython (see :func:`write_standin`).
+"""
+
+import os
+import random
+import sys
+
+#: The number of the modules in each package.
+MODULES_PER_PACKAGE = 20
+
+_STANDIN_IPY = r'''#!{python}
+# Stand-in ipy.exe: simulates the startup latency of IronPython, and runs a
+# script like the real one.
+import sys, time
+time.sleep({startup!r})
+if sys.argv[1] == "-c":
+    print "{version}"
+    sys.exit(0)
+sys.argv = sys.argv[1:]
+execfile(sys.argv[0], {{"__name__": "__main__", "__file__": sys.argv[0]}})
+'''
+
+_STANDIN_PYC = r'''# Stand-in pyc.py: writes the arguments into the output
+# assembly, and sleeps for each input file to simulate the compile cost.
+import sys, time
+args = []
+for arg in sys.argv[1:]:
+    if arg.startswith("@"):
+        args += [l for l in open(arg[1:]).read().split("\n") if l]
+    else:
+        args.append(arg)
+out = [a[5:] for a in args if a.startswith("/out:")][0]
+target = ([a[8:] for a in args if a.startswith("/target:")] or ["dll"])[0]
+inputs = [a for a in args if a.endswith(".py")]
+time.sleep({per_module!r} * len(inputs))
+with open(out + (".dll" if target == "dll" else ".exe"), "w") as f:
+    f.write("\n".join(args))
+print "Compiled {{}} files.".format(len(inputs))
+'''
+
+
+def write_standin(ipy_dir, startup=0.2, per_module=0.0005, version="2.7.5"):
+    """Writes the stand-in ``ipy.exe`` and ``Tools/Scripts/pyc.py``.
+
+    :param str ipy_dir: The directory of the stand-in.
+    :param float startup: Seconds slept by every run of ``ipy.exe``.
+    :param float per_module: Seconds slept by pyc.py for each input file.
+    :param str version: The version printed by ``ipy.exe``.
+    :return: The path to ``ipy.exe``.
+    """
+
+    scripts_dir = os.path.join(ipy_dir, "Tools", "Scripts")
+    if not os.path.isdir(scripts_dir):
+        os.makedirs(scripts_dir)
+    if not os.path.isdir(os.path.join(ipy_dir, "Lib")):
+        os.makedirs(os.path.join(ipy_dir, "Lib"))
+    ipy_exe = os.path.join(ipy_dir, "ipy.exe")
+    with open(ipy_exe, "w") as f:
+        f.write(_STANDIN_IPY.format(python=sys.executable, startup=startup,
+                                    version=version))
+    os.chmod(ipy_exe, 0o755)
+    with open(os.path.join(scripts_dir, "pyc.py"), "w") as f:
+        f.write(_STANDIN_PYC.format(per_module=per_module))
+    return ipy_exe
+
+
+def _module_name(index, depth):
+    """Returns the dotted name of the module.
+
+    """
+
+    group = index // MODULES_PER_PACKAGE
+    packages = ["synth"] + ["l{}_{}".format(level, group)
+                            for level in range(depth)]
+    return ".".join(packages + ["m{}".format(index)])
+
+
+def _write_module(root, name, imports):
+    """Writes a module and the packages containing it.
+
+    """
+
+    parts = name.split(".")
+    directory = root
+    for package in parts[:-1]:
+        directory = os.path.join(directory, package)
+        init = os.path.join(directory, "__init__.py")
+        if not os.path.isfile(init):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(init, "w") as f:
+                f.write("")
+    with open(os.path.join(directory, parts[-1] + ".py"), "w") as f:
+        f.write('"""Synthetic module {}."""\n\n'.format(name))
+        for imported in imports:
+            f.write("import {}\n".format(imported))
+        f.write("\n\ndef work(n):\n    return sum(range(n))\n")
+
+
+def generate_project(root, modules=100, depth=2, fanout=3, cycles=0,
+                     site_packages=100, seed=0):
+    """Generates a synthetic project.
+
+    :param str root: The directory of the project.
+    :param int modules: The number of the modules required by the script.
+    :param int depth: The depth of the packages containing the modules.
+    :param int fanout: The number of the modules imported by each module.
+    :param int cycles: The number of the modules importing an earlier one.
+    :param int site_packages: The number of the modules which are not
+                              required.
+    :param int seed: The seed of the random choices.
+    :return: A dictionary containing the path to the main script
+             (``"script"``) and the directories of the modules
+             (``"dirs"``).
+    """
+
+    rng = random.Random(seed)
+    lib_dir = os.path.join(root, "lib")
+    site_dir = os.path.join(root, "site-packages")
+    app_dir = os.path.join(root, "app")
+    for d in (lib_dir, site_dir, app_dir):
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    names = [_module_name(i, depth) for i in range(modules)]
+    back_edges = {}
+    for i in rng.sample(range(1, modules), min(cycles, max(modules - 1, 0))):
+        back_edges[i] = rng.randrange(i)
+    for i in range(modules):
+        children = range(fanout * i + 1, min(fanout * i + fanout + 1, modules))
+        imports = [names[j] for j in children]
+        if i in back_edges:
+            imports.append(names[back_edges[i]])
+        _write_module(lib_dir, names[i], imports)
+
+    for i in range(site_packages):
+        if i % MODULES_PER_PACKAGE == 0:
+            package = "site{}".format(i // MODULES_PER_PACKAGE)
+        _write_module(site_dir, "{}.s{}".format(package, i), [])
+
+    script = os.path.join(app_dir, "main.py")
+    with open(script, "w") as f:
+        if modules:
+            f.write("import {}\n".format(names[0]))
+        f.write("print 'Hello'\n")
+    return {"script": script, "dirs": [lib_dir, site_dir]}
@@ -0,0 +1,877 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for finding the modules required by IronPython scripts.
+
+The imports of each source file are extracted by a scanner. Two scanners are
+available:
+
+* ``"bytecode"`` (:class:`BytecodeScanner`) compiles the source and scans the
+  bytecode, as :class:`modulefinder.ModuleFinder` does.
+* ``"source"`` (:class:`SourceScanner`) reads the import statements directly
+  from the source, without compiling it.
+
+.. versionadded:: 1.0.0
+"""
+
+import imp
+import os
+import stat
+import sys
+import modulefinder
+import multiprocessing
+import re
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Original modules
+from . import cache
+
+
+class ImportScanner(object):
+
+    """The base class for scanners, which extract the imports of source files.
+
+    A scanner returns a list of the imports in the same form as the values
+    generated by :meth:`modulefinder.ModuleFinder.scan_opcodes_25`.
+
+    .. versionadded:: 1.0.0
+    """
+
+    #: The name of the scanner, which distinguishes cache entries.
+    name = None
+
+    def scan(self, source, pathname):
+        """Extracts the imports from source code.
+
+        :param str source: The source code.
+        :param str pathname: The path to the source file.
+        :return: The list of the imports.
+        :rtype: list
+        """
+
+        raise NotImplementedError
+
+
+class BytecodeScanner(ImportScanner):
+
+    """Extracts the imports by compiling the source and scanning the bytecode.
+
+    The result is exactly the same as that of
+    :class:`modulefinder.ModuleFinder`.
+
+    .. versionadded:: 1.0.0
+    """
+
+    name = "bytecode"
+
+    def __init__(self):
+        """Initialization.
+
+        """
+
+        self._finder = modulefinder.ModuleFinder()
+
+    def scan(self, source, pathname):
+        co = compile(source + "\n", pathname, "exec")
+        imports = []
+        self._collect_imports(co, imports)
+        return imports
+
+    def _collect_imports(self, co, imports):
+        """Appends the imports of a code object to the list recursively.
+
+        The order is the same as that of
+        :meth:`modulefinder.ModuleFinder.scan_code`.
+        """
+
+        imports.extend(self._finder.scan_opcodes_25(co))
+        for c in co.co_consts:
+            if isinstance(c, type(co)):
+                self._collect_imports(c, imports)
+
+
+# 文字列、コメント、importとfromのキーワードにマッチする
+# 文字列の接頭辞は字句解析に影響しないので無視する
+_TOKEN_RE = re.compile(
+    r"(?:'{3}[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'{3}"
+    r'|"{3}[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"{3}'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*")'
+    r"|#[^\n]*"
+    r"|\b(?P<keyword>import|from)\b", re.DOTALL)
+
+# コンパイラが取り除く、条件が偽の定数であるifとwhile
+_DEAD_RE = re.compile(
+    r"^(?P<indent>[ \t]*)(?:if|elif|while)[ \t]+"
+    r"(?:0+(?:\.0*)?[lLjJ]?|0[xX]0+[lL]?|''|\"\")[ \t]*:(?P<rest>[^\n]*)",
+    re.MULTILINE)
+
+# 空白、行継続、および括弧の中では改行とコメントにマッチする
+_WS = r"(?:[ \t\f]|\\\r?\n)*"
+_PAREN_WS = r"(?:\s|\\\r?\n|#[^\n]*)*"
+_NAME = r"[A-Za-z_]\w*"
+_DOTTED = _NAME + r"(?:" + _WS + r"\." + _WS + _NAME + r")*"
+
+_IMPORT_RE = re.compile(
+    r"import" + _WS + r"(?P<names>" + _DOTTED +
+    r"(?:" + _WS + r"as" + _WS + _NAME + r")?" +
+    r"(?:" + _WS + r"," + _WS + _DOTTED +
+    r"(?:" + _WS + r"as" + _WS + _NAME + r")?)*)")
+
+_FROM_RE = re.compile(
+    r"from" + _WS + r"(?P<dots>(?:\." + _WS + r")*)" +
+    r"(?P<module>" + _DOTTED + r")?" + _WS + r"import" + _WS +
+    r"(?:(?P<star>\*)"
+    r"|\(" + _PAREN_WS + r"(?P<pnames>[^)]*)\)"
+    r"|(?P<names>" + _NAME + r"(?:" + _WS + r"as" + _WS + _NAME + r")?" +
+    r"(?:" + _WS + r"," + _WS + _NAME +
+    r"(?:" + _WS + r"as" + _WS + _NAME + r")?)*))")
+
+_SPACE_RE = re.compile(r"(?:\s|\\\r?\n|#[^\n]*)+")
+
+
+def _split_names(names):
+    """Splits a list of names, like 'a.b as c, d', into the original names.
+
+    """
+
+    result = []
+    for item in names.split(","):
+        item = _SPACE_RE.sub(" ", item).strip()
+        if item:
+            result.append(item.split(" as ")[0].replace(" ", ""))
+    return result
+
+
+class SourceScanner(ImportScanner):
+
+    """Extracts the imports by reading the import statements in the source.
+
+    This scanner neither parses the whole source nor compiles it, so it is
+    much faster than :class:`BytecodeScanner` and works for source which
+    CPython cannot compile. String literals, comments, and blocks which the
+    compiler removes, such as ``if 0:``, are skipped. Unlike
+    :class:`BytecodeScanner`, this scanner does not report the names stored
+    in modules.
+
+    .. versionadded:: 1.0.0
+    """
+
+    name = "source"
+
+    def scan(self, source, pathname):
+        if "import" not in source:
+            return []
+
+        dead_blocks = self._find_dead_blocks(source)
+        statements = []
+        absolute = False
+        end = 0
+        for token in _TOKEN_RE.finditer(source):
+            keyword = token.group("keyword")
+            if keyword is None or token.start() < end:
+                continue
+            if dead_blocks and _in_blocks(dead_blocks, token.start()):
+                continue
+            if keyword == "import":
+                m = _IMPORT_RE.match(source, token.start())
+                if m is None:
+                    continue
+                for name in _split_names(m.group("names")):
+                    statements.append((0, None, name))
+            else:
+                m = _FROM_RE.match(source, token.start())
+                if m is None:
+                    continue
+                level = m.group("dots").count(".")
+                module = _SPACE_RE.sub("", m.group("module") or "")
+                if m.group("star"):
+                    fromlist = ("*",)
+                else:
+                    fromlist = tuple(_split_names(m.group("pnames") or
+                                                  m.group("names")))
+                if module == "__future__" and "absolute_import" in fromlist:
+                    absolute = True
+                statements.append((level, fromlist, module))
+            end = m.end()
+
+        imports = []
+        for (level, fromlist, name) in statements:
+            if level > 0:
+                imports.append(("relative_import", (level, fromlist, name)))
+            elif absolute:
+                imports.append(("absolute_import", (fromlist, name)))
+            else:
+                imports.append(("import", (fromlist, name)))
+        return imports
+
+    def _find_dead_blocks(self, source):
+        """Returns the ranges of the blocks like ``if 0:``.
+
+        The compiler does not generate any code for these blocks, so the
+        imports in them must be ignored.
+        """
+
+        blocks = []
+        for header in _DEAD_RE.finditer(source):
+            if _in_literal(source, header.start()):
+                continue
+            rest = header.group("rest").split("#")[0].strip()
+            if rest:
+                # 単純文が同じ行にある
+                blocks.append((header.start(), header.end()))
+                continue
+            indent = len(header.group("indent").expandtabs())
+            pos = block_end = header.end() + 1
+            for line in source[pos:].splitlines(True):
+                stripped = line.strip()
+                if stripped and not stripped.startswith("#"):
+                    line_indent = len(line) - len(line.lstrip(" \t\f"))
+                    if len(line[:line_indent].expandtabs()) <= indent:
+                        break
+                    block_end = pos + len(line)
+                pos += len(line)
+            blocks.append((header.start(), block_end))
+        return blocks
+
+
+def _in_blocks(blocks, pos):
+    """Checks whether the position is in one of the ranges.
+
+    """
+
+    for (start, end) in blocks:
+        if start <= pos < end:
+            return True
+    return False
+
+
+def _in_literal(source, pos):
+    """Checks whether the position is in a string literal or a comment.
+
+    """
+
+    for token in _TOKEN_RE.finditer(source):
+        if token.end() > pos:
+            return token.start() < pos and token.group("keyword") is None
+    return False
+
+
+#: The available scanners.
+SCANNERS = {BytecodeScanner.name: BytecodeScanner,
+            SourceScanner.name: SourceScanner}
+
+
+def get_scanner(analyzer):
+    """Returns a scanner.
+
+    :param analyzer: The name of the scanner (``"bytecode"`` or
+                     ``"source"``), or an instance of
+                     :class:`ImportScanner`.
+    :rtype: :class:`ImportScanner`
+
+    .. versionadded:: 1.0.0
+    """
+
+    if isinstance(analyzer, ImportScanner):
+        return analyzer
+    try:
+        return SCANNERS[analyzer]()
+    except KeyError:
+        raise ValueError("Unknown analyzer: {}".format(analyzer))
+
+
+class ModuleIndex(object):
+
+    """Finds modules using an index of the files in each directory.
+
+    :func:`imp.find_module` checks the existence of a package, a source
+    file, an extension module, and so on one by one for every directory,
+    which is slow especially on network drives. Instead this class lists each
+    directory once and looks up the names of modules in the listing.
+
+    If ``index_path`` is specified, the listings are saved into the file with
+    the modification times of the directories and their subdirectories, and
+    a directory is listed again only if it or one of its subdirectories
+    has been modified, because adding or removing ``__init__.py`` modifies
+    only the subdirectory.
+
+    :param str index_path: (optional) The path to the file where the index
+                           is saved.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, index_path=None):
+        """Initialization.
+
+        """
+
+        #: The path to the file where the index is saved, or None.
+        self.index_path = index_path
+        # ディレクトリ -> (mtime, ファイル名, パッケージ名, サブディレクトリのmtime)
+        self._saved = {}
+        self._checked = {}  # 今回確認したディレクトリ
+        self._dirty = False
+        if index_path is not None and os.path.isfile(index_path):
+            try:
+                with open(index_path, "rb") as f:
+                    self._saved = pickle.load(f)
+            except Exception:
+                self._saved = {}
+
+    def _listing(self, entry):
+        """Returns the sets of the files and the packages in the directory.
+
+        None will be returned if the entry is not a directory.
+        """
+
+        try:
+            return self._checked[entry]
+        except KeyError:
+            pass
+
+        directory = os.path.abspath(entry)
+        try:
+            st = os.stat(directory)
+        except EnvironmentError:
+            listing = (frozenset(), frozenset())
+        else:
+            if not stat.S_ISDIR(st.st_mode):
+                listing = None
+            else:
+                saved = self._saved.get(directory)
+                if saved is not None and len(saved) == 4 and \
+                   saved[0] == st.st_mtime and \
+                   _mtimes(directory, saved[3]) == saved[3]:
+                    listing = saved[1:3]
+                else:
+                    (files, packages, subdirs) = \
+                        self._list_directory(directory)
+                    listing = (files, packages)
+                    self._saved[directory] = (st.st_mtime, files, packages,
+                                              subdirs)
+                    self._dirty = True
+        self._checked[entry] = listing
+        return listing
+
+    def _list_directory(self, directory):
+        """Lists the files, the packages, and the other subdirectories.
+
+        The subdirectories which may be packages are returned as a
+        dictionary mapping their names to their modification times.
+        """
+
+        suffixes = tuple(s[0] for s in imp.get_suffixes())
+        files = set()
+        packages = set()
+        subdirs = {}
+        for name in os.listdir(directory):
+            if name.endswith(suffixes):
+                files.add(name)
+            elif "." not in name:
+                pkg_dir = os.path.join(directory, name)
+                try:
+                    st = os.stat(pkg_dir)
+                except EnvironmentError:
+                    continue
+                if not stat.S_ISDIR(st.st_mode):
+                    continue
+                subdirs[name] = st.st_mtime
+                # modulefinderと同じく、コンパイル済みの__init__も認める
+                if any(os.path.isfile(os.path.join(pkg_dir, "__init__" + s))
+                       for s in (".py", ".pyc", ".pyo")):
+                    packages.add(name)
+        return (frozenset(files), frozenset(packages), subdirs)
+
+    def find_module(self, name, path):
+        """Finds a module in the same way as :func:`imp.find_module`.
+
+        Entries of ``path`` which are not directories, like zip files, are
+        searched for using :func:`imp.find_module`.
+
+        :param str name: The name of the module.
+        :param list path: The directories where the module is searched for.
+        :return: The same tuple as that of :func:`imp.find_module`.
+        :rtype: tuple
+        :raises ImportError: if the module cannot be found
+        """
+
+        for entry in path:
+            if not isinstance(entry, basestring):
+                continue
+            listing = self._listing(entry)
+            if listing is None:
+                try:
+                    return imp.find_module(name, [entry])
+                except ImportError:
+                    continue
+            (files, packages) = listing
+            if name in packages:
+                return (None, os.path.join(entry, name),
+                        ("", "", imp.PKG_DIRECTORY))
+            for (suffix, mode, type_) in imp.get_suffixes():
+                if name + suffix in files:
+                    pathname = os.path.join(entry, name + suffix)
+                    return (open(pathname, mode), pathname,
+                            (suffix, mode, type_))
+        raise ImportError("No module named " + name)
+
+    def refresh(self):
+        """Forgets the directories checked so far.
+
+        The listings are cached while the index is used, so a module added
+        later is not found until this method is called. The directories
+        are listed again only if they have been modified.
+
+        """
+
+        self._checked = {}
+
+    def save(self):
+        """Saves the index if ``index_path`` is specified.
+
+        """
+
+        if self.index_path is None or not self._dirty:
+            return
+        index_dir = os.path.dirname(self.index_path)
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+        cache.atomic_write(self.index_path, pickle.dumps(self._saved, 2))
+        self._dirty = False
+
+
+def _mtimes(directory, names):
+    """Returns the modification times of the subdirectories.
+
+    """
+
+    mtimes = {}
+    for name in names:
+        try:
+            mtimes[name] = os.stat(os.path.join(directory, name)).st_mtime
+        except EnvironmentError:
+            pass
+    return mtimes
+
+
+_worker_scanner = None  # ワーカープロセスで使うスキャナー
+
+
+def _init_worker(scanner):
+    """Initializes a worker process of :class:`DependencyFinder`.
+
+    """
+
+    global _worker_scanner
+    _worker_scanner = scanner
+
+
+def _scan_file(pathname, scanner=None):
+    """Reads a source file and extracts its imports.
+
+    """
+
+    if scanner is None:
+        scanner = _worker_scanner
+    with open(pathname, "U") as fp:
+        return scanner.scan(fp.read(), pathname)
+
+
+class DependencyFinder(modulefinder.ModuleFinder):
+
+    """Finds the modules required by scripts, recording the imports of files.
+
+    This class works like :class:`modulefinder.ModuleFinder`, but the import
+    statements of each source file are first extracted into a list, so that
+    they can be stored in an :class:`ironpycompiler.cache.ImportCache`. If a
+    valid entry exists, the file is neither compiled nor scanned again.
+
+    The modules are searched for breadth-first: the source files found at
+    each step are scanned together, in parallel if ``jobs`` is more than 1,
+    and then their imports are processed in the order in which the files
+    were found. Therefore the result does not depend on ``jobs``.
+
+    :param list path: (optional) The directories where modules are searched
+                      for.
+    :param import_cache: (optional) The cache of the imports.
+    :type import_cache: :class:`ironpycompiler.cache.ImportCache`
+    :param analyzer: (optional) The scanner, which can be specified in the
+                     same way as :func:`get_scanner`.
+    :param int jobs: (optional) The number of the worker processes scanning
+                     source files.
+    :param module_index: (optional) The index used for finding modules.
+    :type module_index: :class:`ModuleIndex`
+    :param callback: (optional) A function called with the list of the
+                     paths to the source files found at each step, before
+                     they are scanned. The files are never removed from the
+                     result.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, path=None, import_cache=None, analyzer="bytecode",
+                 jobs=1, module_index=None, callback=None, **kwargs):
+        """Initialization.
+
+        """
+
+        modulefinder.ModuleFinder.__init__(self, path=path, **kwargs)
+        #: The cache of the imports, or None.
+        self.import_cache = import_cache
+        #: The scanner extracting the imports of source files.
+        self.scanner = get_scanner(analyzer)
+        #: The number of the worker processes.
+        self.jobs = jobs
+        #: The index used for finding modules, or None.
+        self.module_index = module_index
+        #: The function called with the source files found at each step,
+        #: or None.
+        self.callback = callback
+        self._pending = []  # 走査を待っている(モジュール, パス)
+        self._pool = None
+
+    def run_script(self, pathname):
+        """Finds the modules required by the script.
+
+        """
+
+        modulefinder.ModuleFinder.run_script(self, pathname)
+        self.process_pending()
+
+    def find_module(self, name, path, parent=None):
+        """Finds a module, using :attr:`module_index` if available.
+
+        """
+
+        if self.module_index is None:
+            return modulefinder.ModuleFinder.find_module(self, name, path,
+                                                         parent)
+
+        if parent is not None:
+            fullname = parent.__name__ + "." + name
+        else:
+            fullname = name
+        if fullname in self.excludes:
+            raise ImportError(name)
+
+        if path is None:
+            if name in sys.builtin_module_names:
+                return (None, None, ("", "", imp.C_BUILTIN))
+            path = self.path
+        return self.module_index.find_module(name, path)
+
+    def load_module(self, fqname, fp, pathname, file_info):
+        """Loads a module, deferring scanning source files.
+
+        """
+
+        if file_info[2] != imp.PY_SOURCE:
+            return modulefinder.ModuleFinder.load_module(
+                self, fqname, fp, pathname, file_info)
+
+        m = self.add_module(fqname)
+        m.__file__ = pathname
+        self._pending.append((m, pathname))
+        return m
+
+    def process_pending(self):
+        """Scans the loaded source files until no new module is found.
+
+        As with :class:`modulefinder.ModuleFinder`, if an import of a module
+        cannot be resolved at all, like a relative import beyond the
+        top-level package, the rest of its imports are ignored and the
+        module is recorded in :attr:`badmodules`.
+        """
+
+        while self._pending:
+            (batch, self._pending) = (self._pending, [])
+            if self.callback is not None:
+                self.callback([p for (m, p) in batch])
+            all_imports = self.get_imports([p for (m, p) in batch])
+            for ((m, pathname), imports) in zip(batch, all_imports):
+                try:
+                    self.scan_imports(imports, m)
+                except ImportError as e:
+                    self.msg(2, "ImportError:", str(e))
+                    self._add_badmodule(m.__name__, None)
+
+    def get_imports(self, pathnames):
+        """Returns the imports of source files.
+
+        :param list pathnames: The paths to the source files.
+        :return: The lists of the imports, in the same form as the values
+                 generated by :meth:`modulefinder.ModuleFinder.scan_opcodes_25`.
+        :rtype: list
+        """
+
+        all_imports = [None] * len(pathnames)
+        if self.import_cache is not None:
+            for (i, pathname) in enumerate(pathnames):
+                all_imports[i] = self.import_cache.get(pathname,
+                                                       self.scanner.name)
+
+        misses = [i for (i, imports) in enumerate(all_imports)
+                  if imports is None]
+        paths_to_scan = [pathnames[i] for i in misses]
+        if self.jobs > 1 and len(paths_to_scan) > 1:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    processes=self.jobs, initializer=_init_worker,
+                    initargs=(self.scanner,))
+            chunksize = max(1, len(paths_to_scan) // (self.jobs * 4))
+            scanned = self._pool.map(_scan_file, paths_to_scan, chunksize)
+        else:
+            scanned = [_scan_file(p, self.scanner) for p in paths_to_scan]
+
+        for (i, imports) in zip(misses, scanned):
+            all_imports[i] = imports
+            if self.import_cache is not None:
+                self.import_cache.set(pathnames[i], imports,
+                                      self.scanner.name)
+        return all_imports
+
+    def close(self):
+        """Terminates the worker processes.
+
+        """
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def scan_imports(self, imports, m):
+        """Processes the imports of a module.
+
+        This method does the same thing as
+        :meth:`modulefinder.ModuleFinder.scan_code` with the list of the
+        imports instead of a code object.
+
+        :param list imports: The imports of the module.
+        :param m: The module.
+        :type m: :class:`modulefinder.Module`
+        """
+
+        for what, args in imports:
+            if what == "store":
+                name, = args
+                m.globalnames[name] = 1
+            elif what in ("import", "absolute_import"):
+                fromlist, name = args
+                have_star = False
+                if fromlist is not None:
+                    if "*" in fromlist:
+                        have_star = True
+                    fromlist = [f for f in fromlist if f != "*"]
+                if what == "absolute_import":
+                    level = 0
+                else:
+                    level = -1
+                self._safe_import_hook(name, m, fromlist, level=level)
+                if have_star:
+                    mm = None
+                    if m.__path__:
+                        mm = self.modules.get(m.__name__ + "." + name)
+                    if mm is None:
+                        mm = self.modules.get(name)
+                    if mm is not None:
+                        m.globalnames.update(mm.globalnames)
+                        m.starimports.update(mm.starimports)
+                    else:
+                        m.starimports[name] = 1
+            elif what == "relative_import":
+                level, fromlist, name = args
+                if name:
+                    self._safe_import_hook(name, m, fromlist, level=level)
+                else:
+                    parent = self.determine_parent(m, level=level)
+                    self._safe_import_hook(parent.__name__, None, fromlist,
+                                           level=0)
+            else:
+                raise RuntimeError(what)
+
+
+def _source_state(paths):
+    """Returns the sizes and modification times of the files.
+
+    """
+
+    state = []
+    for path in sorted(set(paths)):
+        try:
+            st = os.stat(path)
+        except EnvironmentError:
+            state.append((path, None, None))
+        else:
+            state.append((path, st.st_size, st.st_mtime))
+    return tuple(state)
+
+
+class AnalysisResult(object):
+
+    """Immutable result of analyzing scripts.
+
+    An instance is created by
+    :meth:`ironpycompiler.compiler.ModuleCompiler.check_compilability`, and
+    can be saved, loaded, pickled, and passed to any number of compilers
+    (see :meth:`ironpycompiler.compiler.ModuleCompiler.use_analysis` and
+    :func:`ironpycompiler.compiler.compile_variants`).
+
+    The sizes and modification times of the scripts and the compilable
+    modules are recorded, so that :meth:`is_current` tells whether they
+    have been changed. Modules added after the analysis are not detected.
+
+    :param list paths_to_scripts: The absolute paths to the scripts.
+    :param list dirs_of_modules: The directories of the modules.
+    :param builtin_modules: The names of the built-in modules.
+    :param compilable_modules: The paths to the compilable modules.
+    :param uncompilable_modules: The names of the uncompilable modules.
+    :param str analyzer: (optional) The name of the scanner.
+    :param tuple source_state: (optional) The recorded state of the files,
+                               or the current state will be recorded.
+
+    .. versionadded:: 1.0.0
+    """
+
+    __slots__ = ("paths_to_scripts", "dirs_of_modules", "builtin_modules",
+                 "compilable_modules", "uncompilable_modules", "analyzer",
+                 "source_state")
+
+    def __init__(self, paths_to_scripts, dirs_of_modules, builtin_modules,
+                 compilable_modules, uncompilable_modules,
+                 analyzer="bytecode", source_state=None):
+        """Initialization.
+
+        """
+
+        values = {"paths_to_scripts": tuple(paths_to_scripts),
+                  "dirs_of_modules": tuple(dirs_of_modules or ()),
+                  "builtin_modules": frozenset(builtin_modules),
+                  "compilable_modules": frozenset(compilable_modules),
+                  "uncompilable_modules": frozenset(uncompilable_modules),
+                  "analyzer": analyzer}
+        if source_state is None:
+            source_state = _source_state(values["paths_to_scripts"] +
+                                         tuple(values["compilable_modules"]))
+        values["source_state"] = tuple(tuple(s) for s in source_state)
+        for (name, value) in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AnalysisResult is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("AnalysisResult is immutable.")
+
+    def __eq__(self, other):
+        if not isinstance(other, AnalysisResult):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __reduce__(self):
+        return (AnalysisResult, self._values())
+
+    def __repr__(self):
+        return "AnalysisResult ({} scripts, {} compilable modules)".format(
+            len(self.paths_to_scripts), len(self.compilable_modules))
+
+    def _values(self):
+        """Returns the tuple of the arguments of the constructor.
+
+        """
+
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def is_current(self):
+        """Checks whether the analyzed files are unchanged.
+
+        :rtype: bool
+        """
+
+        return _source_state(self.paths_to_scripts +
+                             tuple(self.compilable_modules)) == \
+            self.source_state
+
+    def refreshed(self):
+        """Returns a copy recording the current state of the files.
+
+        It should be used only if the changes are known not to affect the
+        analysis, e.g. the imports of the changed files are the same.
+
+        :rtype: :class:`AnalysisResult`
+        """
+
+        return AnalysisResult(self.paths_to_scripts, self.dirs_of_modules,
+                              self.builtin_modules, self.compilable_modules,
+                              self.uncompilable_modules, self.analyzer)
+
+    def to_dict(self):
+        """Returns a dictionary which can be written in JSON.
+
+        :rtype: dict
+        """
+
+        return {"paths_to_scripts": list(self.paths_to_scripts),
+                "dirs_of_modules": list(self.dirs_of_modules),
+                "builtin_modules": sorted(self.builtin_modules),
+                "compilable_modules": sorted(self.compilable_modules),
+                "uncompilable_modules": sorted(self.uncompilable_modules),
+                "analyzer": self.analyzer,
+                "source_state": [list(s) for s in self.source_state]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates an instance from a dictionary returned by :meth:`to_dict`.
+
+        :rtype: :class:`AnalysisResult`
+        :raises ValueError: if the dictionary is invalid.
+        """
+
+        try:
+            return cls(data["paths_to_scripts"], data["dirs_of_modules"],
+                       data["builtin_modules"], data["compilable_modules"],
+                       data["uncompilable_modules"], data["analyzer"],
+                       data["source_state"])
+        except (KeyError, TypeError) as e:
+            raise ValueError("Invalid analysis result: {}".format(e))
+
+    def save(self, path):
+        """Saves the result into a JSON file.
+
+        :param str path: The path to the file.
+        """
+
+        import json
+        cache.atomic_write(os.path.abspath(path),
+                           json.dumps(self.to_dict(), indent=1,
+                                      sort_keys=True,
+                                      separators=(",", ": ")))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a result saved by :meth:`save`.
+
+        :param str path: The path to the file.
+        :rtype: :class:`AnalysisResult`
+        :raises ValueError: if the file is invalid.
+        :raises EnvironmentError: if the file cannot be read.
+        """
+
+        import json
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for building several assemblies declared in a manifest.
+
+A manifest is a JSON file like this::
+
+    {
+        "cache_dir": ".ipccache",
+        "jobs": 4,
+        "targets": [
+            {"name": "core", "scripts": ["core/a.py", "core/b.py"],
+             "out": "build/core.dll"},
+            {"name": "app-x86", "scripts": ["app.py"], "depends": ["core"],
+             "out": "build/x86/app.exe", "target_asm": "exe",
+             "target_platform": "x86", "embed": true, "standalone": true}
+        ]
+    }
+
+The manifest may contain these keys. Relative paths are relative to the
+directory of the manifest.
+
+* ``"targets"``: The list of the targets.
+* ``"ipy_dir"``: (optional) The IronPython directory, or it will be
+  detected.
+* ``"lib"``: (optional) The directories of the modules, passed to
+  :meth:`ironpycompiler.compiler.ModuleCompiler.check_compilability`.
+* ``"cache_dir"``: (optional) The directory for caching.
+* ``"analyzer"``: (optional) ``"bytecode"`` or ``"source"``.
+* ``"analysis_jobs"``: (optional) The number of the processes scanning
+  modules.
+* ``"jobs"``: (optional) The number of the targets compiled concurrently.
+* ``"prune"``: (optional) Whether to drop the modules not imported on
+  IronPython (see :class:`ironpycompiler.prune.ImportPruner`).
+* ``"include"``, ``"exclude"``: (optional) The glob patterns of the modules
+  which are kept or dropped in pruning. They imply ``"prune"``.
+
+Each target has a unique ``"name"``, the list of the ``"scripts"``, and
+optionally the ``"main"`` script and the names of the targets on which it
+``"depends"``. The other keys are the keyword arguments of
+:meth:`ironpycompiler.compiler.ModuleCompiler.create_asm` (see
+:data:`TARGET_OPTIONS`).
+
+:class:`ManifestBuilder` detects IronPython only once, and all the targets
+share the imports found in the modules, so that each module is scanned only
+once. Targets with the same scripts, like the variants for x86 and x64,
+share one analysis. Then the targets are compiled by a bounded number of
+threads, each target after the targets on which it depends.
+
+.. versionadded:: 1.0.0
+"""
+
+import json
+import os
+import threading
+import time
+
+# Original modules
+from . import analysis
+from . import cache
+from . import compiler
+from . import detect
+from . import exceptions
+from . import prune
+from . import tracing
+
+#: The keys of a target passed to
+#: :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`.
+TARGET_OPTIONS = frozenset(["out", "target_asm", "target_platform", "embed",
+                            "standalone", "mta", "delete_resp", "executable",
+                            "copy_ipydll", "layered", "shards", "timeout",
+                            "minify"])
+
+_TARGET_KEYS = TARGET_OPTIONS | frozenset(["name", "scripts", "main",
+                                           "depends"])
+
+_MANIFEST_KEYS = frozenset(["targets", "ipy_dir", "lib", "cache_dir",
+                            "analyzer", "analysis_jobs", "jobs", "prune",
+                            "include", "exclude"])
+
+# ビルドが終わった状態
+_FINISHED = frozenset(["ok", "failed", "skipped"])
+
+
+class Target(object):
+
+    """Represents a target declared in a manifest.
+
+    :param str name: The name of the target.
+    :param list scripts: The absolute paths to the scripts. The first one is
+                         the main script.
+    :param dict options: (optional) The keyword arguments of
+                         ``create_asm``.
+    :param list depends: (optional) The names of the targets which must be
+                         built before this target.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, name, scripts, options=None, depends=()):
+        """Initialization.
+
+        """
+
+        #: The name of the target.
+        self.name = name
+        #: The absolute paths to the scripts.
+        self.scripts = list(scripts)
+        #: The keyword arguments of ``create_asm``.
+        self.options = dict(options or {})
+        #: The names of the targets built before this target.
+        self.depends = list(depends)
+
+
+def load_manifest(path):
+    """Loads a manifest from a JSON file.
+
+    :param str path: The path to the manifest.
+    :return: The manifest; see :func:`parse_manifest`.
+    :rtype: dict
+    :raises ironpycompiler.exceptions.ManifestError: if the manifest is
+                                                     invalid
+    :raises EnvironmentError: if the manifest cannot be read.
+
+    .. versionadded:: 1.0.0
+    """
+
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise exceptions.ManifestError("{}: {}".format(path, e))
+    return parse_manifest(data, os.path.dirname(os.path.abspath(path)))
+
+
+def parse_manifest(data, base_dir):
+    """Validates the content of a manifest, and resolves the paths.
+
+    :param dict data: The content of the manifest.
+    :param str base_dir: The directory to which the paths are relative.
+    :return: A dictionary containing the same keys as the manifest, with
+             the defaults filled in. ``"targets"`` is the list of
+             :class:`Target`.
+    :rtype: dict
+    :raises ironpycompiler.exceptions.ManifestError: if the manifest is
+                                                     invalid
+
+    .. versionadded:: 1.0.0
+    """
+
+    def resolve(path):
+        return os.path.normpath(os.path.join(base_dir, path))
+
+    if not isinstance(data, dict):
+        raise exceptions.ManifestError("The manifest must be an object.")
+    _check_keys("The manifest", data, _MANIFEST_KEYS)
+    for key in ("lib", "include", "exclude"):
+        _check_list("'{}' of the manifest".format(key), data.get(key, []))
+    for key in ("jobs", "analysis_jobs"):
+        _check_jobs("'{}' of the manifest".format(key), data.get(key, 1))
+    if not isinstance(data.get("targets", []), list):
+        raise exceptions.ManifestError("'targets' must be a list.")
+    manifest = {
+        "ipy_dir": resolve(data["ipy_dir"]) if "ipy_dir" in data else None,
+        "lib": [resolve(d) for d in data["lib"]] if "lib" in data else None,
+        "cache_dir": (resolve(data["cache_dir"]) if "cache_dir" in data
+                      else None),
+        "analyzer": data.get("analyzer", "bytecode"),
+        "analysis_jobs": data.get("analysis_jobs", 1),
+        "jobs": data.get("jobs", 1),
+        "prune": bool(data.get("prune") or data.get("include") or
+                      data.get("exclude")),
+        "include": data.get("include", []),
+        "exclude": data.get("exclude", []),
+        "targets": []}
+
+    for item in data.get("targets", []):
+        if not isinstance(item, dict) or "name" not in item:
+            raise exceptions.ManifestError("Each target must have a name.")
+        name = item["name"]
+        _check_keys("Target '{}'".format(name), item, _TARGET_KEYS)
+        if any(t.name == name for t in manifest["targets"]):
+            raise exceptions.ManifestError(
+                "Target '{}' is declared twice.".format(name))
+        for key in ("scripts", "depends"):
+            _check_list("'{}' of target '{}'".format(key, name),
+                        item.get(key, []))
+        if not item.get("scripts"):
+            raise exceptions.ManifestError(
+                "Target '{}' has no scripts.".format(name))
+        scripts = [resolve(s) for s in item["scripts"]]
+        if "main" in item:
+            main = resolve(item["main"])
+            if main in scripts:
+                scripts.remove(main)
+            scripts.insert(0, main)
+        options = dict((k, item[k]) for k in TARGET_OPTIONS if k in item)
+        if options.get("out") is not None:
+            options["out"] = resolve(options["out"])
+        manifest["targets"].append(
+            Target(name, scripts, options, item.get("depends", [])))
+
+    names = set(t.name for t in manifest["targets"])
+    for target in manifest["targets"]:
+        for dependency in target.depends:
+            if dependency not in names:
+                raise exceptions.ManifestError(
+                    "Target '{}' depends on unknown target '{}'.".format(
+                        target.name, dependency))
+    # 循環する依存関係を検出する
+    _sort_targets(manifest["targets"])
+    return manifest
+
+
+def _check_keys(what, data, allowed):
+    """Raises an error if the dictionary has an unknown key.
+
+    """
+
+    unknown = sorted(set(data) - allowed)
+    if unknown:
+        raise exceptions.ManifestError("{} has unknown keys: {}".format(
+            what, ", ".join(unknown)))
+
+
+def _check_list(what, value):
+    """Raises an error unless the value is a list of strings.
+
+    """
+
+    if not isinstance(value, list) or \
+       not all(isinstance(v, basestring) for v in value):
+        raise exceptions.ManifestError(
+            "{} must be a list of strings.".format(what))
+
+
+def _check_jobs(what, value):
+    """Raises an error unless the value is a positive integer.
+
+    """
+
+    # boolはintの派生クラス
+    if not isinstance(value, (int, long)) or isinstance(value, bool) or \
+       value < 1:
+        raise exceptions.ManifestError(
+            "{} must be a positive integer.".format(what))
+
+
+def _sort_targets(targets):
+    """Sorts the targets so that each one follows its dependencies.
+
+    The order of independent targets is kept.
+    """
+
+    by_name = dict((t.name, t) for t in targets)
+    result = []
+    state = {}  # 名前 -> "visiting" または "done"
+
+    def visit(target, chain):
+        if state.get(target.name) == "done":
+            return
+        if state.get(target.name) == "visiting":
+            raise exceptions.ManifestError(
+                "Circular dependency: {}".format(
+                    " -> ".join(chain + [target.name])))
+        state[target.name] = "visiting"
+        for dependency in target.depends:
+            if dependency in by_name:
+                visit(by_name[dependency], chain + [target.name])
+        state[target.name] = "done"
+        result.append(target)
+
+    for target in targets:
+        visit(target, [])
+    return result
+
+
+def _makedirs(directory):
+    """Creates the directory unless it exists.
+
+    """
+
+    try:
+        os.makedirs(directory)
+    except OSError:
+        # 他のスレッドが作成した場合も成功とする
+        if not os.path.isdir(directory):
+            raise
+
+
+class ManifestBuilder(object):
+
+    """Builds the targets declared in a manifest.
+
+    Usage::
+
+        builder = build.ManifestBuilder(build.load_manifest("ipc.json"))
+        for summary in builder.run():
+            print summary["name"], summary["status"]
+
+    :param dict manifest: The manifest returned by :func:`load_manifest`.
+    :param int jobs: (optional) The number of the targets compiled
+                     concurrently, or ``"jobs"`` of the manifest will be
+                     used.
+    :param callback: (optional) A function called with the summary of each
+                     target when it is finished. It may be called from
+                     several threads.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, manifest, jobs=None, callback=None):
+        """Initialization.
+
+        """
+
+        #: The manifest.
+        self.manifest = manifest
+        #: The number of the targets compiled concurrently.
+        self.jobs = max(1, jobs if jobs is not None else manifest["jobs"])
+        #: The function called when a target is finished, or None.
+        self.callback = callback
+        #: The IronPython directory, which is detected by :meth:`run` if
+        #: the manifest does not specify it.
+        self.ipy_dir = manifest["ipy_dir"]
+        #: The summaries of the targets, keyed by their names.
+        self.summaries = {}
+
+    def run(self, names=None):
+        """Builds the targets.
+
+        :param list names: (optional) The names of the targets which should
+                           be built, or all the targets will be built. The
+                           targets on which they depend are also built.
+        :return: The summaries of the built targets, in the order in which
+                 they can be built. A summary is a dictionary containing
+                 the name of the target (``"name"``), ``"ok"``,
+                 ``"failed"``, or ``"skipped"`` (``"status"``), the
+                 seconds spent on analysis (``"analysis"``) and
+                 compilation (``"compile"``), the name of the target whose
+                 analysis was reused, or None (``"shared_analysis"``),
+                 whether the assemblies were restored from the cache
+                 (``"cache_hit"``), the path to the main assembly
+                 (``"output"``), and the error, or None (``"error"``).
+        :rtype: list
+        :raises ironpycompiler.exceptions.ManifestError: if a name is
+                                                         unknown
+        :raises ironpycompiler.exceptions.IronPythonDetectionError: if
+            IronPython cannot be detected
+        """
+
+        targets = self._select(names)
+        with tracing.span("build_manifest", "build", targets=len(targets),
+                          jobs=self.jobs):
+            if self.ipy_dir is None:
+                # すべてのターゲットで一度だけ検出する
+                self.ipy_dir = detect.auto_detect()[1]
+            compilers = self._analyze(targets)
+            try:
+                self._compile(targets, compilers)
+            finally:
+                for mc in compilers.values():
+                    mc.close()
+        return [self.summaries[t.name] for t in targets]
+
+    def _select(self, names):
+        """Returns the targets to build and their dependencies in order.
+
+        """
+
+        targets = self.manifest["targets"]
+        if names is None:
+            return _sort_targets(targets)
+        by_name = dict((t.name, t) for t in targets)
+        selected = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in by_name:
+                raise exceptions.ManifestError(
+                    "Unknown target: {}".format(name))
+            if name not in selected:
+                selected.add(name)
+                stack.extend(by_name[name].depends)
+        return _sort_targets([t for t in targets if t.name in selected])
+
+    def _analyze(self, targets):
+        """Analyzes the scripts of the targets, sharing the imports.
+
+        """
+
+        manifest = self.manifest
+        cache_dir = manifest["cache_dir"]
+        if cache_dir is not None:
+            imports = cache.MemoryImportCache(
+                cache.ImportCache(os.path.join(cache_dir, "imports")))
+            module_index = analysis.ModuleIndex(
+                os.path.join(cache_dir, "modules.pickle"))
+        else:
+            imports = cache.MemoryImportCache()
+            module_index = analysis.ModuleIndex()
+
+        compilers = {}
+        analyzed = {}  # スクリプトのタプル -> ターゲット名
+        for target in targets:
+            summary = {"name": target.name, "status": "pending",
+                       "analysis": 0.0, "compile": None,
+                       "shared_analysis": None, "cache_hit": False,
+                       "output": None, "error": None}
+            self.summaries[target.name] = summary
+            pruner = None
+            if manifest["prune"]:
+                pruner = prune.ImportPruner(include=manifest["include"],
+                                            exclude=manifest["exclude"])
+            mc = compiler.ModuleCompiler(
+                target.scripts, ipy_dir=self.ipy_dir, cache_dir=cache_dir,
+                analyzer=manifest["analyzer"],
+                jobs=manifest["analysis_jobs"], pruner=pruner)
+            mc.import_cache = imports
+            mc.module_index = module_index
+            compilers[target.name] = mc
+
+            key = tuple(mc.paths_to_scripts)
+            if key in analyzed:
+                mc.use_analysis(compilers[analyzed[key]].analysis)
+                summary["shared_analysis"] = analyzed[key]
+                continue
+
+            start = time.time()
+            try:
+                with tracing.span("analyze_target", "build",
+                                  target=target.name):
+                    mc.check_compilability(manifest["lib"])
+                analyzed[key] = target.name
+            except (SyntaxError, EnvironmentError, exceptions.IPCError) as e:
+                summary.update(status="failed", error=e)
+            summary["analysis"] = time.time() - start
+            if summary["status"] == "failed":
+                self._finished(summary)
+        return compilers
+
+    def _compile(self, targets, compilers):
+        """Compiles the targets in dependency order with bounded threads.
+
+        """
+
+        condition = threading.Condition()
+        running = [0]
+
+        def compile_target(target, mc, summary):
+            start = time.time()
+            try:
+                out = target.options.get("out")
+                if out is not None:
+                    _makedirs(os.path.dirname(out))
+                with tracing.span("compile_target", "build",
+                                  target=target.name) as attrs:
+                    mc.create_asm(**target.options)
+                    attrs["cache_hit"] = mc.cache_hit
+                summary.update(status="ok", cache_hit=mc.cache_hit,
+                               output=mc.output_asm)
+            except (EnvironmentError, exceptions.IPCError) as e:
+                summary.update(status="failed", error=e)
+            finally:
+                summary["compile"] = time.time() - start
+                if summary["status"] not in _FINISHED:
+                    summary["status"] = "failed"
+                self._finished(summary)
+                with condition:
+                    running[0] -= 1
+                    condition.notify()
+
+        threads = []
+        with condition:
+            while True:
+                # targetsは依存関係の順に並んでいるので、一度の走査で済む
+                for target in targets:
+                    summary = self.summaries[target.name]
+                    if summary["status"] != "pending":
+                        continue
+                    states = [self.summaries[d]["status"]
+                              for d in target.depends]
+                    if any(s in ("failed", "skipped") for s in states):
+                        summary["status"] = "skipped"
+                        self._finished(summary)
+                    elif all(s == "ok" for s in states) and \
+                            running[0] < self.jobs:
+                        summary["status"] = "running"
+                        running[0] += 1
+                        thread = threading.Thread(
+                            target=compile_target,
+                            args=(target, compilers[target.name], summary))
+                        thread.daemon = True
+                        thread.start()
+                        threads.append(thread)
+                if all(self.summaries[t.name]["status"] in _FINISHED
+                       for t in targets):
+                    break
+                condition.wait()
+        for thread in threads:
+            thread.join()
+
+    def _finished(self, summary):
+        """Calls the callback with the summary of a finished target.
+
+        """
+
+        if self.callback is not None:
+            self.callback(summary)
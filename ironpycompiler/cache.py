@@ -0,0 +1,659 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for caching the results of IronPyCompiler on disk.
+
+.. versionadded:: 1.0.0
+"""
+
+import os
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# Original modules
+from . import constants
+
+
+def file_digest(path):
+    """Returns the SHA-1 digest of the content of a file.
+
+    :param str path: The path to the file.
+    :return: The hexadecimal digest.
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def default_cache_dir():
+    """Returns the directory where the results shared by projects are cached.
+
+    The directory is specified by the environment variable
+    :data:`ironpycompiler.constants.CACHE_DIR_ENV`. If it is not set,
+    ``%LOCALAPPDATA%\\IronPyCompiler\\Cache`` is used on Windows, and
+    ``~/.cache/ironpycompiler`` on the other platforms.
+
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    path = os.environ.get(constants.CACHE_DIR_ENV)
+    if path:
+        return path
+    home = os.path.expanduser("~")
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or home
+        return os.path.join(base, "IronPyCompiler", "Cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(home, ".cache")
+    return os.path.join(base, "ironpycompiler")
+
+
+def atomic_write(path, data):
+    """Writes the data into a file, replacing it atomically if possible.
+
+    :param str path: The path to the file.
+    :param str data: The data to be written.
+
+    .. versionadded:: 1.0.0
+    """
+
+    (fd, tmp_path) = tempfile.mkstemp(dir=os.path.dirname(path),
+                                      prefix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except EnvironmentError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _evict_lru(entries, max_size, remove):
+    """Removes the oldest entries until their total size becomes small enough.
+
+    ``entries`` is a list of tuples containing the time when the entry was
+    used last, its size, and its path.
+    """
+
+    total = sum(size for (mtime, size, path) in entries)
+    removed = 0
+    for (mtime, size, path) in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            remove(path)
+        except EnvironmentError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ImportCache(object):
+
+    """Caches the import statements found in each source file.
+
+    Every entry is stored in its own file in the cache directory, and is
+    keyed by the path to the source file. An entry is valid if the size and
+    the modification time of the source file are unchanged. Otherwise the
+    SHA-1 digest of the content is compared, so that touching a file does
+    not force it to be scanned again.
+
+    Entries are evicted in least-recently-used order when the total size
+    of the cache exceeds ``max_size``.
+
+    :param str cache_dir: The path to the cache directory. It will be
+                          created if it does not exist.
+    :param int max_size: (optional) The maximum size of the cache in bytes.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, cache_dir, max_size=constants.IMPORT_CACHE_MAX_SIZE):
+        """Initialization.
+
+        """
+
+        #: The path to the directory where the entries are stored.
+        self.cache_dir = os.path.abspath(cache_dir)
+        #: The maximum size of the cache in bytes.
+        self.max_size = max_size
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _entry_path(self, path):
+        """Returns the path to the entry for the source file.
+
+        """
+
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(path)))
+        return os.path.join(self.cache_dir, key.hexdigest() + ".pickle")
+
+    def _load_entry(self, entry_path):
+        """Loads an entry, or returns None if it is missing or broken.
+
+        """
+
+        try:
+            with open(entry_path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def get(self, path, scanner="bytecode"):
+        """Returns the cached imports of the source file.
+
+        :param str path: The path to the source file.
+        :param str scanner: (optional) The name of the scanner which
+                            extracted the imports.
+        :return: The list of the imports, or None if there is no valid entry.
+        :rtype: list
+        """
+
+        entry_path = self._entry_path(path)
+        entry = self._load_entry(entry_path)
+        if entry is None or scanner not in entry["imports"]:
+            return None
+
+        try:
+            st = os.stat(path)
+        except EnvironmentError:
+            return None
+
+        if (entry["size"], entry["mtime"]) != (st.st_size, st.st_mtime):
+            if entry["size"] != st.st_size or \
+               entry["digest"] != file_digest(path):
+                return None
+            # 内容は変わっていないので、新しいmtimeを記録する
+            entry["mtime"] = st.st_mtime
+            atomic_write(entry_path, pickle.dumps(entry, 2))
+        else:
+            # LRUのためにエントリの更新日時を更新する
+            try:
+                os.utime(entry_path, None)
+            except EnvironmentError:
+                pass
+
+        return entry["imports"][scanner]
+
+    def set(self, path, imports, scanner="bytecode"):
+        """Stores the imports of the source file.
+
+        The imports extracted by the other scanners are kept if the file is
+        unchanged.
+
+        :param str path: The path to the source file.
+        :param list imports: The imports found in the file.
+        :param str scanner: (optional) The name of the scanner which
+                            extracted the imports.
+        """
+
+        entry_path = self._entry_path(path)
+        st = os.stat(path)
+        digest = file_digest(path)
+        entry = self._load_entry(entry_path)
+        if entry is None or entry["digest"] != digest:
+            entry = {"path": os.path.abspath(path), "imports": {}}
+        entry.update({"size": st.st_size, "mtime": st.st_mtime,
+                      "digest": digest})
+        entry["imports"][scanner] = imports
+        atomic_write(entry_path, pickle.dumps(entry, 2))
+
+    def invalidate(self, paths=None):
+        """Removes entries from the cache.
+
+        :param list paths: (optional) The paths to the source files whose
+                           entries should be removed. If this parameter is
+                           not provided, all the entries will be removed.
+        """
+
+        if paths is None:
+            entry_paths = [os.path.join(self.cache_dir, name) for name
+                           in os.listdir(self.cache_dir)
+                           if name.endswith(".pickle")]
+        else:
+            entry_paths = [self._entry_path(p) for p in paths]
+
+        for entry_path in entry_paths:
+            try:
+                os.remove(entry_path)
+            except EnvironmentError:
+                pass
+
+    def prune(self, max_size=None):
+        """Evicts the least recently used entries to limit the cache size.
+
+        :param int max_size: (optional) The maximum size in bytes, or
+                             :attr:`max_size` will be used.
+        :return: The number of the removed entries.
+        :rtype: int
+        """
+
+        if max_size is None:
+            max_size = self.max_size
+        return _evict_lru(self._entries(), max_size, os.remove)
+
+    def stats(self):
+        """Returns the statistics of the cache.
+
+        :return: A dictionary showing the number of the entries
+                 (``"entries"``), their total size (``"size"``), and the
+                 maximum size (``"max_size"``).
+        :rtype: dict
+        """
+
+        entries = self._entries()
+        return {"entries": len(entries),
+                "size": sum(e[1] for e in entries),
+                "max_size": self.max_size}
+
+    def _entries(self):
+        """Returns the list of the entries for :func:`_evict_lru`.
+
+        """
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pickle"):
+                continue
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(entry_path)
+            except EnvironmentError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry_path))
+        return entries
+
+
+class MemoryImportCache(object):
+
+    """Keeps the imports of source files in memory.
+
+    This class has the same interface as :class:`ImportCache`, and is
+    used when the same files are analyzed many times in a process. The
+    entries in memory are not validated, so the entries of changed files
+    must be updated explicitly. If ``backing`` is specified, the imports
+    missing in memory are looked up in it, and the stored imports are also
+    written into it.
+
+    :param backing: (optional) The cache on disk.
+    :type backing: :class:`ImportCache`
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, backing=None):
+        """Initialization.
+
+        """
+
+        #: The cache on disk, or None.
+        self.backing = backing
+        self._imports = {}  # (パス, スキャナー) -> インポート
+        self._lock = threading.Lock()
+
+    def get(self, path, scanner="bytecode"):
+        """Returns the imports of the source file.
+
+        :param str path: The path to the source file.
+        :param str scanner: (optional) The name of the scanner.
+        :return: The list of the imports, or None if they are unknown.
+        :rtype: list
+        """
+
+        key = (os.path.abspath(path), scanner)
+        with self._lock:
+            imports = self._imports.get(key)
+        if imports is None and self.backing is not None:
+            imports = self.backing.get(path, scanner)
+            if imports is not None:
+                with self._lock:
+                    self._imports[key] = imports
+        return imports
+
+    def peek(self, path, scanner="bytecode"):
+        """Returns the imports in memory, without looking up ``backing``.
+
+        :rtype: list
+        """
+
+        with self._lock:
+            return self._imports.get((os.path.abspath(path), scanner))
+
+    def set(self, path, imports, scanner="bytecode"):
+        """Stores the imports of the source file.
+
+        :param str path: The path to the source file.
+        :param list imports: The imports found in the file.
+        :param str scanner: (optional) The name of the scanner.
+        """
+
+        with self._lock:
+            self._imports[(os.path.abspath(path), scanner)] = imports
+        if self.backing is not None:
+            self.backing.set(path, imports, scanner)
+
+    def invalidate(self, paths=None):
+        """Removes entries from memory and ``backing``.
+
+        :param list paths: (optional) The paths to the source files, or all
+                           the entries will be removed.
+        """
+
+        with self._lock:
+            if paths is None:
+                self._imports.clear()
+            else:
+                paths = set(os.path.abspath(p) for p in paths)
+                for key in [k for k in self._imports if k[0] in paths]:
+                    del self._imports[key]
+        if self.backing is not None:
+            self.backing.invalidate(paths)
+
+    def retain(self, paths):
+        """Forgets the source files which are not in the paths.
+
+        :param paths: The absolute paths to the files which are kept.
+        """
+
+        paths = set(paths)
+        with self._lock:
+            for key in [k for k in self._imports if k[0] not in paths]:
+                del self._imports[key]
+
+    def prune(self, max_size=None):
+        """Prunes ``backing``. See :meth:`ImportCache.prune`.
+
+        """
+
+        if self.backing is None:
+            return 0
+        return self.backing.prune(max_size)
+
+
+class BuildCache(object):
+
+    """Caches the assemblies generated by pyc.py.
+
+    Every entry is a directory containing the generated files, and is keyed
+    by a digest of all the inputs of the build (see
+    :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`). Entries are
+    evicted in least-recently-used order when the total size of the cache
+    exceeds ``max_size``.
+
+    :param str cache_dir: The path to the cache directory. It will be
+                          created if it does not exist.
+    :param int max_size: (optional) The maximum size of the cache in bytes.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, cache_dir, max_size=constants.BUILD_CACHE_MAX_SIZE):
+        """Initialization.
+
+        """
+
+        #: The path to the directory where the entries are stored.
+        self.cache_dir = os.path.abspath(cache_dir)
+        #: The maximum size of the cache in bytes.
+        self.max_size = max_size
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _manifest_path(self, key):
+        """Returns the path to the manifest of the entry.
+
+        """
+
+        return os.path.join(self.cache_dir, key, "manifest.pickle")
+
+    def get(self, key, dest_dir):
+        """Restores the files of the entry into the directory.
+
+        :param str key: The key of the entry.
+        :param str dest_dir: The path to the destination directory.
+        :return: The information stored with the files (see :meth:`put`),
+                 or None if the entry does not exist or has no files.
+        :rtype: dict
+        """
+
+        manifest_path = self._manifest_path(key)
+        try:
+            with open(manifest_path, "rb") as f:
+                manifest = pickle.load(f)
+        except Exception:
+            return None
+        if not manifest["files"]:
+            # 出力のない項目は、何も復元できない
+            return None
+
+        files_dir = os.path.join(self.cache_dir, key, "files")
+        for name in manifest["files"]:
+            shutil.copy2(os.path.join(files_dir, name),
+                         os.path.join(dest_dir, name))
+        try:
+            os.utime(manifest_path, None)
+        except EnvironmentError:
+            pass
+        return manifest["info"]
+
+    def put(self, key, paths, info=None):
+        """Stores the files as an entry.
+
+        :param str key: The key of the entry.
+        :param list paths: The paths to the files.
+        :param dict info: (optional) Information stored with the files, like
+                          the output of pyc.py.
+        """
+
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp")
+        try:
+            files_dir = os.path.join(tmp_dir, "files")
+            os.mkdir(files_dir)
+            for path in paths:
+                shutil.copy2(path, files_dir)
+            manifest = {"files": [os.path.basename(p) for p in paths],
+                        "info": info if info is not None else {},
+                        "created": time.time()}
+            with open(os.path.join(tmp_dir, "manifest.pickle"), "wb") as f:
+                pickle.dump(manifest, f, 2)
+            entry_dir = os.path.join(self.cache_dir, key)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.rename(tmp_dir, entry_dir)
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.prune()
+
+    def invalidate(self, keys=None):
+        """Removes entries from the cache.
+
+        :param list keys: (optional) The keys of the entries which should be
+                          removed. If this parameter is not provided, all
+                          the entries will be removed.
+        """
+
+        if keys is None:
+            keys = [os.path.basename(e[2]) for e in self._entries()]
+        for key in keys:
+            shutil.rmtree(os.path.join(self.cache_dir, key),
+                          ignore_errors=True)
+
+    def prune(self, max_size=None):
+        """Evicts the least recently used entries to limit the cache size.
+
+        :param int max_size: (optional) The maximum size in bytes, or
+                             :attr:`max_size` will be used.
+        :return: The number of the removed entries.
+        :rtype: int
+        """
+
+        if max_size is None:
+            max_size = self.max_size
+        return _evict_lru(self._entries(), max_size, shutil.rmtree)
+
+    def stats(self):
+        """Returns the statistics of the cache.
+
+        :return: The same dictionary as that of :meth:`ImportCache.stats`.
+        :rtype: dict
+        """
+
+        entries = self._entries()
+        return {"entries": len(entries),
+                "size": sum(e[1] for e in entries),
+                "max_size": self.max_size}
+
+    def _entries(self):
+        """Returns the list of the entries for :func:`_evict_lru`.
+
+        """
+
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            try:
+                mtime = os.stat(self._manifest_path(key)).st_mtime
+            except EnvironmentError:
+                continue
+            size = 0
+            for (dirpath, dirnames, filenames) in os.walk(entry_dir):
+                for name in filenames:
+                    try:
+                        size += os.path.getsize(os.path.join(dirpath, name))
+                    except EnvironmentError:
+                        pass
+            entries.append((mtime, size, entry_dir))
+        return entries
+
+
+class DetectionCache(object):
+
+    """Caches the versions of the IronPython executables.
+
+    The entries are keyed by the real path to each executable, and are
+    valid as long as its size and modification time are unchanged. Looking
+    up an entry does not execute anything.
+
+    :param str path: (optional) The path to the cache file. By default
+                     ``detection.pickle`` in :func:`default_cache_dir` is
+                     used.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, path=None):
+        """Initialization.
+
+        """
+
+        if path is None:
+            path = os.path.join(default_cache_dir(), "detection.pickle")
+        #: The path to the cache file.
+        self.path = os.path.abspath(path)
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _key(self, path_to_exe):
+        """Returns the key of the entry for the executable.
+
+        """
+
+        return os.path.normcase(os.path.realpath(path_to_exe))
+
+    def _load(self):
+        """Loads the entries unless they are loaded.
+
+        """
+
+        if self._entries is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self._entries = pickle.load(f)
+            except Exception:
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        """Writes the entries into the cache file, ignoring errors.
+
+        """
+
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            atomic_write(self.path, pickle.dumps(self._entries, 2))
+        except EnvironmentError:
+            pass
+
+    def get(self, path_to_exe):
+        """Returns the cached version of the executable.
+
+        :param str path_to_exe: The path to the executable.
+        :return: The version, like ``"2.7.5"``, or None if there is no valid
+                 entry.
+        :rtype: str
+        """
+
+        key = self._key(path_to_exe)
+        try:
+            st = os.stat(key)
+        except EnvironmentError:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or \
+           (entry["size"], entry["mtime"]) != (st.st_size, st.st_mtime):
+            return None
+        return entry["version"]
+
+    def set(self, path_to_exe, version):
+        """Stores the version of the executable.
+
+        :param str path_to_exe: The path to the executable.
+        :param version: The version, which is converted into a string.
+        """
+
+        key = self._key(path_to_exe)
+        st = os.stat(key)
+        with self._lock:
+            self._load()[key] = {"size": st.st_size, "mtime": st.st_mtime,
+                                 "version": str(version)}
+            self._save()
+
+    def invalidate(self, paths=None):
+        """Removes entries from the cache.
+
+        :param list paths: (optional) The paths to the executables whose
+                           entries should be removed. If this parameter is
+                           not provided, all the entries will be removed.
+        """
+
+        with self._lock:
+            entries = self._load()
+            if paths is None:
+                entries.clear()
+            else:
+                for path in paths:
+                    entries.pop(self._key(path), None)
+            self._save()
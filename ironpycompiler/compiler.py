@@ -7,16 +7,23 @@
 
 import sys
 import os
-import modulefinder
 import tempfile
 import glob
+import fnmatch
 import shutil
+import hashlib
+import threading
+from multiprocessing.pool import ThreadPool
 
 # Original modules
 from . import detect
+from . import analysis
+from . import cache
 from . import constants
 from . import exceptions
 from . import process
+from . import tracing
+from . import transform
 
 
 class ModuleCompiler(object):
@@ -32,51 +39,222 @@ class ModuleCompiler(object):
                                   path to the main file of your project.
     :param str ipy_dir: Specify the IronPython directory, or it will be
                         automatically detected using
-                        :func:`ironpycompiler.detect.auto_detect`.
+                        :func:`ironpycompiler.detect.auto_detect` when it is
+                        needed first. Analyzing the scripts with
+                        ``dirs_of_modules`` does not need IronPython.
     :param str pyc_path: (optional) Specify the path to pyc.py.
+    :param str cache_dir: (optional) Specify the directory where the
+                          imports found in each module, the index of the
+                          module directories, and the generated assemblies
+                          are cached, so that unchanged modules and
+                          directories are not scanned again, and unchanged
+                          scripts are not compiled again.
+    :param analyzer: (optional) Specify how to extract the imports from
+                     each module: ``"bytecode"`` (the same way as
+                     :mod:`modulefinder`), ``"source"`` (faster, without
+                     compiling modules), or an instance of
+                     :class:`ironpycompiler.analysis.ImportScanner`.
+    :param int jobs: (optional) Specify the number of the processes
+                     scanning modules in parallel.
+    :param int build_cache_size: (optional) Specify the maximum size of the
+                                 cached assemblies in bytes.
+    :param worker: (optional) Specify an instance of
+                   :class:`ironpycompiler.process.IronPythonWorker` which
+                   runs pyc.py, or True to create one. A worker is started
+                   only once and reused by the compilations, so that
+                   IronPython does not start for each of them; while it is
+                   busy, the other compilations run in separate processes.
+                   Call :meth:`close` to stop a worker created by this
+                   object.
+    :param pruner: (optional) Specify an instance of
+                   :class:`ironpycompiler.prune.ImportPruner`, which drops
+                   the modules not imported on IronPython after each
+                   analysis. See :attr:`pruned_modules`.
 
     .. versionchanged:: 0.10.0
        The argument ``pyc_path`` was added.
 
+    .. versionchanged:: 1.0.0
+       The arguments ``cache_dir``, ``analyzer``, ``jobs``,
+       ``build_cache_size``, ``worker``, and ``pruner`` were added.
+       IronPython is detected lazily.
+
     """
 
-    def __init__(self, paths_to_scripts, ipy_dir=None, pyc_path=None):
+    def __init__(self, paths_to_scripts, ipy_dir=None, pyc_path=None,
+                 cache_dir=None, analyzer="bytecode", jobs=1,
+                 build_cache_size=constants.BUILD_CACHE_MAX_SIZE,
+                 worker=None, pruner=None):
         """ Initialization.
         """
 
-        if ipy_dir is None:
-            self.ipy_dir = detect.auto_detect()[1]
-        else:
-            self.ipy_dir = ipy_dir
-        if pyc_path is None:
-            self.pyc_abspath = os.path.join(self.ipy_dir,
-                                            "Tools", "Scripts", "pyc.py")
-        else:
-            self.pyc_abspath = os.path.abspath(pyc_path)
+        # IronPythonのディレクトリとpyc.pyは、必要になったときに決める
+        self._ipy_dir = ipy_dir
+        self._pyc_abspath = None
+        if pyc_path is not None:
+            self._pyc_abspath = os.path.abspath(pyc_path)
+        self._resolve_lock = threading.RLock()
 
         self.paths_to_scripts = [os.path.abspath(x) for x in
                                  paths_to_scripts]  # コンパイルすべきスクリプトたち
         self.dirs_of_modules = None  # 依存モジュールたちのディレクトリ
+        #: The cache of the imports, or None.
+        self.import_cache = None
+        #: The index of the modules in :attr:`dirs_of_modules`.
+        self.module_index = analysis.ModuleIndex()
+        #: The cache of the generated assemblies, or None.
+        self.build_cache = None
+        if cache_dir is not None:
+            self.import_cache = cache.ImportCache(
+                os.path.join(cache_dir, "imports"))
+            self.module_index = analysis.ModuleIndex(
+                os.path.join(cache_dir, "modules.pickle"))
+            self.build_cache = cache.BuildCache(
+                os.path.join(cache_dir, "builds"), build_cache_size)
+        #: The directory for caching, or None.
+        self.cache_dir = cache_dir
+        #: The scanner extracting the imports from modules.
+        self.analyzer = analysis.get_scanner(analyzer)
+        #: The number of the processes scanning modules.
+        self.jobs = jobs
         #: Set of the names of built-in modules.
         self.builtin_modules = set()
         #: Set of the paths to required and compilable modules.
         self.compilable_modules = set()
         #: Set of the names of required but uncompilable modules.
         self.uncompilable_modules = set()
+        #: The :class:`ironpycompiler.analysis.AnalysisResult` of the last
+        #: analysis, or None.
+        self.analysis = None
+        #: The :class:`ironpycompiler.prune.ImportPruner` applied after
+        #: each analysis, or None.
+        self.pruner = pruner
+        #: Dictionary mapping the paths to the modules dropped by
+        #: :attr:`pruner` in the last analysis to the reasons.
+        self.pruned_modules = {}
         self.response_file = None  # pyc.pyに渡すレスポンスファイル
         #: Output from pyc.py (stdout and stderr).
         self.pyc_stdout = None
         self.pyc_stderr = None  # pyc.pyから得た標準エラー出力、不要
         #: The path to the main output assembly.
         self.output_asm = None
+        #: Whether :meth:`create_asm` restored the assemblies from the cache.
+        self.cache_hit = False
+        #: The path to the assembly of the dependency layer, created by
+        #: :meth:`create_asm` with ``layered=True``.
+        self.dependency_asm = None
+        #: The paths to the shards created by :meth:`create_asm`.
+        self.shard_asms = []
+        #: The paths to the assemblies which must be deployed with (and,
+        #: for a DLL, referenced together with) the main output assembly
+        #: created by :meth:`create_asm`.
+        self.required_asms = []
+        #: Dictionary mapping the paths to the files minified by
+        #: :meth:`create_asm` to the numbers of the bytes removed.
+        self.minified_modules = {}
+        #: The statistics returned by :func:`gather_ipydll` in
+        #: :meth:`create_asm`, or None.
+        self.ipydll_stats = None
+        self._owns_worker = worker is True
+        self._worker = worker
+        # ワーカーが他のアセンブリをコンパイル中なら、別のプロセスを使う
+        self._worker_busy = threading.Lock()
+        # pyc.pyのプロセスの数を複数のcreate_asmで共有して抑えるセマフォ
+        self._compile_slots = None
+        # 複数のコンパイラで同じアセンブリを一度だけコンパイルするための
+        # _SharedOutputs
+        self._shared_outputs = None
+
+    @property
+    def ipy_dir(self):
+        """The IronPython directory.
+
+        It is detected using :func:`ironpycompiler.detect.auto_detect` when
+        it is accessed first, unless it was specified.
+
+        .. versionchanged:: 1.0.0
+           Detected lazily.
+        """
+
+        with self._resolve_lock:
+            if self._ipy_dir is None:
+                self._ipy_dir = detect.auto_detect()[1]
+        return self._ipy_dir
+
+    @ipy_dir.setter
+    def ipy_dir(self, value):
+        self._ipy_dir = value
+
+    @property
+    def pyc_abspath(self):
+        """The path to pyc.py.
+
+        Unless it was specified, ``Tools/Scripts/pyc.py`` in
+        :attr:`ipy_dir` is used.
+        """
+
+        if self._pyc_abspath is None:
+            return os.path.join(self.ipy_dir, "Tools", "Scripts", "pyc.py")
+        return self._pyc_abspath
+
+    @pyc_abspath.setter
+    def pyc_abspath(self, value):
+        self._pyc_abspath = value
+
+    @property
+    def worker(self):
+        """The worker running pyc.py, or None.
+
+        A worker requested with ``worker=True`` is created when it is
+        accessed first. It can be set in the same way as the argument
+        ``worker``; the worker created by this object is then stopped.
+        """
+
+        with self._resolve_lock:
+            if self._worker is True:
+                self._worker = process.IronPythonWorker(
+                    os.path.join(self.ipy_dir, constants.EXECUTABLE),
+                    self.pyc_abspath)
+        return self._worker
+
+    @worker.setter
+    def worker(self, value):
+        # このオブジェクトが作成したワーカーは、置き換えるときに停止する
+        with self._resolve_lock:
+            self.close()
+            self._owns_worker = value is True
+            self._worker = value
+
+    def close(self):
+        """Stop the worker created by this object.
+
+        A worker provided as the argument ``worker`` is not stopped.
+
+        .. versionadded:: 1.0.0
+
+        """
+
+        if self._owns_worker and self._worker not in (None, True):
+            self._worker.close()
 
-    def check_compilability(self, dirs_of_modules=None):
+    def check_compilability(self, dirs_of_modules=None, callback=None):
         """Check the compilability of the modules required by the scripts.
 
         This method analyzes the scripts with
-        :class:`modulefinder.ModuleFinder`. To get the results, access
-        :attr:`builtin_modules`, :attr:`compilable_modules`, and
-        :attr:`uncompilable_modules`.
+        :class:`ironpycompiler.analysis.DependencyFinder`. To get the
+        results, access :attr:`builtin_modules`, :attr:`compilable_modules`,
+        and :attr:`uncompilable_modules`.
+
+        All the scripts share one dependency graph, so a module required
+        by several scripts is scanned only once.
+
+        If :attr:`pruner` is set, the modules not imported on IronPython are
+        dropped from the result, and recorded in :attr:`pruned_modules`. If
+        :attr:`ipy_dir` is already known, the conditions are evaluated with
+        the version of that IronPython.
+
+        The directories listed by :attr:`module_index` during the previous
+        analysis are checked again, so modules added since then are found.
 
         :param list dirs_of_modules: Specify the paths of the
                                      directories where the modules your
@@ -85,20 +263,52 @@ class ModuleCompiler(object):
                                      modules in the IronPython standard
                                      library, and the CPython site-packages
                                      directory.
+        :param callback: (optional) Specify a function called with the list
+                         of the paths to the source files found at each
+                         step of the search, including the scripts. Unless
+                         they are pruned, the modules among them will be in
+                         :attr:`compilable_modules`.
+        :return: The result, which is also stored in :attr:`analysis`.
+        :rtype: :class:`ironpycompiler.analysis.AnalysisResult`
+
+        .. versionchanged:: 1.0.0
+           The scripts are analyzed with a single shared
+           :class:`ironpycompiler.analysis.DependencyFinder`. The results
+           of the previous analysis are replaced instead of being merged,
+           and the result is returned. The result is pruned by
+           :attr:`pruner`. The parameter ``callback`` was added.
 
         """
 
-        self.dirs_of_modules = dirs_of_modules
-        if self.dirs_of_modules is None:
-            self.dirs_of_modules = [os.path.join(self.ipy_dir,
-                                                 "Lib")]
-            self.dirs_of_modules += [p for p in sys.path if
-                                     "site-packages" in p]
-
-        # 各スクリプトが依存するモジュールを探索する
-        for script in self.paths_to_scripts:
-            mf = modulefinder.ModuleFinder(path=self.dirs_of_modules)
-            mf.run_script(script)
+        self.builtin_modules = set()
+        self.compilable_modules = set()
+        self.uncompilable_modules = set()
+        self.dirs_of_modules = self._module_dirs(dirs_of_modules)
+        self.module_index.refresh()
+
+        with tracing.span("check_compilability", "analysis",
+                          scripts=len(self.paths_to_scripts),
+                          jobs=self.jobs) as attrs:
+            # 各スクリプトが依存するモジュールを探索する
+            # 探索済みのモジュールは再走査されないよう、ModuleFinderを共有する
+            mf = analysis.DependencyFinder(path=self.dirs_of_modules,
+                                           import_cache=self.import_cache,
+                                           analyzer=self.analyzer,
+                                           jobs=self.jobs,
+                                           module_index=self.module_index,
+                                           callback=callback)
+            try:
+                for script in self.paths_to_scripts:
+                    with tracing.span("analyze_script", "analysis",
+                                      script=script) as script_attrs:
+                        mf.run_script(script)
+                        script_attrs["modules"] = len(mf.modules)
+            finally:
+                mf.close()
+            self.module_index.save()
+            if self.import_cache is not None:
+                self.import_cache.prune()
+
             self.uncompilable_modules |= set(mf.badmodules.keys())
             for name, module in mf.modules.iteritems():
                 path_to_module = module.__file__
@@ -111,10 +321,123 @@ class ModuleCompiler(object):
                 else:
                     self.compilable_modules.add(
                         os.path.abspath(path_to_module))
-        self.compilable_modules -= set(self.paths_to_scripts)
+            self.compilable_modules -= set(self.paths_to_scripts)
+            attrs["compilable"] = len(self.compilable_modules)
+            attrs["uncompilable"] = len(self.uncompilable_modules)
+            attrs["builtin"] = len(self.builtin_modules)
+
+        self.analysis = analysis.AnalysisResult(
+            self.paths_to_scripts, self.dirs_of_modules,
+            self.builtin_modules, self.compilable_modules,
+            self.uncompilable_modules, self.analyzer.name)
+        self.pruned_modules = {}
+        if self.pruner is not None:
+            (self.analysis, self.pruned_modules) = \
+                self.pruner.prune(self.analysis, self._known_ipy_version())
+            self.compilable_modules = set(self.analysis.compilable_modules)
+        return self.analysis
+
+    def _known_ipy_version(self):
+        """Returns the version of IronPython if :attr:`ipy_dir` is known.
+
+        None will be returned if it is not known, or the version cannot be
+        found.
+        """
+
+        if self._ipy_dir is None:
+            return None
+        try:
+            return detect.validate_pythonexe(
+                os.path.join(self._ipy_dir, constants.EXECUTABLE))
+        except exceptions.IronPythonValidationError:
+            return None
+
+    def _module_dirs(self, dirs_of_modules):
+        """Returns the directories where modules are searched for.
+
+        """
+
+        if dirs_of_modules is not None:
+            return dirs_of_modules
+        dirs = [os.path.join(self.ipy_dir, "Lib")]
+        dirs += [p for p in sys.path if "site-packages" in p]
+        return dirs
+
+    def use_analysis(self, result):
+        """Uses the result of an analysis instead of analyzing the scripts.
+
+        If the analyzed files have been changed, :meth:`create_asm` analyzes
+        the scripts again.
+
+        :param result: The result of analyzing the same scripts.
+        :type result: :class:`ironpycompiler.analysis.AnalysisResult`
+        :raises ValueError: if the scripts are different.
+
+        .. versionadded:: 1.0.0
+
+        """
+
+        if tuple(self.paths_to_scripts) != result.paths_to_scripts:
+            raise ValueError("The analysis is for different scripts.")
+        self.analysis = result
+        self.dirs_of_modules = list(result.dirs_of_modules)
+        self.builtin_modules = set(result.builtin_modules)
+        self.compilable_modules = set(result.compilable_modules)
+        self.uncompilable_modules = set(result.uncompilable_modules)
+
+    @classmethod
+    def from_analysis(cls, result, **kwargs):
+        """Creates a compiler for the scripts of an analysis.
+
+        :param result: The result of an analysis.
+        :type result: :class:`ironpycompiler.analysis.AnalysisResult`
+        :param kwargs: The other arguments of :class:`ModuleCompiler`.
+        :rtype: :class:`ModuleCompiler`
+
+        .. versionadded:: 1.0.0
+
+        """
+
+        mc = cls(list(result.paths_to_scripts), **kwargs)
+        mc.use_analysis(result)
+        return mc
+
+    def invalidate_cache(self, paths=None):
+        """Remove the cached imports and assemblies.
+
+        :param list paths: (optional) Specify the paths to the modules
+                           whose cached imports should be removed, or the
+                           whole cache, including the cached assemblies, will
+                           be cleared.
+
+        .. versionadded:: 1.0.0
+
+        """
+
+        if self.import_cache is not None:
+            self.import_cache.invalidate(paths)
+        if self.build_cache is not None and paths is None:
+            self.build_cache.invalidate()
+
+    def _build_key(self, pyc_args, executable, inputs):
+        """Returns the key of :attr:`build_cache` for the arguments.
+
+        ``inputs`` is the list of the paths to the files compiled.
+        """
+
+        ipy_exe = os.path.abspath(os.path.join(self.ipy_dir, executable))
+        sha1 = hashlib.sha1()
+        sha1.update(repr(pyc_args))
+        sha1.update(str(detect.validate_pythonexe(ipy_exe)))
+        sha1.update(cache.file_digest(self.pyc_abspath))
+        for path in inputs:
+            sha1.update(path)
+            sha1.update(cache.file_digest(path))
+        return sha1.hexdigest()
 
     def call_pyc(self, args, delete_resp=True,
-                 executable=constants.EXECUTABLE, cwd=None):
+                 executable=constants.EXECUTABLE, cwd=None, callback=None,
+                 timeout=None, cancel=None):
         """Call pyc.py in order to compile your scripts.
 
         In general use this method is not supposed to be called
@@ -128,51 +451,112 @@ class ModuleCompiler(object):
         :param str executable: (optional) Specify the name of the
                                Ironpython exectuable.
         :param str cwd: (optional) Specify the current working directory.
+        :param callback: (optional) Specify a function called with each
+                         line of the output from pyc.py as soon as it is
+                         written.
+        :param float timeout: (optional) Specify the number of seconds
+                              after which pyc.py is killed.
+        :param cancel: (optional) Specify a :class:`threading.Event` which
+                       kills pyc.py when it is set.
+        :raises ironpycompiler.exceptions.IronPythonInterruptedError: if
+                pyc.py is killed because of ``timeout`` or ``cancel``.
+
+        See also :func:`ironpycompiler.process.execute_ipy`. :attr:`worker`
+        is not used with ``callback`` or ``cancel``, nor while it is
+        compiling another assembly, so that concurrent compilations, like
+        the layers and the shards of :meth:`create_asm`, run in parallel.
 
         .. versionchanged:: 1.0.0
-           Now uses :func:`ironpycompiler.process.execute_ipy`.
+           Now uses :func:`ironpycompiler.process.execute_ipy`, or
+           :attr:`worker` if it runs the same executable and pyc.py. The
+           parameters ``callback``, ``timeout``, and ``cancel`` were
+           added.
+
+        """
+
+        (self.response_file, self.pyc_stdout, retcode) = self._execute_pyc(
+            args, delete_resp, executable, cwd, callback, timeout, cancel)
+
+        # ipyのエラーを確認する
+        if retcode != 0:
+            raise exceptions.ModuleCompilationError(
+                msg="{0} returned {1} exit status.".format(executable,
+                                                           retcode))
+
+    def _execute_pyc(self, args, delete_resp, executable, cwd,
+                     callback=None, timeout=None, cancel=None):
+        """Does the same as :meth:`call_pyc` without changing attributes.
 
+        This method can be called from several threads at the same time.
+        Returns a tuple containing the response file, the output from pyc.py,
+        and the return code.
         """
 
         if cwd is None:
             cwd = os.getcwd()
 
-        # レスポンスファイルを作る
-        self.response_file = tempfile.mkstemp(suffix=".txt",
-                                              text=True, prefix="IPC")
+        with tracing.span("write_response_file", "compiler") as attrs:
+            # レスポンスファイルを作る
+            response_file = tempfile.mkstemp(suffix=".txt", text=True,
+                                             prefix="IPC")
 
-        # レスポンスファイルに書き込む
-        for line in args:
-            os.write(self.response_file[0], line + "\n")
+            # レスポンスファイルに書き込む
+            written = 0
+            for line in args:
+                written += os.write(response_file[0], line + "\n")
 
-        # レスポンスファイルを閉じる
-        os.close(self.response_file[0])
+            # レスポンスファイルを閉じる
+            os.close(response_file[0])
+            attrs["bytes"] = written
 
         # pyc.pyを実行する
-        ipy_args = [self.pyc_abspath, "@" + self.response_file[1]]
         ipy_exe = os.path.abspath(os.path.join(self.ipy_dir, executable))
-        ipy_result = process.execute_ipy(arguments=ipy_args,
-                                         path_to_exe=ipy_exe, cwd=cwd)
-        self.pyc_stdout = ipy_result[0]
+        try:
+            if self._use_worker(ipy_exe, callback, cancel):
+                try:
+                    ipy_result = self.worker.compile(
+                        ["@" + response_file[1]], cwd, timeout)
+                finally:
+                    self._worker_busy.release()
+            else:
+                ipy_args = [self.pyc_abspath, "@" + response_file[1]]
+                ipy_result = process.execute_ipy(
+                    arguments=ipy_args, path_to_exe=ipy_exe, cwd=cwd,
+                    callback=callback, timeout=timeout, cancel=cancel)
+        finally:
+            # レスポンスファイルを削除する
+            if delete_resp:
+                os.remove(response_file[1])
 
-        # レスポンスファイルを削除する
-        if delete_resp:
-            os.remove(self.response_file[1])
+        return (response_file, ipy_result[0], ipy_result[1])
 
-        # ipyのエラーを確認する
-        if ipy_result[1] != 0:
-            raise exceptions.ModuleCompilationError(
-                msg="{0} returned {1} exit status.".format(executable,
-                                                           ipy_result[1]))
+    def _use_worker(self, ipy_exe, callback, cancel):
+        """Checks whether :attr:`worker` can run pyc.py now.
+
+        If it returns True, the caller must release the worker.
+        """
+
+        worker = self.worker
+        if worker is None or callback is not None or cancel is not None:
+            return False
+        if os.path.normcase(worker.path_to_exe) != os.path.normcase(ipy_exe) \
+           or os.path.normcase(worker.pyc_path) != \
+           os.path.normcase(os.path.abspath(self.pyc_abspath)):
+            return False
+        return self._worker_busy.acquire(False)
 
     def create_asm(self, out=None, target_asm="dll", target_platform=None,
                    embed=True, standalone=True, mta=False, delete_resp=True,
-                   executable=constants.EXECUTABLE, copy_ipydll=False):
+                   executable=constants.EXECUTABLE, copy_ipydll=False,
+                   layered=False, shards=1, callback=None, timeout=None,
+                   cancel=None, minify=False, references=None,
+                   jobs=constants.COMPILE_JOBS):
         """Compile your scripts into a .NET assembly, using pyc.py.
 
-        This method compiles the scripts by calling pyc.py. If
-        :attr:`compilable_modules` is empty, the scripts will be
-        analyzed using :meth:`check_compilability`. For the detail of
+        This method compiles the scripts by calling pyc.py. If the scripts
+        have not been analyzed and :attr:`compilable_modules` is empty, or
+        the files in :attr:`analysis` have been changed, the scripts will
+        be analyzed using :meth:`check_compilability`. For the detail of
         compilation see the source code of pyc.py.
 
         :param str out: (optional) Specify the name of the EXE file
@@ -196,69 +580,765 @@ class ModuleCompiler(object):
                                  response file after compilation or not.
         :param str executable: (optional) Specify the name of the
                                Ironpython exectuable.
-        :param bool copy_ipydll: (optional) Specify whether to copy the
-                                 IronPython DLL files into the
-                                 destination directory.
+        :param copy_ipydll: (optional) Specify whether to copy the
+                            IronPython DLL files into the destination
+                            directory during compilation, or the list of
+                            the names of the files which should be copied
+                            (see :func:`gather_ipydll`).
+        :param bool layered: (optional) Specify whether to compile the
+                             modules in :attr:`dirs_of_modules` (the
+                             standard library and site-packages) into a
+                             separate DLL.
+        :param int shards: (optional) Specify the number of the DLLs into
+                           which the other modules are divided. The DLLs
+                           are compiled in parallel.
+        :param callback: (optional) Specify a function called with each
+                         line of the output from pyc.py. It may be called
+                         from several threads.
+        :param float timeout: (optional) Specify the number of seconds
+                              after which each pyc.py job is killed.
+        :param cancel: (optional) Specify a :class:`threading.Event` which
+                       kills pyc.py when it is set.
+        :param bool minify: (optional) Specify whether to compile copies of
+                            the scripts and the modules without the
+                            docstrings and the assertions.
+        :param dict references: (optional) Specify the assemblies compiled
+                                separately, like the one created by
+                                :func:`compile_shared`, as a dictionary
+                                mapping the path to each assembly to the
+                                paths to the modules in it.
+        :param int jobs: (optional) Specify the maximum number of the
+                         IronPython processes run at the same time. The
+                         IronPython DLLs are copied in addition to them.
+
+        See :meth:`call_pyc` for ``callback``, ``timeout``, and ``cancel``.
+
+        If ``cache_dir`` was specified, the generated files are cached. They
+        are restored instead of calling pyc.py if the scripts, the modules,
+        the arguments to pyc.py, the version of IronPython, and pyc.py are
+        all unchanged. See also :attr:`cache_hit`.
+
+        If ``layered`` is true, the dependency layer is compiled into
+        ``ipcdeps_<digest>.dll`` (see :attr:`dependency_asm`) in the
+        destination directory, whose name depends only on the set of the
+        modules. With ``cache_dir`` it is reused as long as the modules are
+        unchanged, so that only the scripts and the other modules are
+        compiled again. An executable loads the dependency layer with
+        ``clr.AddReference``, which is inserted at the beginning of a copy
+        of the main script; the dependency layer is not embedded, and must
+        be deployed with the executable. A DLL does not load it
+        automatically.
+
+        If ``shards`` is more than 1, the modules which are not in the
+        dependency layer are divided into ``<output>_shard<n>.dll`` (see
+        :attr:`shard_asms`), so that their sizes are balanced and each
+        top-level package is in one DLL. These DLLs, the dependency layer,
+        and the main assembly are compiled by up to ``jobs`` concurrent
+        IronPython processes, and the DLLs are loaded in the same way as the
+        dependency layer. A main DLL then contains only the scripts, so the
+        application must reference the DLLs listed in
+        :attr:`required_asms` itself.
+
+        If ``minify`` is true, the scripts and the modules are transformed
+        by :func:`ironpycompiler.transform.stage_minified`, like the option
+        ``-OO``, and the copies are compiled instead. The line numbers do not
+        change, but ``__file__`` and the file names in tracebacks are the
+        paths to the copies, and ``__doc__`` is None. With ``cache_dir`` the
+        copies are kept in the cache, and are transformed again only if the
+        files have been changed. See :attr:`minified_modules`.
+
+        The modules in ``references`` are not compiled, and an executable
+        loads the assemblies in the same way as the dependency layer. The
+        assemblies must be deployed with the executable.
+
+        .. versionchanged:: 1.0.0
+           The generated files are cached. The parameters ``layered``,
+           ``shards``, ``callback``, ``timeout``, ``cancel``, ``minify``,
+           ``references``, and ``jobs`` were added. An analysis finding no
+           compilable modules is not repeated.
 
         """
 
-        if self.compilable_modules == set():
-            self.check_compilability()
+        self._ensure_analysis()
+
+        self.output_asm = self._output_path(out, target_asm)
+        output_dir = os.path.dirname(self.output_asm)
+
+        # 他のアセンブリにあるモジュールはコンパイルしない
+        references = references or {}
+        referenced = set()
+        for modules in references.values():
+            referenced.update(modules)
+        compilable = self.compilable_modules - referenced
+
+        app_modules = sorted(compilable)
+        dep_modules = []
+        if layered:
+            dep_modules = [m for m in self._dependency_modules()
+                           if m in compilable]
+            app_modules = sorted(compilable - set(dep_modules))
+        shard_modules = []
+        if shards > 1:
+            shard_modules = self._partition_modules(app_modules, shards)
+            app_modules = []
+
+        # 別のアセンブリにコンパイルされるモジュール群
+        libraries = []
+        self.dependency_asm = None
+        if dep_modules:
+            # 依存レイヤーの名前はモジュールの組だけで決まるので、
+            # 同じ依存関係を持つアプリケーション間で共有される
+            dep_name = "ipcdeps_" + hashlib.sha1(
+                "\n".join(dep_modules)).hexdigest()[:12]
+            self.dependency_asm = os.path.join(output_dir, dep_name + ".dll")
+            libraries.append((dep_name, dep_modules))
+        self.shard_asms = []
+        output_base = os.path.splitext(os.path.basename(self.output_asm))[0]
+        for (i, modules) in enumerate(shard_modules):
+            shard_name = "{}_shard{}".format(output_base, i)
+            self.shard_asms.append(os.path.join(output_dir,
+                                                shard_name + ".dll"))
+            libraries.append((shard_name, modules))
+
+        scripts = list(self.paths_to_scripts)
+        temp_staging_dir = None
+        self.minified_modules = {}
+        try:
+            if self.cache_dir is not None:
+                staging_dir = os.path.join(self.cache_dir, "staging")
+            elif minify or ((libraries or references) and
+                            target_asm in ["exe", "winexe"]):
+                staging_dir = temp_staging_dir = tempfile.mkdtemp(
+                    prefix="IPC")
+            if minify:
+                (staged, self.minified_modules) = self._minify(
+                    scripts + list(compilable),
+                    os.path.join(staging_dir, "minified"))
+                scripts = [staged[p] for p in scripts]
+                app_modules = [staged[p] for p in app_modules]
+                libraries = [(name, [staged[p] for p in modules])
+                             for (name, modules) in libraries]
+            if (libraries or references) and target_asm in ["exe", "winexe"]:
+                names = [os.path.splitext(os.path.basename(a))[0]
+                         for a in sorted(references)]
+                names += [n for (n, m) in libraries]
+                scripts[0] = transform.stage_script(
+                    scripts[0], staging_dir,
+                    transform.reference_prologue(names))
+
+            pyc_args = ["/out:" + os.path.splitext(self.output_asm)[0]]
 
-        if out is None:
-            output_basename = os.path.splitext(os.path.basename(
-                self.paths_to_scripts[0]))[0]
             if target_asm in ["exe", "winexe"]:
-                output_basename += ".exe"
+                pyc_args.append("/target:" + target_asm)
+                pyc_args.append("/main:" + scripts[0])
+                if target_platform in ["x86", "x64"]:
+                    pyc_args.append("/platform:" + target_platform)
+                if embed:
+                    pyc_args.append("/embed")
+                if standalone:
+                    pyc_args.append("/standalone")
+            if target_asm == "winexe" and mta:
+                pyc_args.append("/mta")
+            pyc_args += scripts
+            pyc_args += app_modules
+
+            # 参照は実行時に解決されるので、全てのアセンブリを並行して
+            # コンパイルできる
+            tasks = [(os.path.join(output_dir, name + ".dll"),
+                      ["/out:" + name] + modules, modules)
+                     for (name, modules) in libraries]
+            tasks.append((self.output_asm, pyc_args, scripts + app_modules))
+
+            def run_task(task):
+                return self._compile(task[0], task[1], task[2], delete_resp,
+                                     executable, callback, timeout, cancel)
+
+            # IronPythonのDLLはコンパイルと並行して、別のスレッドでコピーする
+            copier = None
+            if copy_ipydll:
+                allowlist = None
+                if not isinstance(copy_ipydll, bool):
+                    allowlist = list(copy_ipydll)
+                copier = ThreadPool(1)
+                copied = copier.apply_async(gather_ipydll, (), {
+                    "dest_dir": output_dir, "ipy_dir": self.ipy_dir,
+                    "allowlist": allowlist})
+                copier.close()
+            try:
+                # IronPythonのプロセスの数をjobsまでに抑える
+                threads = min(len(tasks), max(1, jobs))
+                with tracing.span("compile_jobs", "compiler",
+                                  jobs=len(tasks), threads=threads):
+                    if threads > 1:
+                        pool = ThreadPool(threads)
+                        try:
+                            results = pool.map(run_task, tasks, 1)
+                        finally:
+                            pool.close()
+                            pool.join()
+                    else:
+                        results = [run_task(task) for task in tasks]
+            finally:
+                if copier is not None:
+                    copier.join()
+            self.ipydll_stats = copied.get() if copier is not None else None
+        finally:
+            if temp_staging_dir is not None:
+                shutil.rmtree(temp_staging_dir, ignore_errors=True)
+
+        self.required_asms = sorted(references)
+        if self.dependency_asm is not None:
+            self.required_asms.append(self.dependency_asm)
+        self.required_asms += self.shard_asms
+        self.cache_hit = all(hit for (hit, stdout) in results)
+        self.pyc_stdout = "".join(stdout for (hit, stdout) in results
+                                  if stdout is not None)
+
+    def _output_path(self, out, target_asm):
+        """Returns the absolute path to the main output assembly.
+
+        """
+
+        if out is not None:
+            return os.path.abspath(out)
+        output_basename = os.path.splitext(os.path.basename(
+            self.paths_to_scripts[0]))[0]
+        if target_asm in ["exe", "winexe"]:
+            output_basename += ".exe"
+        else:
+            output_basename += ".dll"
+        return os.path.join(os.getcwd(), output_basename)
+
+    def _ensure_analysis(self):
+        """Analyzes the scripts unless the analysis is available and current.
+
+        """
+
+        if self.analysis is None:
+            # 解析せずに設定されたモジュールはそのまま使う
+            if not self.compilable_modules:
+                self.check_compilability()
+        elif not self.analysis.is_current():
+            self.check_compilability(list(self.analysis.dirs_of_modules))
+
+    def _minify(self, paths, staging_dir):
+        """Writes the minified copies of the files.
+
+        Returns the dictionaries mapping the paths to the files to the paths
+        to the copies, and to the numbers of the bytes saved. This method
+        can be called from several threads at the same time.
+        """
+
+        dirs = [os.path.abspath(d) for d in self.dirs_of_modules or []]
+        staged = {}
+        saved = {}
+        with tracing.span("minify", "compiler", files=len(paths)) as attrs:
+            for path in paths:
+                # パッケージの構造を保つため、モジュールのディレクトリを基準にする
+                roots = [d for d in dirs
+                         if path.startswith(os.path.join(d, ""))]
+                root = max(roots, key=len) if roots else \
+                    os.path.dirname(path)
+                (staged[path], saved[path]) = transform.stage_minified(
+                    path, root, staging_dir)
+            attrs["saved"] = sum(saved.values())
+        return (staged, saved)
+
+    def _partition_modules(self, modules, shards):
+        """Partitions the modules into shards of similar source sizes.
+
+        The modules in the same top-level package are put into the same
+        shard.
+        """
+
+        dirs = [os.path.join(os.path.abspath(d), "") for d in
+                self.dirs_of_modules]
+        groups = {}
+        for module in modules:
+            for d in dirs:
+                if module.startswith(d):
+                    top = module[len(d):].split(os.sep)[0]
+                    key = os.path.join(d, top)
+                    break
             else:
-                output_basename += ".dll"
-            self.output_asm = os.path.join(os.getcwd(), output_basename)
+                key = os.path.dirname(module)
+            groups.setdefault(key, []).append(module)
+
+        # 大きいグループから順に、最も小さいシャードに割り当てる
+        weighted = sorted((-sum(os.path.getsize(m) for m in members), key)
+                          for (key, members) in groups.items())
+        bins = [[0, i, []] for i in range(shards)]
+        for (weight, key) in weighted:
+            smallest = min(bins)
+            smallest[0] -= weight
+            smallest[2].extend(groups[key])
+        return [sorted(b[2]) for b in bins if b[2]]
+
+    def _dependency_modules(self):
+        """Returns the compilable modules in :attr:`dirs_of_modules`.
+
+        """
+
+        dirs = [os.path.join(os.path.abspath(d), "") for d in
+                self.dirs_of_modules]
+        return sorted(m for m in self.compilable_modules
+                      if any(m.startswith(d) for d in dirs))
+
+    def _compile(self, output_asm, pyc_args, inputs, delete_resp,
+                 executable, callback=None, timeout=None, cancel=None):
+        """Runs pyc.py, or restores the outputs from :attr:`build_cache`.
+
+        This method can be called from several threads at the same time.
+        Returns a tuple showing whether the outputs were restored, and the
+        output from pyc.py.
+        """
+
+        if self._shared_outputs is not None:
+            return self._shared_outputs.run(
+                output_asm, pyc_args, inputs,
+                lambda: self._compile_output(
+                    output_asm, pyc_args, inputs, delete_resp, executable,
+                    callback, timeout, cancel))
+        return self._compile_output(output_asm, pyc_args, inputs,
+                                    delete_resp, executable, callback,
+                                    timeout, cancel)
+
+    def _compile_output(self, output_asm, pyc_args, inputs, delete_resp,
+                        executable, callback=None, timeout=None, cancel=None):
+        """Does the same as :meth:`_compile` for this compiler alone.
+
+        """
+
+        with tracing.span("compile", "compiler",
+                          output=os.path.basename(output_asm),
+                          inputs=len(inputs)) as attrs:
+            output_dir = os.path.dirname(output_asm)
+            if self.build_cache is not None:
+                build_key = self._build_key(pyc_args, executable, inputs)
+                info = self.build_cache.get(build_key, output_dir)
+                if info is not None:
+                    attrs["cache_hit"] = True
+                    return (True, info.get("stdout"))
+
+            before = _snapshot_outputs(output_asm)
+            slots = self._compile_slots
+            if slots is not None:
+                slots.acquire()
+            try:
+                (response_file, stdout, retcode) = self._execute_pyc(
+                    pyc_args, delete_resp, executable, output_dir, callback,
+                    timeout, cancel)
+            finally:
+                if slots is not None:
+                    slots.release()
+            if retcode != 0:
+                self.pyc_stdout = stdout
+                raise exceptions.ModuleCompilationError(
+                    msg="{0} returned {1} exit status.".format(executable,
+                                                               retcode))
+            if self.build_cache is not None:
+                after = _snapshot_outputs(output_asm)
+                # 同じ大きさで更新日時の分解能内に書き直されても、
+                # アセンブリとそのPDBは必ず含める
+                pdb = os.path.splitext(output_asm)[0] + ".pdb"
+                outputs = [p for p in sorted(after)
+                           if before.get(p) != after[p] or
+                           p in (output_asm, pdb)]
+                if outputs:
+                    self.build_cache.put(build_key, outputs,
+                                         {"stdout": stdout})
+            attrs["cache_hit"] = False
+            return (False, stdout)
+
+
+class _SharedOutputs(object):
+
+    """Compiles each assembly only once among several compilers.
+
+    The compilers of :func:`compile_variants` writing into the same
+    directory may compile the same dependency layer or shards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outputs = {}  # パス -> [引数, 入力, Event, 結果, 例外]
+
+    def run(self, output_asm, pyc_args, inputs, function):
+        """Calls ``function`` unless another compiler compiles the assembly.
+
+        The result of the first call is returned, showing that the outputs
+        were restored.
+        """
+
+        key = os.path.normcase(os.path.abspath(output_asm))
+        with self._lock:
+            entry = self._outputs.get(key)
+            owner = entry is None
+            if owner:
+                entry = [list(pyc_args), list(inputs), threading.Event(),
+                         None, None]
+                self._outputs[key] = entry
+        if owner:
+            try:
+                entry[3] = function()
+            except BaseException as e:
+                entry[4] = e
+                raise
+            finally:
+                entry[2].set()
+            return entry[3]
+        if entry[:2] != [list(pyc_args), list(inputs)]:
+            raise ValueError("{} is compiled differently by two "
+                             "variants.".format(output_asm))
+        entry[2].wait()
+        if entry[4] is not None:
+            raise entry[4]
+        return (True, entry[3][1])
+
+
+def _snapshot_outputs(output_asm):
+    """Returns the sizes and mtimes of the files which pyc.py may generate.
+
+    """
+
+    output_dir = os.path.dirname(output_asm)
+    basename = os.path.splitext(os.path.basename(output_asm))[0]
+    snapshot = {}
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        (root, ext) = os.path.splitext(name)
+        if root == basename and ext.lower() in (".dll", ".exe", ".pdb") \
+           and os.path.isfile(path):
+            st = os.stat(path)
+            snapshot[path] = (st.st_size, st.st_mtime)
+    return snapshot
+
+
+def compile_variants(result, variants, jobs=constants.COMPILE_JOBS,
+                     **kwargs):
+    """Compiles the analyzed scripts into several assemblies concurrently.
+
+    Each variant is compiled by its own :class:`ModuleCompiler` using the
+    same analysis. If the analyzed files have been changed, the scripts are
+    analyzed again only once. An assembly written by several variants, like
+    the dependency layer of ``layered`` variants in the same directory, is
+    compiled only once. For example::
+
+        result = ModuleCompiler(["main.py"]).check_compilability()
+        compile_variants(result, [
+            {"out": "x86/app.exe", "target_asm": "exe",
+             "target_platform": "x86"},
+            {"out": "x64/app.exe", "target_asm": "exe",
+             "target_platform": "x64"}])
+
+    :param result: The result of analyzing the scripts.
+    :type result: :class:`ironpycompiler.analysis.AnalysisResult`
+    :param list variants: The keyword arguments of
+                          :meth:`ModuleCompiler.create_asm` for each
+                          variant.
+    :param int jobs: (optional) The maximum number of the variants compiled
+                     at the same time.
+    :param kwargs: The other arguments of :class:`ModuleCompiler`. If
+                   ``ipy_dir`` is not specified, IronPython is detected
+                   only once.
+    :return: The compilers of the variants, in the same order.
+    :rtype: list
+
+    .. versionadded:: 1.0.0
+    """
+
+    if kwargs.get("ipy_dir") is None:
+        kwargs["ipy_dir"] = detect.auto_detect()[1]
+    if not result.is_current():
+        # 各バリアントが解析し直さないよう、ここで一度だけ解析する
+        result = ModuleCompiler(list(result.paths_to_scripts),
+                                **kwargs).check_compilability(
+                                    list(result.dirs_of_modules))
+    compilers = [ModuleCompiler.from_analysis(result, **kwargs)
+                 for v in variants]
+    shared_outputs = _SharedOutputs()
+    for mc in compilers:
+        mc._shared_outputs = shared_outputs
+
+    def compile_variant(i):
+        compilers[i].create_asm(**variants[i])
+
+    with tracing.span("compile_variants", "compiler",
+                      variants=len(variants)):
+        pool = ThreadPool(max(1, min(jobs, len(variants))))
+        try:
+            pool.map(compile_variant, range(len(variants)))
+        finally:
+            pool.close()
+            pool.join()
+    return compilers
+
+
+def compile_shared(projects, shared_out, jobs=None,
+                   executable=constants.EXECUTABLE, timeout=None,
+                   minify=False):
+    """Compiles the modules required by all the projects into a shared DLL.
+
+    The intersection of :attr:`ModuleCompiler.compilable_modules` of the
+    projects is compiled only once into ``shared_out``, and each project is
+    compiled with only its own modules and a reference to the shared DLL
+    (see the parameter ``references`` of :meth:`ModuleCompiler.create_asm`).
+    The references are resolved at runtime, so the shared DLL and the
+    projects are compiled concurrently. Then the shared DLL is deployed
+    into the destination directory of each project, with a hard link if
+    possible. For example::
+
+        compile_shared([
+            (ModuleCompiler(["app1.py"]), {"out": "app1/app1.exe",
+                                           "target_asm": "exe"}),
+            (ModuleCompiler(["app2.py"]), {"out": "app2/app2.exe",
+                                           "target_asm": "exe"})],
+            "shared/ipcshared.dll")
+
+    The projects should be analyzed with the same ``dirs_of_modules``, or
+    they are analyzed if necessary. The shared DLL is compiled with the
+    first project, whose :attr:`ModuleCompiler.build_cache` is used.
+
+    :param list projects: The pairs of a :class:`ModuleCompiler` and the
+                          keyword arguments of
+                          :meth:`ModuleCompiler.create_asm`. The shared DLL
+                          is added to their ``references``.
+    :param str shared_out: The path to the shared DLL.
+    :param int jobs: (optional) The maximum number of the assemblies
+                     compiled at the same time. By default all the
+                     assemblies are compiled at the same time.
+    :param str executable: (optional) The name of the IronPython executable
+                           compiling the shared DLL.
+    :param float timeout: (optional) The number of seconds after which
+                          pyc.py compiling the shared DLL is killed.
+    :param bool minify: (optional) Specify whether to minify the shared
+                        modules (see :meth:`ModuleCompiler.create_asm`).
+    :return: The paths to the modules in the shared DLL.
+    :rtype: list
+
+    .. versionadded:: 1.0.0
+    """
+
+    if not projects:
+        return []
+    for (mc, options) in projects:
+        mc._ensure_analysis()
+    shared = sorted(set.intersection(*[mc.compilable_modules
+                                       for (mc, options) in projects]))
+    shared_out = os.path.abspath(shared_out)
+    owner = projects[0][0]
+    references = {shared_out: shared} if shared else {}
+
+    def compile_library():
+        modules = shared
+        temp_staging_dir = None
+        try:
+            if minify:
+                if owner.cache_dir is not None:
+                    staging_dir = os.path.join(owner.cache_dir, "staging")
+                else:
+                    staging_dir = temp_staging_dir = tempfile.mkdtemp(
+                        prefix="IPC")
+                staged = owner._minify(modules, os.path.join(
+                    staging_dir, "minified"))[0]
+                modules = [staged[m] for m in modules]
+            name = os.path.splitext(os.path.basename(shared_out))[0]
+            owner._compile(shared_out, ["/out:" + name] + modules, modules,
+                           True, executable, timeout=timeout)
+        finally:
+            if temp_staging_dir is not None:
+                shutil.rmtree(temp_staging_dir, ignore_errors=True)
+
+    def compile_job(i):
+        if i < 0:
+            compile_library()
         else:
-            self.output_asm = os.path.abspath(out)
+            (mc, options) = projects[i]
+            options = dict(options)
+            merged = dict(options.get("references") or {})
+            merged.update(references)
+            options["references"] = merged
+            mc.create_asm(**options)
 
-        pyc_args = ["/out:" + os.path.splitext(self.output_asm)[0]]
+    job_ids = range(len(projects))
+    if shared:
+        job_ids.insert(0, -1)
+    with tracing.span("compile_shared", "compiler", projects=len(projects),
+                      shared=len(shared)):
+        pool = ThreadPool(max(1, min(jobs or len(job_ids), len(job_ids))))
+        try:
+            pool.map(compile_job, job_ids)
+        finally:
+            pool.close()
+            pool.join()
 
-        if target_asm in ["exe", "winexe"]:
-            pyc_args.append("/target:" + target_asm)
-            pyc_args.append("/main:" + self.paths_to_scripts[0])
-            if target_platform in ["x86", "x64"]:
-                pyc_args.append("/platform:" + target_platform)
-            if embed:
-                pyc_args.append("/embed")
-            if standalone:
-                pyc_args.append("/standalone")
-        if target_asm == "winexe" and mta:
-            pyc_args.append("/mta")
-        pyc_args += self.paths_to_scripts
-        pyc_args += self.compilable_modules
-
-        call_args = {"args": pyc_args, "delete_resp": delete_resp,
-                     "executable": executable,
-                     "cwd": os.path.dirname(self.output_asm)}
-
-        self.call_pyc(**call_args)
-
-        if copy_ipydll:
-            gather_ipydll(dest_dir=os.path.dirname(self.output_asm),
-                          ipy_dir=self.ipy_dir)
-
-
-def gather_ipydll(dest_dir, ipy_dir=None):
+        if shared:
+            with tracing.span("deploy_shared", "compiler"):
+                for (mc, options) in projects:
+                    dest_dir = os.path.dirname(mc.output_asm)
+                    if os.path.normcase(dest_dir) != os.path.normcase(
+                            os.path.dirname(shared_out)):
+                        _deploy_file(shared_out, os.path.join(
+                            dest_dir, os.path.basename(shared_out)), False,
+                            _same_device(shared_out, dest_dir))
+    return shared
+
+
+def gather_ipydll(dest_dir, ipy_dir=None, allowlist=None, verify_hash=False,
+                  link=True, jobs=constants.COPY_JOBS):
     """ Copy the IronPython DLL files into the directory specified.
 
+    A file is skipped if the destination has the same size and modification
+    time (and the same content if ``verify_hash`` is true), or is the same
+    file. Otherwise it is cloned with a reflink if the file system supports
+    it, hard-linked if ``link`` is true and the directories are on the same
+    file system, or copied. The files are processed in parallel.
+
     :param str dest_dir: The path of the destination directory.
     :param str ipy_dir: Specify the path of the IronPython directory, or
                         it will be detected using
                         :func:`ironpycompiler.detect.auto_detect`.
+    :param list allowlist: (optional) Specify the names of the DLL files
+                           which should be copied, like
+                           ``"IronPython.dll"``. Wildcards are allowed,
+                           and the case is ignored. By default all the DLL
+                           files are copied.
+    :param bool verify_hash: (optional) Specify whether to compare the
+                             contents of the files whose sizes and
+                             modification times are the same.
+    :param bool link: (optional) Specify whether to create hard links.
+                      Modifying a hard link also modifies the original
+                      file.
+    :param int jobs: (optional) The number of the files processed at the
+                     same time.
+    :return: A dictionary containing the numbers of the files ``"copied"``,
+             ``"linked"`` (hard links and reflinks), and ``"skipped"``,
+             the number of the bytes written (``"bytes_written"``), and
+             the list of the names in ``allowlist`` matching no file
+             (``"missing"``).
+    :rtype: dict
 
     .. versionadded:: 0.9.0
 
     .. versionchanged:: 0.10.0
        This function now uses :func:`ironpycompiler.detect.auto_detect`.
 
+    .. versionchanged:: 1.0.0
+       Unchanged files are skipped. The parameters ``allowlist``,
+       ``verify_hash``, ``link``, and ``jobs`` were added, and the
+       statistics are returned. The files are hard-linked by default, and
+       an outdated destination file is removed before it is replaced, so
+       a hard link to another file is never modified.
+
     """
 
     if ipy_dir is None:
         ipy_dir = detect.auto_detect()[1]
-    for dll in glob.glob(os.path.join(ipy_dir, "*.dll")):
-        shutil.copy2(dll, dest_dir)
+    dlls = sorted(glob.glob(os.path.join(ipy_dir, "*.dll")))
+    missing = []
+    if allowlist is not None:
+        patterns = [p.lower() for p in allowlist]
+        names = [os.path.basename(d).lower() for d in dlls]
+        missing = [p for p in allowlist
+                   if not fnmatch.filter(names, p.lower())]
+        dlls = [d for d in dlls if any(
+            fnmatch.fnmatchcase(os.path.basename(d).lower(), p)
+            for p in patterns)]
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    same_device = _same_device(ipy_dir, dest_dir)
+
+    def deploy(dll):
+        return _deploy_file(dll, os.path.join(dest_dir, os.path.basename(dll)),
+                            verify_hash, link and same_device)
+
+    with tracing.span("gather_ipydll", "compiler", files=len(dlls)) as attrs:
+        if jobs > 1 and len(dlls) > 1:
+            pool = ThreadPool(min(jobs, len(dlls)))
+            try:
+                results = pool.map(deploy, dlls)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [deploy(dll) for dll in dlls]
+        stats = {"copied": 0, "linked": 0, "skipped": 0, "bytes_written": 0,
+                 "missing": missing}
+        for (action, written) in results:
+            stats[action] += 1
+            stats["bytes_written"] += written
+        attrs.update(stats)
+    return stats
+
+
+def _same_device(path1, path2):
+    """Checks whether the paths are on the same file system.
+
+    """
+
+    try:
+        return os.stat(path1).st_dev == os.stat(path2).st_dev
+    except EnvironmentError:
+        return False
+
+
+def _deploy_file(src, dest, verify_hash, link):
+    """Copies a file unless the destination is up to date.
+
+    Returns the action (``"copied"``, ``"linked"``, or ``"skipped"``) and
+    the number of the bytes written.
+    """
+
+    src_stat = os.stat(src)
+    try:
+        dest_stat = os.stat(dest)
+    except EnvironmentError:
+        dest_stat = None
+    if dest_stat is not None:
+        if os.path.samestat(src_stat, dest_stat):
+            return ("skipped", 0)
+        # copy2はmtimeを保つが、ファイルシステムによっては精度が落ちる
+        if src_stat.st_size == dest_stat.st_size and \
+           int(src_stat.st_mtime) == int(dest_stat.st_mtime) and \
+           (not verify_hash or
+                cache.file_digest(src) == cache.file_digest(dest)):
+            return ("skipped", 0)
+        os.remove(dest)
+
+    if _reflink(src, dest):
+        shutil.copystat(src, dest)
+        return ("linked", 0)
+    # Windows版のPython 2にはos.linkがない
+    if link and hasattr(os, "link"):
+        try:
+            os.link(src, dest)
+            return ("linked", 0)
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+    return ("copied", src_stat.st_size)
+
+
+# Linuxのioctl FICLONE
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dest):
+    """Clones a file with a reflink, which shares the data until either is
+    modified. Returns whether it succeeded.
+
+    """
+
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(src, "rb") as src_file:
+            with open(dest, "wb") as dest_file:
+                fcntl.ioctl(dest_file.fileno(), _FICLONE,
+                            src_file.fileno())
+        return True
+    except EnvironmentError:
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
@@ -10,3 +10,54 @@ REGKEYS = ["SOFTWARE\\IronPython", "SOFTWARE\\Wow6432Node\\IronPython"]
 
 #: The default name of the IronPython executable.
 EXECUTABLE = "ipy.exe"
+
+#: The default maximum size of :class:`ironpycompiler.cache.ImportCache`
+#: in bytes.
+IMPORT_CACHE_MAX_SIZE = 32 * 1024 * 1024
+
+#: The default maximum size of :class:`ironpycompiler.cache.BuildCache`
+#: in bytes.
+BUILD_CACHE_MAX_SIZE = 512 * 1024 * 1024
+
+#: The prefix of the responses from
+#: :class:`ironpycompiler.process.IronPythonWorker`.
+WORKER_MARKER = "@@ipc "
+
+#: The default number of seconds to wait for
+#: :class:`ironpycompiler.process.IronPythonWorker` to start or to answer
+#: a health check.
+WORKER_TIMEOUT = 60
+
+#: The environment variable specifying the directory where the results
+#: shared by all the projects, like the detected IronPython executables,
+#: are cached.
+CACHE_DIR_ENV = "IRONPYCOMPILER_CACHE_DIR"
+
+#: The default number of seconds after which the validation of an IronPython
+#: executable fails in detection.
+VALIDATION_TIMEOUT = 30
+
+#: The maximum number of the IronPython executables validated concurrently.
+VALIDATION_JOBS = 8
+
+#: The default number of seconds without changes after which
+#: :class:`ironpycompiler.watch.ProjectWatcher` rebuilds the scripts.
+WATCH_DEBOUNCE = 0.3
+
+#: The default number of seconds between the checks of
+#: :class:`ironpycompiler.watch.PollingObserver`.
+WATCH_INTERVAL = 0.5
+
+#: The default number of the files copied concurrently by
+#: :func:`ironpycompiler.compiler.gather_ipydll`.
+COPY_JOBS = 4
+
+#: The default number of the IronPython processes which
+#: :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm` runs at the
+#: same time.
+COMPILE_JOBS = 4
+
+#: The default number of the modules which
+#: :class:`ironpycompiler.pipeline.PipelinedCompiler` compiles into each
+#: assembly during analysis.
+PIPELINE_BATCH = 250
@@ -5,38 +5,118 @@
 
 """
 
-import distutils.version
-import platform
+import re
+import sys
 
+# distutils.version.StrictVersionと同じ書式
+_VERSION_RE = re.compile(r"^(\d+)\.(\d+)(?:\.(\d+))?(?:([ab])(\d+))?$")
 
-class HashableVersion(distutils.version.StrictVersion):
+
+class HashableVersion(object):
 
     """Represents a Python version.
 
+    Versions are written in the same format as
+    :class:`distutils.version.StrictVersion`, like ``"2.7.8"`` or
+    ``"2.7.0b1"``, and are compared as tuples. They can also be compared
+    with strings in this format.
+
     :param str vstring: String showing a Python version, like '2.7.8'. If this
-                        parameter is not provided, the return value of
-                        :func:`platform.python_version` will be used.
+                        parameter is not provided, the version of the running
+                        Python (:data:`sys.version_info`) will be used.
+    :raises ValueError: if ``vstring`` is not a valid version.
 
     .. versionadded:: 1.0.0
+
+    .. versionchanged:: 1.0.0
+       No longer derived from :class:`distutils.version.StrictVersion`.
     """
 
+    __slots__ = ("major", "minor", "patch", "prerelease")
+
     def __init__(self, vstring=None):
         """Initalize the instance.
 
         """
 
         if vstring is None:
-            vstring = platform.python_version()
-        distutils.version.StrictVersion.__init__(self, vstring)
+            vstring = "{}.{}.{}".format(*sys.version_info[:3])
+        match = _VERSION_RE.match(vstring)
+        if match is None:
+            raise ValueError("invalid version number '{}'".format(vstring))
+        (major, minor, patch, pre_tag, pre_num) = match.groups()
 
         #: Integer showing the major version.
-        self.major = self.version[0]
+        self.major = int(major)
 
         #: Integer showing the minor version.
-        self.minor = self.version[1]
+        self.minor = int(minor)
 
         #: Integer showing the patch version.
-        self.patch = self.version[2]
+        self.patch = int(patch) if patch is not None else 0
+
+        #: Tuple like ``("b", 1)`` showing the prerelease, or None.
+        self.prerelease = (pre_tag, int(pre_num)) if pre_tag else None
+
+    @property
+    def version(self):
+        """Tuple of the major, minor, and patch versions.
+
+        """
+
+        return (self.major, self.minor, self.patch)
+
+    def _key(self):
+        """Returns the tuple used in comparison.
+
+        """
+
+        if self.prerelease is None:
+            # 正式版はプレリリース版よりも新しい
+            return self.version + ((1,),)
+        return self.version + ((0,) + self.prerelease,)
+
+    def _coerce(self, other):
+        """Returns the key of the other version, or None.
+
+        """
+
+        if isinstance(other, basestring):
+            other = HashableVersion(other)
+        if isinstance(other, HashableVersion):
+            return other._key()
+        return None
+
+    def __eq__(self, other):
+        other_key = self._coerce(other)
+        return other_key is not None and self._key() == other_key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        other_key = self._coerce(other)
+        if other_key is None:
+            return NotImplemented
+        return self._key() < other_key
+
+    def __le__(self, other):
+        other_key = self._coerce(other)
+        if other_key is None:
+            return NotImplemented
+        return self._key() <= other_key
+
+    def __gt__(self, other):
+        other_key = self._coerce(other)
+        if other_key is None:
+            return NotImplemented
+        return self._key() > other_key
+
+    def __ge__(self, other):
+        other_key = self._coerce(other)
+        if other_key is None:
+            return NotImplemented
+        return self._key() >= other_key
 
     def __hash__(self):
         """Method to make instances of this class hashable.
@@ -50,6 +130,21 @@ class HashableVersion(distutils.version.StrictVersion):
 
         return hash(fullversion)
 
+    def __str__(self):
+        if self.patch == 0:
+            vstring = "{}.{}".format(self.major, self.minor)
+        else:
+            vstring = "{}.{}.{}".format(*self.version)
+        if self.prerelease is not None:
+            vstring += "{}{}".format(*self.prerelease)
+        return vstring
+
+    def __repr__(self):
+        return "HashableVersion ('{}')".format(self)
+
+    def __reduce__(self):
+        return (HashableVersion, (str(self),))
+
     def major_minor(self):
         """Returns a version number like 'x.y' for backward compatibility.
 
@@ -8,16 +8,25 @@
 import itertools
 import os
 import glob
+import threading
 
 # Original modules
 from . import exceptions
 from . import constants
 from . import datatypes
-from . import process
+from . import tracing
+
+# 起動を速くするため、cache(shutilとtempfileを読み込む)、process、peinfoは
+# 使うときにインポートする
+
+# validate_pythonexeが使うキャッシュ
+_detection_cache = None
+# 検証は複数のスレッドで行われるので、キャッシュの作成をロックで守る
+_detection_cache_lock = threading.Lock()
 
 
 def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
-                   detailed=False):
+                   detailed=False, timeout=constants.VALIDATION_TIMEOUT):
     """Search for IronPython regisitry keys.
 
     This function searches for IronPython keys in the Windows registry,
@@ -33,6 +42,8 @@ def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
                           :class:`ironpycompiler.datatypes.HashableVersion`
                           instead of string, in order to provide detailed
                           information of versions.
+    :param float timeout: (optional) The number of seconds after which the
+                          validation of each executable fails.
     :return: The versions of IronPython and their locations
     :rtype: dict
     :raises ironpycompiler.exceptions.IronPythonDetectionError: if IronPython
@@ -46,8 +57,24 @@ def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
        was mutable.
 
     .. versionchanged:: 1.0.0
-       Validates the found executables using :func:`validate_pythonexe`. The
-       parameters ``detailed`` and ``executable`` were added.
+       Validates the found executables concurrently using
+       :func:`validate_pythonexe`. The parameters ``detailed``,
+       ``executable``, and ``timeout`` were added.
+    """
+
+    reg_dirs = _reg_dirs(regkeys)
+    foundipys = _found_ipys(
+        reg_dirs, _validate_dirs(reg_dirs, executable, timeout), detailed)
+    if len(foundipys) == 0:
+        raise exceptions.IronPythonDetectionError(
+            msg="Could not find any IronPython executable.")
+
+    return foundipys
+
+
+def _reg_dirs(regkeys=None):
+    """Returns the IronPython directories found in the registry.
+
     """
 
     if regkeys is None:
@@ -59,7 +86,6 @@ def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
         raise exceptions.IronPythonDetectionError(
             msg="Cannot import a module for accessing the Windows registry.")
 
-    foundipys = dict()
     ipybasekey = None
 
     # IronPythonキーを読み込む
@@ -73,7 +99,6 @@ def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
             break
 
     if ipybasekey is None:
-        ipybasekey.Close()
         raise exceptions.IronPythonDetectionError(
             msg="Could not find any IronPython registry key.")
     else:
@@ -84,33 +109,22 @@ def search_ipy_reg(regkeys=None, executable=constants.EXECUTABLE,
                 foundvers.append(_winreg.EnumKey(ipybasekey, idx))
             except WindowsError:  # 対応するサブキーがなくなったら
                 break
-        foundipys = dict()
+        ipy_dirs = []
         for ver in foundvers:
             ipypathkey = _winreg.OpenKey(ipybasekey,
                                          ver + "\\InstallPath")
-            ipy_dir = os.path.dirname(_winreg.QueryValue(ipypathkey, None))
-            ipy_exe = os.path.abspath(os.path.join(ipy_dir, executable))
             try:
-                ipy_ver = validate_pythonexe(ipy_exe)
-            except exceptions.IronPythonValidationError:
-                continue
-            else:
-                if detailed:
-                    foundipys[ipy_ver] = ipy_dir
-                else:
-                    foundipys[ipy_ver.major_minor()] = ipy_dir
+                ipy_dirs.append(os.path.dirname(
+                    _winreg.QueryValue(ipypathkey, None)))
             finally:
                 ipypathkey.Close()
         ipybasekey.Close()
 
-    if len(foundipys) == 0:
-        raise exceptions.IronPythonDetectionError(
-            msg="Could not find any IronPython executable.")
-
-    return foundipys
+    return ipy_dirs
 
 
-def search_ipy_env(executable=constants.EXECUTABLE, detailed=False):
+def search_ipy_env(executable=constants.EXECUTABLE, detailed=False,
+                   timeout=constants.VALIDATION_TIMEOUT):
     """Search for IronPython directories included in the PATH variable.
 
     This function searches for IronPython executables in your system,
@@ -128,6 +142,8 @@ def search_ipy_env(executable=constants.EXECUTABLE, detailed=False):
                           :class:`ironpycompiler.datatypes.HashableVersion`
                           instead of string, in order to provide detailed
                           information of versions.
+    :param float timeout: (optional) The number of seconds after which the
+                          validation of each executable fails.
     :return: The versions of IronPython and their locations
     :rtype: dict
     :raises ironpycompiler.exceptions.IronPythonDetectionError: if IronPython
@@ -136,13 +152,30 @@ def search_ipy_env(executable=constants.EXECUTABLE, detailed=False):
     .. versionadded:: 0.9.0
 
     .. versionchanged:: 1.0.0
-       Validates the found executables using :func:`validate_pythonexe`. The
-       parameter ``detailed`` was added.
+       Validates the found executables concurrently using
+       :func:`validate_pythonexe`. The parameters ``detailed`` and
+       ``timeout`` were added.
+
+    """
+
+    env_dirs = _env_dirs(executable)
+    foundipys = _found_ipys(
+        env_dirs, _validate_dirs(env_dirs, executable, timeout), detailed)
+
+    if len(foundipys) == 0:
+        raise exceptions.IronPythonDetectionError(
+            msg=("{} exists but is not the IronPython executable."
+                 ).format(executable))
+    else:
+        return foundipys
+
+
+def _env_dirs(executable=constants.EXECUTABLE):
+    """Returns the directories in PATH which contain the executable.
 
     """
 
     ipydirpaths = []
-    foundipys = {}
 
     for path in os.environ["PATH"].split(os.pathsep):
         for match_path in glob.glob(os.path.join(path, executable)):
@@ -153,27 +186,65 @@ def search_ipy_env(executable=constants.EXECUTABLE, detailed=False):
         raise exceptions.IronPythonDetectionError(
             msg="Could not find any executable file named %s." % executable)
 
-    for directory in ipydirpaths:
-        ipy_exe = os.path.abspath(os.path.join(directory, executable))
+    return ipydirpaths
+
+
+def _validate_dirs(ipy_dirs, executable, timeout):
+    """Validates the executables in the directories concurrently.
+
+    Returns a dictionary mapping each directory to the version, or None if
+    the executable is not valid. Directories containing the same executable
+    are validated only once.
+    """
+
+    # 同じ実行ファイルを指すディレクトリは一度だけ検証する
+    real_paths = {}
+    for ipy_dir in ipy_dirs:
+        ipy_exe = os.path.abspath(os.path.join(ipy_dir, executable))
+        real_paths[ipy_dir] = os.path.normcase(os.path.realpath(ipy_exe))
+    candidates = sorted(set(real_paths.values()))
+
+    def validate(ipy_exe):
         try:
-            ipy_ver = validate_pythonexe(ipy_exe)
+            return validate_pythonexe(ipy_exe, timeout=timeout)
         except exceptions.IronPythonValidationError:
-            continue
-        else:
-            if detailed:
-                foundipys[ipy_ver] = directory
-            else:
-                foundipys[ipy_ver.major_minor()] = directory
+            return None
 
-    if len(foundipys) == 0:
-        raise exceptions.IronPythonDetectionError(
-            msg=("{} exists but is not the IronPython executable."
-                 ).format(executable))
+    if len(candidates) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(len(candidates), constants.VALIDATION_JOBS))
+        try:
+            ipy_vers = pool.map(validate, candidates)
+        finally:
+            pool.close()
+            pool.join()
     else:
-        return foundipys
+        ipy_vers = [validate(c) for c in candidates]
 
+    versions = dict(zip(candidates, ipy_vers))
+    return dict((d, versions[p]) for (d, p) in real_paths.items())
 
-def search_ipy(regkeys=None, executable=constants.EXECUTABLE, detailed=False):
+
+def _found_ipys(ipy_dirs, versions, detailed):
+    """Returns the dictionary returned by :func:`search_ipy_env`.
+
+    ``versions`` is the dictionary returned by :func:`_validate_dirs`.
+    """
+
+    foundipys = {}
+    for ipy_dir in ipy_dirs:
+        ipy_ver = versions[ipy_dir]
+        if ipy_ver is None:
+            continue
+        if detailed:
+            foundipys[ipy_ver] = ipy_dir
+        else:
+            foundipys[ipy_ver.major_minor()] = ipy_dir
+    return foundipys
+
+
+def search_ipy(regkeys=None, executable=constants.EXECUTABLE, detailed=False,
+               timeout=constants.VALIDATION_TIMEOUT):
     """Search for IronPython directories.
 
     This function searches for IronPython directories using both
@@ -190,6 +261,8 @@ def search_ipy(regkeys=None, executable=constants.EXECUTABLE, detailed=False):
                           :class:`ironpycompiler.datatypes.HashableVersion`
                           instead of string, in order to provide detailed
                           information of versions.
+    :param float timeout: (optional) The number of seconds after which the
+                          validation of each executable fails.
     :return: The versions of IronPython and their locations
     :rtype: dict
 
@@ -200,22 +273,28 @@ def search_ipy(regkeys=None, executable=constants.EXECUTABLE, detailed=False):
        was mutable.
 
     .. versionchanged:: 1.0.0
-       The parameter ``detailed`` was added.
+       The parameters ``detailed`` and ``timeout`` were added. The
+       executables found in the registry and PATH are validated
+       concurrently, and only once for each real path.
 
     """
 
-    if regkeys is None:
-        regkeys = constants.REGKEYS
-
     try:
-        foundipys = search_ipy_reg(regkeys, executable, detailed)
+        reg_dirs = _reg_dirs(regkeys)
     except exceptions.IronPythonDetectionError:
-        foundipys = dict()
+        reg_dirs = []
 
     try:
-        envipys = search_ipy_env(executable, detailed)
+        env_dirs = _env_dirs(executable)
     except exceptions.IronPythonDetectionError:
-        envipys = dict()
+        env_dirs = []
+
+    # レジストリとPATHの候補をまとめて検証する
+    with tracing.span("search_ipy", "detect",
+                      candidates=len(reg_dirs) + len(env_dirs)):
+        versions = _validate_dirs(reg_dirs + env_dirs, executable, timeout)
+    foundipys = _found_ipys(reg_dirs, versions, detailed)
+    envipys = _found_ipys(env_dirs, versions, detailed)
 
     for k, v in envipys.items():
         if k not in foundipys:
@@ -264,7 +343,9 @@ def auto_detect(detailed=False):
     cpy_ver = datatypes.HashableVersion()
 
     # The versions of IronPython
-    foundipys = search_ipy(detailed=True)
+    with tracing.span("auto_detect", "detect") as attrs:
+        foundipys = search_ipy(detailed=True)
+        attrs["found"] = len(foundipys)
     ipy_vers = foundipys.keys()
 
     # マイナー・メジャーバージョンが一致
@@ -292,27 +373,111 @@ def auto_detect(detailed=False):
         return (optimum_ipy_ver.major_minor(), foundipys[optimum_ipy_ver])
 
 
-def validate_pythonexe(path_to_exe):
+def get_detection_cache():
+    """Returns the cache used by :func:`validate_pythonexe`.
+
+    :rtype: :class:`ironpycompiler.cache.DetectionCache`
+
+    .. versionadded:: 1.0.0
+    """
+
+    global _detection_cache
+    with _detection_cache_lock:
+        if _detection_cache is None:
+            from . import cache
+            _detection_cache = cache.DetectionCache()
+    return _detection_cache
+
+
+def invalidate_cache(paths=None):
+    """Remove the cached versions of IronPython executables.
+
+    The executables will be executed again by the next detection.
+
+    :param list paths: (optional) Specify the paths to the executables
+                       whose versions should be removed, or all the cached
+                       versions will be removed.
+
+    .. versionadded:: 1.0.0
+    """
+
+    get_detection_cache().invalidate(paths)
+
+
+def validate_pythonexe(path_to_exe, use_cache=True, use_metadata=True,
+                       timeout=None):
     """Check if the specified executable is a valid Python one.
 
-    This function validate the executable file by executing it actually, and
-    returns its version number.
+    This function returns the version number of the executable. It
+    validates the executable by executing it only if neither the cache nor
+    the version resources give the version.
+
+    The version is cached on disk (see :func:`get_detection_cache`), so
+    that the executable is not executed again until it is modified. If it is
+    not cached, first the version resources of the executable and
+    ``IronPython.dll`` are read with
+    :func:`ironpycompiler.peinfo.ironpython_version`, and the executable is
+    executed only if they are missing or ambiguous.
 
     :param str path_to_exe: The path to the executable.
+    :param bool use_cache: (optional) Specify whether to use the cached
+                           version.
+    :param bool use_metadata: (optional) Specify whether to read the
+                              version resources.
+    :param float timeout: (optional) Specify the number of seconds after
+                          which the executable is killed and regarded as
+                          invalid.
     :return: The version number of Python.
     :rtype: :class:`ironpycompiler.datatypes.HashableVersion`
 
     .. versionadded:: 1.0.0
     """
 
+    with tracing.span("validate_pythonexe", "detect",
+                      executable=path_to_exe) as attrs:
+        ipy_ver = _validate_pythonexe(path_to_exe, use_cache, use_metadata,
+                                      timeout, attrs)
+        attrs["version"] = ipy_ver
+    return ipy_ver
+
+
+def _validate_pythonexe(path_to_exe, use_cache, use_metadata, timeout,
+                        attrs):
+    """Does the same as :func:`validate_pythonexe`.
+
+    How the version was found is stored in ``attrs`` for tracing.
+    """
+
+    if use_cache:
+        cached_ver = get_detection_cache().get(path_to_exe)
+        if cached_ver is not None:
+            attrs["source"] = "cache"
+            return datatypes.HashableVersion(cached_ver)
+
+    if use_metadata:
+        from . import peinfo
+        metadata_ver = peinfo.ironpython_version(path_to_exe)
+        if metadata_ver is not None:
+            attrs["source"] = "metadata"
+            ipy_ver = datatypes.HashableVersion(metadata_ver)
+            if use_cache:
+                get_detection_cache().set(path_to_exe, ipy_ver)
+            return ipy_ver
+
+    attrs["source"] = "process"
+    from . import process
     try:
         (ipy_stdout, ipy_retcode) = process.execute_ipy(
             arguments=["-c",
                        "from platform import python_version as pv;print pv()"],
-            path_to_exe=path_to_exe)
+            path_to_exe=path_to_exe, timeout=timeout)
     except EnvironmentError as e:
         raise exceptions.IronPythonValidationError(
             "{} is not available: {}".format(path_to_exe, str(e)))
+    except exceptions.IronPythonInterruptedError:
+        raise exceptions.IronPythonValidationError(
+            "{} did not respond within {} seconds.".format(path_to_exe,
+                                                           timeout))
     else:
         ipy_ver_str = ipy_stdout.strip()
         try:
@@ -321,4 +486,6 @@ def validate_pythonexe(path_to_exe):
             raise exceptions.IronPythonValidationError(
                 "{} is not a valid IronPython executable:".format(path_to_exe))
         else:
+            if use_cache:
+                get_detection_cache().set(path_to_exe, ipy_ver)
             return ipy_ver
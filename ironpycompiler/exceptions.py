@@ -79,3 +79,66 @@ class IronPythonValidationError(IPCError):
             return str(self.msg)
         else:
             return "Not a valid IronPython executable."
+
+
+class IronPythonWorkerError(IPCError):
+
+    """Raised if :class:`ironpycompiler.process.IronPythonWorker` fails.
+
+    :param msg: (optional) The detailed information of the error.
+
+    .. versionadded:: 1.0.0
+
+    """
+
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def __str__(self):
+        if self.msg is not None:
+            return str(self.msg)
+        else:
+            return "The IronPython worker does not respond."
+
+
+class IronPythonInterruptedError(IPCError):
+
+    """Raised if an IronPython process is killed before it exits.
+
+    :param str reason: ``"timeout"`` or ``"cancelled"``.
+    :param str output: (optional) The output from the process until it was
+                       killed.
+
+    .. versionadded:: 1.0.0
+
+    """
+
+    def __init__(self, reason, output=None):
+        self.reason = reason
+        self.output = output
+
+    def __str__(self):
+        if self.reason == "timeout":
+            return "The IronPython process timed out."
+        else:
+            return "The IronPython process was cancelled."
+
+
+class ManifestError(IPCError):
+
+    """Raised if a build manifest is invalid.
+
+    :param msg: (optional) The detailed information of the error.
+
+    .. versionadded:: 1.0.0
+
+    """
+
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def __str__(self):
+        if self.msg is not None:
+            return str(self.msg)
+        else:
+            return "The build manifest is invalid."
@@ -9,10 +9,22 @@ modules.
 """
 
 import argparse
+import os
 import sys
+import time
 
 # Original modules
 import ironpycompiler.compiler as compiler
+import ironpycompiler.analysis as analysis
+import ironpycompiler.build as build
+import ironpycompiler.cache as cache
+import ironpycompiler.constants as constants
+import ironpycompiler.exceptions as exceptions
+import ironpycompiler.pipeline as pipeline
+import ironpycompiler.detect as detect
+import ironpycompiler.prune as prune
+import ironpycompiler.tracing as tracing
+import ironpycompiler.watch as watch
 
 
 def _compiler(args):
@@ -25,22 +37,212 @@ def _compiler(args):
         if (args.main is not None) and (args.main not in args.script):
             args.script.insert(0, args.main)
 
+    recorder = None
+    if args.trace is not None:
+        recorder = tracing.ChromeTraceRecorder()
+        tracing.add_hook(recorder)
+    try:
+        _compile_scripts(args)
+    finally:
+        if recorder is not None:
+            tracing.remove_hook(recorder)
+            recorder.write(args.trace)
+            print "Wrote the trace: {}".format(args.trace)
+
+
+def _compile_scripts(args):
+    """Analyzes and compiles the scripts. It should not be used directly.
+
+    """
+
     mc = compiler.ModuleCompiler(
-        paths_to_scripts=args.script)
+        paths_to_scripts=args.script, cache_dir=args.cache_dir,
+        analyzer=args.analyzer, jobs=args.jobs, pruner=_pruner(args))
+
+    result = None
+    if args.analysis is not None:
+        result = analysis.AnalysisResult.load(args.analysis)
+    dirs_of_modules = None
+    if result is not None and result.is_current() and \
+       result.paths_to_scripts == tuple(mc.paths_to_scripts):
+        mc.use_analysis(result)
+        print "Using the analysis: {}".format(args.analysis)
+        print
+    elif result is not None:
+        dirs_of_modules = list(result.dirs_of_modules)
+    if mc.analysis is None and not args.pipeline:
+        print "Analyzing scripts...",
+        mc.check_compilability(dirs_of_modules)
+        print "Done."
+        print
+
+    if args.pipeline:
+        print "Analyzing and compiling scripts...",
+    else:
+        print "Compiling scripts...",
+    callback = None
+    if args.stream:
+        print
+        callback = _print_line
+    try:
+        if args.pipeline:
+            options = _build_options(args)
+            pipeline.PipelinedCompiler(
+                mc, dirs_of_modules=dirs_of_modules,
+                jobs=options.pop("jobs")).run(callback=callback, **options)
+        else:
+            mc.create_asm(callback=callback, **_build_options(args))
+    except exceptions.IronPythonInterruptedError as e:
+        print
+        print "Aborted: {}".format(e)
+        if e.output and not args.stream:
+            print e.output
+        sys.exit(1)
+
+    if args.stream:
+        print "Done."
+    else:
+        print "Done. This is the output by pyc.py."
+        print mc.pyc_stdout
+
+    if mc.required_asms:
+        print "Deploy these assemblies with {}:".format(
+            os.path.basename(mc.output_asm))
+        for asm in mc.required_asms:
+            print "  {}".format(asm)
+
+    if mc.minified_modules:
+        print "Minified modules (bytes saved):"
+        for (saved, mod) in sorted(((saved, mod) for (mod, saved) in
+                                    mc.minified_modules.iteritems()),
+                                   reverse=True):
+            print "{:>9} {}".format(saved, mod)
+        print "Total: {} bytes saved.".format(
+            sum(mc.minified_modules.values()))
+
+    stats = mc.ipydll_stats
+    if stats is not None:
+        print "IronPython DLLs: {} copied, {} linked, {} unchanged, " \
+            "{} bytes written.".format(stats["copied"], stats["linked"],
+                                       stats["skipped"],
+                                       stats["bytes_written"])
+        if stats["missing"]:
+            print "Not found: {}".format(", ".join(stats["missing"]))
+
+
+def _watcher(args):
+    """Function for command ``watch``. It should not be used directly.
+
+    """
+
+    if args.target == "winexe" or args.target == "exe":
+        if (args.main is not None) and (args.main not in args.script):
+            args.script.insert(0, args.main)
+
+    mc = compiler.ModuleCompiler(
+        paths_to_scripts=args.script, cache_dir=args.cache_dir,
+        analyzer=args.analyzer, jobs=args.jobs, pruner=_pruner(args))
+    watcher = watch.ProjectWatcher(
+        mc, dirs_of_modules=args.lib, build_options=_build_options(args),
+        debounce=args.debounce,
+        observer=watch.create_observer(polling=args.poll),
+        callback=_print_build)
+    print "Watching the scripts. Press Ctrl+C to stop."
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print
+    finally:
+        watcher.close()
+        mc.close()
+
+
+def _print_build(result):
+    """Prints a result of ``watch``. It should not be used directly.
+
+    """
+
+    if result["changed"]:
+        print "Changed: {}".format(", ".join(
+            os.path.basename(p) or p for p in result["changed"]))
+    if result["error"] is not None:
+        print "[{}] Failed: {}".format(time.strftime("%H:%M:%S"),
+                                       result["error"])
+    else:
+        print "[{}] Built in {:.2f}s{}{}.".format(
+            time.strftime("%H:%M:%S"), result["duration"],
+            " (analyzed)" if result["analyzed"] else "",
+            " (cached)" if result["cache_hit"] else "")
+    sys.stdout.flush()
+
+
+def _print_line(line):
+    """Prints a line of the output by pyc.py. It should not be used directly.
+
+    """
+
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+
+def _builder(args):
+    """Function for command ``build``. It should not be used directly.
+
+    """
+
+    recorder = None
+    if args.trace is not None:
+        recorder = tracing.ChromeTraceRecorder()
+        tracing.add_hook(recorder)
+    try:
+        try:
+            manifest = build.load_manifest(args.manifest)
+            builder = build.ManifestBuilder(manifest, jobs=args.jobs,
+                                            callback=_print_target)
+            summaries = builder.run(args.target or None)
+        except (EnvironmentError, exceptions.ManifestError,
+                exceptions.IronPythonDetectionError) as e:
+            print "Error: {}".format(e)
+            sys.exit(1)
+    finally:
+        if recorder is not None:
+            tracing.remove_hook(recorder)
+            recorder.write(args.trace)
 
-    print "Analyzing scripts...",
-    mc.check_compilability()
-    print "Done."
     print
+    print "{:<24} {:<8} {:>9} {:>9}  {}".format(
+        "Target", "Status", "Analysis", "Compile", "Cache")
+    for summary in summaries:
+        if summary["shared_analysis"] is not None:
+            analysis = "shared"
+        else:
+            analysis = "{:.2f}s".format(summary["analysis"])
+        if summary["compile"] is not None:
+            compile_time = "{:.2f}s".format(summary["compile"])
+        else:
+            compile_time = "-"
+        print "{:<24} {:<8} {:>9} {:>9}  {}".format(
+            summary["name"], summary["status"], analysis, compile_time,
+            "hit" if summary["cache_hit"] else "miss")
+    if any(s["status"] != "ok" for s in summaries):
+        sys.exit(1)
+
+
+def _print_target(summary):
+    """Prints a finished target of ``build``. It should not be used directly.
 
-    print "Compiling scripts...",
-    mc.create_asm(out=args.out, target_asm=args.target,
-                  target_platform=args.platform, embed=args.embed,
-                  standalone=args.standalone, mta=args.mta,
-                  copy_ipydll=args.copyipydll)
+    """
 
-    print "Done. This is the output by pyc.py."
-    print mc.pyc_stdout
+    if summary["status"] == "ok":
+        line = "{}: built {}".format(summary["name"], summary["output"])
+    elif summary["status"] == "skipped":
+        line = "{}: skipped because a dependency failed".format(
+            summary["name"])
+    else:
+        line = "{}: failed: {}".format(summary["name"], summary["error"])
+    # 複数のスレッドから呼ばれるので、一度に書き込む
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
 
 
 def _analyzer(args):
@@ -49,8 +251,11 @@ def _analyzer(args):
     """
 
     mc = compiler.ModuleCompiler(
-        paths_to_scripts=args.script)
-    mc.check_compilability()
+        paths_to_scripts=args.script, cache_dir=args.cache_dir,
+        analyzer=args.analyzer, jobs=args.jobs, pruner=_pruner(args))
+    result = mc.check_compilability(args.lib)
+    if args.save is not None:
+        result.save(args.save)
     print "Searched for modules in these directories:"
     for d in mc.dirs_of_modules:
         print d
@@ -66,6 +271,153 @@ def _analyzer(args):
     print "These modules are built in:"
     for mod in mc.builtin_modules:
         print mod
+    if mc.pruner is not None:
+        print
+        print "These modules were dropped:"
+        for mod in sorted(mc.pruned_modules):
+            print "{} ({})".format(mod, mc.pruned_modules[mod])
+
+
+def _cache(args):
+    """ Function for command ``cache``. It should not be used directly.
+
+    """
+
+    caches = [("Imports", cache.ImportCache(
+                  os.path.join(args.cache_dir, "imports"))),
+              ("Assemblies", cache.BuildCache(
+                  os.path.join(args.cache_dir, "builds")))]
+    for (title, c) in caches:
+        if args.action == "prune":
+            removed = c.prune(args.max_size)
+            print "{}: removed {} entries.".format(title, removed)
+        else:
+            stats = c.stats()
+            print "{}: {} entries, {} / {} bytes".format(
+                title, stats["entries"], stats["size"], stats["max_size"])
+
+
+def _detect(args):
+    """ Function for command ``detect``. It should not be used directly.
+
+    """
+
+    if args.refresh:
+        detect.invalidate_cache()
+    try:
+        foundipys = detect.search_ipy(detailed=True)
+        (optimum_ver, optimum_dir) = detect.auto_detect(detailed=True)
+    except exceptions.IronPythonDetectionError as e:
+        print "Error: {}".format(e)
+        sys.exit(1)
+    print "These versions of IronPython were found:"
+    for ver in sorted(foundipys, reverse=True):
+        print "{}: {}".format(ver, foundipys[ver])
+    print
+    print "This version will be used:"
+    print "{}: {}".format(optimum_ver, optimum_dir)
+
+
+def _add_build_arguments(parser):
+    """Adds the options shared by ``compile`` and ``watch``.
+
+    It should not be used directly.
+    """
+
+    parser.add_argument("-o", "--out",
+                        help="Output file name.")
+    parser.add_argument("-t", "--target",
+                        default="dll",
+                        choices=["dll", "exe", "winexe"],
+                        help="Compile scripts into dll/exe/winexe.")
+    parser.add_argument("-m", "--main",
+                        help="Script to be executed first.")
+    parser.add_argument("-p", "--platform",
+                        choices=["x86", "x64"],
+                        help="Target platform.")
+    parser.add_argument("-e", "--embed",
+                        action="store_true",
+                        help="Embed the generated DLL into (win)exe.")
+    parser.add_argument("-s", "--standalone",
+                        action="store_true",
+                        help="Embed the IPy assemblies into (win)exe.")
+    parser.add_argument("-M", "--mta",
+                        action="store_true",
+                        help="Set MTAThreadAttribute (winexe).")
+    parser.add_argument("-c", "--copyipydll",
+                        action="store_true",
+                        help="Copy IronPython DLLs.")
+    parser.add_argument("--ipydll",
+                        action="append", metavar="NAME",
+                        help=("Copy only this IronPython DLL "
+                              "(wildcards allowed)."))
+    parser.add_argument("-l", "--layered",
+                        action="store_true",
+                        help="Compile dependencies into another DLL.")
+    parser.add_argument("--minify",
+                        action="store_true",
+                        help="Remove docstrings and assertions (like -OO).")
+    parser.add_argument("--shards",
+                        type=int, default=1,
+                        help="Number of DLLs compiled in parallel.")
+    parser.add_argument("--compile-jobs",
+                        type=int, default=constants.COMPILE_JOBS,
+                        help="Maximum number of pyc.py processes.")
+    parser.add_argument("--timeout",
+                        type=float,
+                        help="Seconds after which pyc.py is killed.")
+    parser.add_argument("--cache-dir",
+                        help="Directory for caching the analysis.")
+    parser.add_argument("--analyzer",
+                        default="bytecode",
+                        choices=["bytecode", "source"],
+                        help="How to find imports in modules.")
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=1,
+                        help="Number of processes for analysis.")
+    _add_prune_arguments(parser)
+
+
+def _add_prune_arguments(parser):
+    """Adds the options of pruning. It should not be used directly.
+
+    """
+
+    parser.add_argument("--prune",
+                        action="store_true",
+                        help="Drop modules not imported on IronPython.")
+    parser.add_argument("--include",
+                        action="append", metavar="GLOB",
+                        help="Keep these modules (implies --prune).")
+    parser.add_argument("--exclude",
+                        action="append", metavar="GLOB",
+                        help="Drop these modules (implies --prune).")
+
+
+def _pruner(args):
+    """Returns the pruner for the options. It should not be used directly.
+
+    """
+
+    if args.prune or args.include or args.exclude:
+        return prune.ImportPruner(include=args.include,
+                                  exclude=args.exclude)
+    return None
+
+
+def _build_options(args):
+    """Returns the keyword arguments for ``create_asm``.
+
+    It should not be used directly.
+    """
+
+    return {"out": args.out, "target_asm": args.target,
+            "target_platform": args.platform, "embed": args.embed,
+            "standalone": args.standalone, "mta": args.mta,
+            "copy_ipydll": args.ipydll or args.copyipydll,
+            "layered": args.layered,
+            "shards": args.shards, "timeout": args.timeout,
+            "minify": args.minify, "jobs": args.compile_jobs}
 
 
 def main():
@@ -94,38 +446,96 @@ def main():
                                            help="Analyze and compile scripts.")
     parser_compile.add_argument("script", nargs="+",
                                 help="Scripts that should be compiled.")
-    parser_compile.add_argument("-o", "--out",
-                                help="Output file name.")
-    parser_compile.add_argument("-t", "--target",
-                                default="dll",
-                                choices=["dll", "exe", "winexe"],
-                                help="Compile scripts into dll/exe/winexe.")
-    parser_compile.add_argument("-m", "--main",
-                                help="Script to be executed first.")
-    parser_compile.add_argument("-p", "--platform",
-                                choices=["x86", "x64"],
-                                help="Target platform.")
-    parser_compile.add_argument("-e", "--embed",
-                                action="store_true",
-                                help="Embed the generated DLL into (win)exe.")
-    parser_compile.add_argument("-s", "--standalone",
+    _add_build_arguments(parser_compile)
+    parser_compile.add_argument("--stream",
                                 action="store_true",
-                                help="Embed the IPy assemblies into (win)exe.")
-    parser_compile.add_argument("-M", "--mta",
+                                help="Print the output by pyc.py at once.")
+    parser_compile.add_argument("--trace",
+                                metavar="FILE",
+                                help="Write timings in Chrome trace format.")
+    parser_compile.add_argument("--pipeline",
                                 action="store_true",
-                                help="Set MTAThreadAttribute (winexe).")
-    parser_compile.add_argument("-c", "--copyipydll",
-                                action="store_true",
-                                help="Copy IronPython DLLs.")
+                                help="Compile modules during analysis.")
+    parser_compile.add_argument("--analysis",
+                                metavar="FILE",
+                                help="Reuse an analysis saved by analyze.")
     parser_compile.set_defaults(func=_compiler)
 
+    # サブコマンドwatch
+    parser_watch = subparsers.add_parser("watch",
+                                         help="Recompile scripts on changes.")
+    parser_watch.add_argument("script", nargs="+",
+                              help="Scripts that should be compiled.")
+    _add_build_arguments(parser_watch)
+    parser_watch.add_argument("--lib",
+                              action="append", metavar="DIR",
+                              help="Directory of modules.")
+    parser_watch.add_argument("--debounce",
+                              type=float, default=constants.WATCH_DEBOUNCE,
+                              help="Seconds without changes before building.")
+    parser_watch.add_argument("--poll",
+                              action="store_true",
+                              help="Poll files instead of using inotify.")
+    parser_watch.set_defaults(func=_watcher)
+
+    # サブコマンドbuild
+    parser_build = subparsers.add_parser("build",
+                                         help="Build targets in a manifest.")
+    parser_build.add_argument("manifest",
+                              help="JSON file declaring the targets.")
+    parser_build.add_argument("target", nargs="*",
+                              help="Targets to build (default: all).")
+    parser_build.add_argument("-j", "--jobs",
+                              type=int,
+                              help="Number of targets compiled in parallel.")
+    parser_build.add_argument("--trace",
+                              metavar="FILE",
+                              help="Write timings in Chrome trace format.")
+    parser_build.set_defaults(func=_builder)
+
     # サブコマンドanalyze
     parser_analyze = subparsers.add_parser("analyze",
                                            help="Only check required modules.")
     parser_analyze.add_argument("script", nargs="+",
                                 help="Scripts that should be analyzed.")
+    parser_analyze.add_argument("--lib",
+                                action="append", metavar="DIR",
+                                help=("Directory of modules. IronPython is "
+                                      "not detected if this is specified."))
+    parser_analyze.add_argument("--save",
+                                metavar="FILE",
+                                help="Save the analysis for compile.")
+    parser_analyze.add_argument("--cache-dir",
+                                help="Directory for caching the analysis.")
+    parser_analyze.add_argument("--analyzer",
+                                default="bytecode",
+                                choices=["bytecode", "source"],
+                                help="How to find imports in modules.")
+    parser_analyze.add_argument("-j", "--jobs",
+                                type=int, default=1,
+                                help="Number of processes for analysis.")
+    _add_prune_arguments(parser_analyze)
     parser_analyze.set_defaults(func=_analyzer)
 
+    # サブコマンドcache
+    parser_cache = subparsers.add_parser("cache",
+                                         help="Inspect or prune the cache.")
+    parser_cache.add_argument("action", choices=["stats", "prune"],
+                              help="Show statistics, or evict old entries.")
+    parser_cache.add_argument("--cache-dir", required=True,
+                              help="Directory for caching.")
+    parser_cache.add_argument("--max-size", type=int,
+                              help="Maximum size in bytes (prune).")
+    parser_cache.set_defaults(func=_cache)
+
+    # サブコマンドdetect
+    parser_detect = subparsers.add_parser("detect",
+                                          help="Detect IronPython.")
+    parser_detect.add_argument("--refresh",
+                               action="store_true",
+                               help="Ignore the cached versions.")
+    parser_detect.set_defaults(func=_detect)
+
     args = parser.parse_args()
 
     # 将来Python 3.3+に対応したときに必要
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This is the driver script of :class:`ironpycompiler.process.IronPythonWorker`.
+
+This script is run by IronPython, and runs pyc.py repeatedly in the same
+process for the jobs received from stdin, so that the CLR and IronPython
+start only once. It should not be used directly.
+
+Each request and response is a line containing a JSON object. Responses
+begin with :data:`MARKER` so that they can be distinguished from other
+output.
+
+.. versionadded:: 1.0.0
+"""
+
+import sys
+import os
+import json
+import traceback
+import StringIO
+
+#: The prefix of responses. It must be the same as
+#: :data:`ironpycompiler.constants.WORKER_MARKER`.
+MARKER = "@@ipc "
+
+
+def run_pyc(pyc_path, args, cwd):
+    """Runs pyc.py as the main script, and returns its status and output.
+
+    """
+
+    saved = (sys.argv, sys.stdout, sys.stderr, os.getcwd())
+    output = StringIO.StringIO()
+    status = 0
+    try:
+        sys.argv = [pyc_path] + list(args)
+        sys.stdout = sys.stderr = output
+        os.chdir(cwd)
+        execfile(pyc_path, {"__name__": "__main__", "__file__": pyc_path})
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            output.write(str(e.code) + "\n")
+            status = 1
+    except Exception:
+        traceback.print_exc(file=output)
+        status = 1
+    finally:
+        (sys.argv, sys.stdout, sys.stderr) = saved[:3]
+        os.chdir(saved[3])
+    return (status, output.getvalue())
+
+
+def respond(message):
+    """Writes a response.
+
+    """
+
+    sys.stdout.write(MARKER + json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    """This function will be used when this module is run as a script.
+
+    """
+
+    pyc_path = sys.argv[1]
+    respond({"ok": True, "pid": os.getpid()})
+    for line in iter(sys.stdin.readline, ""):
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        op = request.get("op")
+        if op == "ping":
+            respond({"ok": True, "pid": os.getpid()})
+        elif op == "compile":
+            (status, output) = run_pyc(pyc_path, request["args"],
+                                       request["cwd"])
+            respond({"ok": True, "status": status, "output": output})
+        elif op == "exit":
+            respond({"ok": True})
+            break
+        else:
+            respond({"ok": False, "error": "Unknown operation: %s" % op})
+
+if __name__ == "__main__":
+    main()
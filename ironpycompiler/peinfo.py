@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for reading the version resource of PE files without running them.
+
+.NET assemblies like ``ipy.exe`` and ``IronPython.dll`` contain the standard
+Win32 version resource (``VS_VERSIONINFO``), which is read by this module
+in pure Python.
+
+.. versionadded:: 1.0.0
+"""
+
+import os
+import re
+import mmap
+import struct
+
+# リソースの種類RT_VERSION
+_RT_VERSION = 16
+
+# データディレクトリにおけるリソースディレクトリの番号
+_RESOURCE_DIRECTORY = 2
+
+# VS_FIXEDFILEINFOの署名
+_FIXEDFILEINFO_SIGNATURE = 0xFEEF04BD
+
+# VS_FIXEDFILEINFO.dwFileFlagsのうち、プレリリース版を示すもの
+_VS_FF_PRERELEASE = 0x2
+
+# プレリリース版を示すバージョン文字列。例: "2.7 Beta 2", "2.7.6rc1", "3.4.0a1"
+_PRERELEASE_RE = re.compile(
+    r"alpha|beta|preview|\b(?:rc|dev|pre|ctp)\b|\d(?:a|b|c|rc|dev)\d*\b",
+    re.IGNORECASE)
+
+
+class VersionInfo(object):
+
+    """Represents the version resource of a PE file.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, file_version, product_version, file_flags, strings):
+        """Initialization.
+
+        """
+
+        #: Tuple of four integers showing the binary file version.
+        self.file_version = file_version
+        #: Tuple of four integers showing the binary product version.
+        self.product_version = product_version
+        #: Integer showing ``dwFileFlags`` of ``VS_FIXEDFILEINFO``.
+        self.file_flags = file_flags
+        #: Dictionary containing the strings like ``"ProductName"``.
+        self.strings = strings
+
+    def is_prerelease(self):
+        """Returns whether the file is marked as a prerelease.
+
+        Some prerelease builds do not set ``VS_FF_PRERELEASE``, so the
+        strings ``"ProductVersion"`` and ``"FileVersion"`` are also checked
+        for tags like ``"Beta 2"`` or ``"rc1"``.
+
+        :rtype: bool
+        """
+
+        if self.file_flags & _VS_FF_PRERELEASE:
+            return True
+        return any(_PRERELEASE_RE.search(self.strings.get(key, u""))
+                   for key in (u"ProductVersion", u"FileVersion"))
+
+
+def _align4(offset):
+    """Rounds the offset up to a multiple of 4.
+
+    """
+
+    return (offset + 3) & ~3
+
+
+def _rva_to_offset(sections, rva):
+    """Converts a relative virtual address into a file offset.
+
+    """
+
+    for (virtual_address, virtual_size, raw_size, raw_offset) in sections:
+        if virtual_address <= rva < virtual_address + max(virtual_size,
+                                                          raw_size):
+            return rva - virtual_address + raw_offset
+    raise ValueError("RVA 0x{:x} is not in any section.".format(rva))
+
+
+def _find_version_resource(data):
+    """Returns the file offset and size of the version resource, or None.
+
+    """
+
+    if data[:2] != b"MZ":
+        raise ValueError("Not a PE file.")
+    (pe_offset,) = struct.unpack_from("<I", data, 0x3C)
+    if data[pe_offset:pe_offset + 4] != b"PE\0\0":
+        raise ValueError("Not a PE file.")
+    (num_sections, optional_size) = struct.unpack_from(
+        "<H12xH", data, pe_offset + 6)
+    optional_offset = pe_offset + 24
+    (magic,) = struct.unpack_from("<H", data, optional_offset)
+    if magic == 0x10B:  # PE32
+        directories_offset = optional_offset + 96
+    elif magic == 0x20B:  # PE32+
+        directories_offset = optional_offset + 112
+    else:
+        raise ValueError("Unknown optional header: 0x{:x}".format(magic))
+    (num_directories,) = struct.unpack_from("<I", data,
+                                            directories_offset - 4)
+    if num_directories <= _RESOURCE_DIRECTORY:
+        return None
+    (resource_rva, resource_size) = struct.unpack_from(
+        "<II", data, directories_offset + 8 * _RESOURCE_DIRECTORY)
+    if resource_rva == 0:
+        return None
+
+    sections = []
+    section_offset = optional_offset + optional_size
+    for i in range(num_sections):
+        (virtual_size, virtual_address, raw_size, raw_offset) = \
+            struct.unpack_from("<8xIIII", data, section_offset + 40 * i)
+        sections.append((virtual_address, virtual_size, raw_size,
+                         raw_offset))
+    resource_offset = _rva_to_offset(sections, resource_rva)
+
+    # 種類、名前、言語の3階層をたどり、それぞれ最初の項目を選ぶ
+    directory = 0
+    for level in range(3):
+        (num_named, num_ids) = struct.unpack_from(
+            "<HH", data, resource_offset + directory + 12)
+        entries_offset = resource_offset + directory + 16
+        entries = [struct.unpack_from("<II", data, entries_offset + 8 * i)
+                   for i in range(num_named + num_ids)]
+        if level == 0:
+            entries = [e for e in entries if e[0] == _RT_VERSION]
+        if not entries:
+            return None
+        target = entries[0][1]
+        is_directory = bool(target & 0x80000000)
+        if is_directory != (level < 2):
+            raise ValueError("Broken resource directory.")
+        directory = target & 0x7FFFFFFF
+
+    (data_rva, data_size) = struct.unpack_from(
+        "<II", data, resource_offset + directory)
+    return (_rva_to_offset(sections, data_rva), data_size)
+
+
+def _parse_node(data, offset):
+    """Parses a node of VS_VERSIONINFO.
+
+    Returns a tuple containing the key, the raw value, the children, and
+    the length of the node.
+    """
+
+    (length, value_length, value_type) = struct.unpack_from("<HHH", data,
+                                                            offset)
+    end = offset + length
+    key_start = offset + 6
+    key_end = key_start
+    while data[key_end:key_end + 2] != b"\0\0":
+        key_end += 2
+        if key_end >= end:
+            raise ValueError("Broken version resource.")
+    key = data[key_start:key_end].decode("utf-16-le")
+    value_start = _align4(key_end + 2)
+    if value_type == 1:  # テキストの場合、長さは文字数
+        value_length *= 2
+    value = data[value_start:value_start + value_length]
+    children = []
+    position = _align4(value_start + value_length)
+    while position < end:
+        child = _parse_node(data, position)
+        if child[3] == 0:
+            break
+        children.append(child)
+        position = _align4(position + child[3])
+    return (key, value, children, length)
+
+
+def _parse_version_info(data):
+    """Parses the raw VS_VERSIONINFO.
+
+    """
+
+    (key, value, children, length) = _parse_node(data, 0)
+    if key != u"VS_VERSION_INFO" or len(value) < 52:
+        raise ValueError("Broken version resource.")
+    fields = struct.unpack_from("<13I", value)
+    if fields[0] != _FIXEDFILEINFO_SIGNATURE:
+        raise ValueError("Broken version resource.")
+    file_version = (fields[2] >> 16, fields[2] & 0xFFFF,
+                    fields[3] >> 16, fields[3] & 0xFFFF)
+    product_version = (fields[4] >> 16, fields[4] & 0xFFFF,
+                       fields[5] >> 16, fields[5] & 0xFFFF)
+    file_flags = fields[7] & fields[6]
+
+    strings = {}
+    for (child_key, child_value, tables, child_length) in children:
+        if child_key != u"StringFileInfo":
+            continue
+        for table in tables:
+            for (name, raw, grandchildren, string_length) in table[2]:
+                strings[name] = raw.decode("utf-16-le").rstrip(u"\0")
+    return VersionInfo(file_version, product_version, file_flags, strings)
+
+
+def read_version_info(path):
+    """Reads the version resource of a PE file.
+
+    :param str path: The path to the PE file.
+    :return: The version resource, or None if the file does not have one.
+    :rtype: :class:`VersionInfo`
+    :raises ValueError: if the file is not a valid PE file.
+    :raises EnvironmentError: if the file cannot be read.
+
+    .. versionadded:: 1.0.0
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 64:
+            raise ValueError("Not a PE file.")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            try:
+                found = _find_version_resource(data)
+            except struct.error:
+                raise ValueError("Broken PE file.")
+            if found is None:
+                return None
+            (offset, size) = found
+            try:
+                return _parse_version_info(data[offset:offset + size])
+            except struct.error:
+                raise ValueError("Broken version resource.")
+        finally:
+            data.close()
+
+
+def ironpython_version(path_to_exe):
+    """Reads the version of IronPython from its binaries without running it.
+
+    The version resources of the executable and ``IronPython.dll`` in the
+    same directory are compared, so that the result is reliable.
+
+    :param str path_to_exe: The path to the IronPython executable.
+    :return: The version like ``"2.7.5"``, or None if it cannot be decided
+             without running the executable.
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    versions = set()
+    dll_path = os.path.join(os.path.dirname(path_to_exe), "IronPython.dll")
+    for path in (path_to_exe, dll_path):
+        if path == dll_path and not os.path.isfile(path):
+            continue
+        try:
+            info = read_version_info(path)
+        except (ValueError, EnvironmentError):
+            return None
+        # IronPythonの正式版であることを確認できなければ実行して調べる
+        if info is None or info.is_prerelease() or \
+           "IronPython" not in info.strings.get(u"ProductName", u""):
+            return None
+        versions.add(info.file_version[:3])
+    if len(versions) != 1:
+        return None
+    return "{}.{}.{}".format(*versions.pop())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for compiling the modules while the scripts are being analyzed.
+
+:meth:`ironpycompiler.compiler.ModuleCompiler.create_asm` starts after the
+whole analysis. However, a module found by the analysis is always in the
+result, so the modules in ``dirs_of_modules`` (the standard library and
+site-packages) can be compiled as soon as they are found.
+:class:`PipelinedCompiler` compiles them in batches into separate DLLs
+while the analysis continues, and copies the IronPython DLLs at the same
+time, so that the time to the finished assemblies approaches the longer of
+the analysis and the compilation, rather than their sum.
+
+.. versionadded:: 1.0.0
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+
+# Original modules
+from . import compiler
+from . import constants
+from . import tracing
+
+
+class PipelinedCompiler(object):
+
+    """Overlaps the analysis and the compilation of scripts.
+
+    Usage::
+
+        mc = compiler.ModuleCompiler(["main.py"], cache_dir=".ipccache")
+        pipeline.PipelinedCompiler(mc).run(out="app.exe", target_asm="exe")
+
+    The modules in ``dirs_of_modules`` are compiled into
+    ``ipcpart_<digest>.dll`` (see :attr:`part_asms`) in the destination
+    directory, each of which contains ``batch_size`` modules in the order
+    in which they are found. The names depend only on the modules, so that
+    the assemblies are restored from the cache of ``compiler`` if the
+    modules are unchanged. The other modules and the scripts are compiled
+    after the analysis by
+    :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`, and an
+    executable loads the DLLs in the same way as the dependency layer.
+
+    The modules are not compiled during the analysis if the analysis of
+    ``compiler`` is current, or :attr:`compiler.pruner
+    <ironpycompiler.compiler.ModuleCompiler.pruner>` is set, because the
+    found modules may be dropped.
+
+    :param compiler: The compiler of the scripts.
+    :type compiler: :class:`ironpycompiler.compiler.ModuleCompiler`
+    :param list dirs_of_modules: (optional) See
+        :meth:`ironpycompiler.compiler.ModuleCompiler.check_compilability`.
+    :param int batch_size: (optional) The number of the modules compiled
+                           into each DLL during the analysis.
+    :param int jobs: (optional) The maximum number of the IronPython
+                     processes run at the same time, both during the
+                     analysis and by
+                     :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, compiler, dirs_of_modules=None,
+                 batch_size=constants.PIPELINE_BATCH,
+                 jobs=constants.COMPILE_JOBS):
+        """Initialization.
+
+        """
+
+        #: The compiler of the scripts.
+        self.compiler = compiler
+        #: The directories where modules are searched for.
+        self.dirs_of_modules = dirs_of_modules
+        #: The number of the modules compiled into each DLL.
+        self.batch_size = max(1, batch_size)
+        #: The maximum number of the IronPython processes.
+        self.jobs = max(1, jobs)
+        #: The paths to the DLLs compiled during the analysis.
+        self.part_asms = []
+
+    def run(self, **kwargs):
+        """Analyzes and compiles the scripts.
+
+        The results are stored in :attr:`compiler` in the same way as
+        :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`.
+
+        :param kwargs: The keyword arguments of
+            :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`.
+            ``jobs`` is replaced by :attr:`jobs`.
+        :raises ironpycompiler.exceptions.ModuleCompilationError: if pyc.py
+                                                                  fails
+        """
+
+        mc = self.compiler
+        copy_ipydll = kwargs.pop("copy_ipydll", False)
+        output_dir = os.path.dirname(mc._output_path(
+            kwargs.get("out"), kwargs.get("target_asm", "dll")))
+        cancel = kwargs.get("cancel")
+        if cancel is None:
+            cancel = threading.Event()
+        streaming = mc.pruner is None and (
+            mc.analysis is None or not mc.analysis.is_current())
+        kwargs["jobs"] = self.jobs
+        self.part_asms = []
+        parts = []  # (パス, モジュール, AsyncResult)
+        minified = {}
+        temp_staging_dir = None
+        # 解析中のDLLとcreate_asmで、IronPythonのプロセスの数をjobsまでに
+        # 抑える
+        previous_slots = mc._compile_slots
+        mc._compile_slots = threading.BoundedSemaphore(self.jobs)
+        pool = ThreadPool(self.jobs)
+        copier = None
+        try:
+            with tracing.span("pipeline", "compiler") as attrs:
+                copy_result = None
+                if copy_ipydll:
+                    allowlist = None
+                    if not isinstance(copy_ipydll, bool):
+                        allowlist = list(copy_ipydll)
+                    copier = ThreadPool(1)
+                    copy_result = copier.apply_async(
+                        compiler.gather_ipydll,
+                        (output_dir, mc.ipy_dir, allowlist))
+                    copier.close()
+
+                if streaming:
+                    if kwargs.get("minify"):
+                        if mc.cache_dir is not None:
+                            staging_dir = os.path.join(mc.cache_dir,
+                                                       "staging")
+                        else:
+                            staging_dir = temp_staging_dir = \
+                                tempfile.mkdtemp(prefix="IPC")
+                        staging_dir = os.path.join(staging_dir, "minified")
+
+                    dirs_of_modules = self.dirs_of_modules
+                    if dirs_of_modules is None and mc.analysis is not None:
+                        # 古い解析と同じディレクトリを使う
+                        dirs_of_modules = list(mc.analysis.dirs_of_modules)
+                    dirs = [os.path.join(os.path.abspath(d), "") for d in
+                            mc._module_dirs(dirs_of_modules)]
+                    scripts = set(mc.paths_to_scripts)
+                    pending = []
+
+                    def submit(modules):
+                        name = "ipcpart_" + hashlib.sha1(
+                            "\n".join(sorted(modules))).hexdigest()[:12]
+                        path = os.path.join(output_dir, name + ".dll")
+                        inputs = modules
+                        if kwargs.get("minify"):
+                            (staged, saved) = mc._minify(modules,
+                                                         staging_dir)
+                            inputs = [staged[m] for m in modules]
+                            minified.update(saved)
+                        result = pool.apply_async(mc._compile, (
+                            path, ["/out:" + name] + inputs, inputs,
+                            kwargs.get("delete_resp", True),
+                            kwargs.get("executable", constants.EXECUTABLE),
+                            kwargs.get("callback"), kwargs.get("timeout"),
+                            cancel))
+                        parts.append((path, modules, result))
+
+                    def found(paths):
+                        for path in paths:
+                            path = os.path.abspath(path)
+                            if path not in scripts and \
+                               any(path.startswith(d) for d in dirs):
+                                pending.append(path)
+                        while len(pending) >= self.batch_size:
+                            submit(pending[:self.batch_size])
+                            del pending[:self.batch_size]
+
+                    mc.check_compilability(dirs_of_modules, callback=found)
+                    # 残りのモジュールはメインのアセンブリに含める
+
+                references = dict((path, modules)
+                                  for (path, modules, result) in parts)
+                mc.create_asm(references=references, **kwargs)
+
+                # 失敗があれば、ここで例外が送出される
+                stdout = [mc.pyc_stdout or ""]
+                for (path, modules, result) in parts:
+                    (hit, part_stdout) = result.get()
+                    mc.cache_hit = mc.cache_hit and hit
+                    stdout.append(part_stdout or "")
+                    self.part_asms.append(path)
+                mc.pyc_stdout = "".join(stdout)
+                mc.minified_modules.update(minified)
+                if copy_result is not None:
+                    mc.ipydll_stats = copy_result.get()
+                attrs["parts"] = len(parts)
+        except BaseException:
+            if "cancel" not in kwargs:
+                cancel.set()
+            raise
+        finally:
+            pool.close()
+            pool.join()
+            if copier is not None:
+                copier.join()
+            mc._compile_slots = previous_slots
+            if temp_staging_dir is not None:
+                shutil.rmtree(temp_staging_dir, ignore_errors=True)
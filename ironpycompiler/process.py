@@ -7,9 +7,20 @@
 
 import subprocess
 import os
+import signal
+import json
+import time
+import threading
+import Queue
 
+# Original modules
+from . import constants
+from . import exceptions
+from . import tracing
 
-def execute_ipy(path_to_exe, arguments, cwd=None):
+
+def execute_ipy(path_to_exe, arguments, cwd=None, callback=None,
+                timeout=None, cancel=None):
     """Executes the IronPython executable with the provided arguments.
 
     :param str path_to_exe: The path to the IronPython executable.
@@ -17,9 +28,21 @@ def execute_ipy(path_to_exe, arguments, cwd=None):
                            IronPython executable.
     :param str cwd: Specify the working directory, or :func:`os.getcwd` will
                     be used.
+    :param callback: (optional) Specify a function called with each line of
+                     stdout/stderr as soon as it is written.
+    :param float timeout: (optional) Specify the number of seconds after
+                          which the process is killed.
+    :param cancel: (optional) Specify a :class:`threading.Event`. If it is
+                   set, for example by another thread, the process is killed.
     :return: A tuple containing a string showing stdout/stderr, and the
              return code
     :rtype: tuple
+    :raises ironpycompiler.exceptions.IronPythonInterruptedError: if the
+            process is killed because of ``timeout`` or ``cancel``.
+
+    If the process is killed, its child processes are also killed. The
+    process is also killed if ``callback`` raises an exception, or the
+    waiting is interrupted, for example by :exc:`KeyboardInterrupt`.
 
     .. note::
 
@@ -32,12 +55,398 @@ def execute_ipy(path_to_exe, arguments, cwd=None):
 
        * Generally this function should not be used directly unless you intend
          to modify or extend IronPyCompiler.
+
+    .. versionchanged:: 1.0.0
+       The parameters ``callback``, ``timeout``, and ``cancel`` were added.
+       Reports a span to :mod:`ironpycompiler.tracing`.
+    """
+
+    with tracing.span("execute_ipy", "process", executable=path_to_exe,
+                      arguments=arguments) as attrs:
+        (output, retcode) = _run_ipy(path_to_exe, arguments, cwd, callback,
+                                     timeout, cancel)
+        attrs["exit_code"] = retcode
+        attrs["output_bytes"] = len(output)
+        if tracing.is_enabled():
+            attrs["children_maxrss_kb"] = tracing.children_maxrss()
+    return (output, retcode)
+
+
+def _run_ipy(path_to_exe, arguments, cwd, callback, timeout, cancel):
+    """Does the same as :func:`execute_ipy` without tracing.
+
     """
 
+    streaming = not (callback is None and timeout is None and cancel is None)
+    kwargs = {}
+    if streaming:
+        # 子プロセスもまとめて終了できるよう、新しいプロセスグループで起動する
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["preexec_fn"] = os.setsid
     ipy_sp = subprocess.Popen(
         args=[os.path.basename(path_to_exe)] + arguments,
         executable=path_to_exe, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT, universal_newlines=True,
-        cwd=(cwd if cwd is not None else os.getcwd()))
-    output = ipy_sp.communicate()
-    return (output[0], ipy_sp.returncode)
+        cwd=(cwd if cwd is not None else os.getcwd()), **kwargs)
+    if not streaming:
+        output = ipy_sp.communicate()
+        return (output[0], ipy_sp.returncode)
+
+    ipy_sp.stdin.close()
+    lines = Queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(ipy_sp.stdout, lines))
+    reader.daemon = True
+    reader.start()
+
+    deadline = None if timeout is None else time.time() + timeout
+    output = []
+    reason = None
+    try:
+        while True:
+            if cancel is not None and cancel.is_set():
+                reason = "cancelled"
+            elif deadline is not None and time.time() >= deadline:
+                reason = "timeout"
+            if reason is not None:
+                raise exceptions.IronPythonInterruptedError(reason,
+                                                            "".join(output))
+            try:
+                line = lines.get(timeout=_POLL_INTERVAL)
+            except Queue.Empty:
+                continue
+            if line is None:
+                break
+            output.append(line)
+            if callback is not None:
+                callback(line)
+    except BaseException:
+        # コールバックの例外やKeyboardInterruptでも子プロセスを残さない
+        _kill_tree(ipy_sp)
+        _close_stdout(ipy_sp, reader)
+        raise
+
+    ipy_sp.wait()
+    ipy_sp.stdout.close()
+    return ("".join(output), ipy_sp.returncode)
+
+
+# タイムアウトと取り消しを確認する間隔（秒）
+_POLL_INTERVAL = 0.1
+
+
+def _read_lines(stream, lines):
+    """Puts the lines read from the stream into the queue, and then None.
+
+    """
+
+    for line in iter(stream.readline, ""):
+        lines.put(line)
+    lines.put(None)
+
+
+def _close_stdout(popen, reader):
+    """Closes stdout of the killed process after the reader has finished.
+
+    """
+
+    # 読み込み中のファイルを閉じるとIOErrorになるため、EOFまで待つ
+    reader.join(_READER_TIMEOUT)
+    if not reader.is_alive():
+        popen.stdout.close()
+
+
+# 終了させたプロセスの出力の終わりを待つ時間（秒）
+_READER_TIMEOUT = 5
+
+
+def _kill_tree(popen):
+    """Kills the process started by :func:`execute_ipy` and its children.
+
+    """
+
+    if popen.poll() is None:
+        try:
+            if os.name == "nt":
+                with open(os.devnull, "w") as devnull:
+                    subprocess.call(["taskkill", "/F", "/T", "/PID",
+                                     str(popen.pid)],
+                                    stdout=devnull, stderr=devnull)
+            else:
+                os.killpg(popen.pid, signal.SIGKILL)
+        except EnvironmentError:
+            pass
+        if popen.poll() is None:
+            try:
+                popen.kill()
+            except EnvironmentError:
+                pass
+    popen.wait()
+
+
+def _read_responses(stream, responses):
+    """Puts the lines written by the worker into the queue.
+
+    Responses are decoded, and the other lines are put as they are. None is
+    put at the end of the stream.
+    """
+
+    marker = constants.WORKER_MARKER
+    for line in iter(stream.readline, ""):
+        if line.startswith(marker):
+            try:
+                responses.put(json.loads(line[len(marker):]))
+                continue
+            except ValueError:
+                pass
+        responses.put(line)
+    responses.put(None)
+
+
+class IronPythonWorker(object):
+
+    """Runs pyc.py repeatedly in a long-lived IronPython process.
+
+    Starting IronPython takes seconds, so compiling many assemblies with
+    :func:`execute_ipy` spends much time in starting processes. This class
+    runs a driver script (``ironpycompiler/ipyworker.py``) with IronPython
+    once, and sends it compile jobs over stdin/stdout. Each request and
+    response is a line containing a JSON object, so any executable which
+    speaks the same protocol can be used instead of IronPython, for
+    example in testing.
+
+    The worker starts on the first job. If it has died, it is restarted
+    before the next job, and a job interrupted by its death is sent again
+    once. Jobs are processed one at a time; this object can be shared by
+    several threads and several instances of
+    :class:`ironpycompiler.compiler.ModuleCompiler`.
+
+    :param str path_to_exe: The path to the IronPython executable.
+    :param str pyc_path: The path to pyc.py.
+    :param str driver: (optional) The path to the driver script.
+    :param float timeout: (optional) The number of seconds to wait for the
+                          worker to start or to answer a health check.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, path_to_exe, pyc_path, driver=None,
+                 timeout=constants.WORKER_TIMEOUT):
+        """Initialization.
+
+        """
+
+        #: The path to the IronPython executable.
+        self.path_to_exe = os.path.abspath(path_to_exe)
+        #: The path to pyc.py.
+        self.pyc_path = os.path.abspath(pyc_path)
+        if driver is None:
+            driver = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "ipyworker.py")
+        #: The path to the driver script.
+        self.driver = driver
+        #: The number of seconds to wait for starting and health checks.
+        self.timeout = timeout
+        #: The number of times the worker was restarted.
+        self.restarts = 0
+        self._process = None
+        self._responses = None
+        self._started = False
+        self._exited = False
+        self._timed_out = False
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_alive(self):
+        """Returns whether the worker process is running.
+
+        :rtype: bool
+        """
+
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """Starts the worker unless it is running.
+
+        :raises ironpycompiler.exceptions.IronPythonWorkerError: if the
+                worker does not start.
+        """
+
+        with self._lock:
+            if self.is_alive():
+                return
+            self._kill()
+            if self._started:
+                self.restarts += 1
+            self._started = True
+            self._exited = False
+            try:
+                self._process = subprocess.Popen(
+                    args=[os.path.basename(self.path_to_exe), self.driver,
+                          self.pyc_path],
+                    executable=self.path_to_exe, stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    universal_newlines=True,
+                    cwd=os.path.dirname(self.pyc_path))
+            except EnvironmentError as e:
+                raise exceptions.IronPythonWorkerError(
+                    msg="Cannot start {}: {}".format(self.path_to_exe, e))
+            self._responses = Queue.Queue()
+            reader = threading.Thread(
+                target=_read_responses,
+                args=(self._process.stdout, self._responses))
+            reader.daemon = True
+            reader.start()
+            # 準備ができたことを知らせる応答を待つ
+            self._receive(self.timeout)
+
+    def ping(self):
+        """Checks whether the worker answers within :attr:`timeout`.
+
+        A worker which does not answer is stopped, and will be restarted
+        by the next job.
+
+        :rtype: bool
+        """
+
+        with self._lock:
+            if not self.is_alive():
+                return False
+            try:
+                self._request({"op": "ping"}, self.timeout)
+            except exceptions.IronPythonWorkerError:
+                return False
+            return True
+
+    def compile(self, args, cwd=None, timeout=None):
+        """Runs pyc.py with the arguments in the worker.
+
+        The jobs run one at a time. If a job does not finish within
+        ``timeout``, the worker is stopped and
+        :class:`ironpycompiler.exceptions.IronPythonInterruptedError` is
+        raised; the worker is restarted by the next job. If the worker exits
+        during a job, it is restarted and the job is tried once more.
+
+        :param list args: The arguments that should be passed to pyc.py.
+        :param str cwd: (optional) Specify the working directory, or
+                        :func:`os.getcwd` will be used.
+        :param float timeout: (optional) The number of seconds to wait for
+                              the job. By default it waits until the job
+                              finishes.
+        :return: A tuple containing a string showing the output from pyc.py,
+                 and its exit status, like :func:`execute_ipy`.
+        :rtype: tuple
+        :raises ironpycompiler.exceptions.IronPythonWorkerError: if the
+                worker cannot run the job.
+        :raises ironpycompiler.exceptions.IronPythonInterruptedError: if
+                the job does not finish within ``timeout``.
+        """
+
+        request = {"op": "compile", "args": list(args),
+                   "cwd": cwd if cwd is not None else os.getcwd()}
+        with self._lock, tracing.span("worker_compile", "process",
+                                      arguments=args) as attrs:
+            for retry in (False, True):
+                self.start()
+                try:
+                    (response, output) = self._request(request, timeout)
+                except exceptions.IronPythonWorkerError:
+                    if self._timed_out:
+                        raise exceptions.IronPythonInterruptedError("timeout")
+                    # ワーカーが途中で終了した場合だけ再試行する
+                    if retry or not self._exited:
+                        raise
+                    continue
+                attrs["exit_code"] = response["status"]
+                attrs["restarts"] = self.restarts
+                return (output + response["output"], response["status"])
+
+    def close(self):
+        """Stops the worker.
+
+        """
+
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self._request({"op": "exit"}, self.timeout)
+                except exceptions.IronPythonWorkerError:
+                    pass
+            self._kill()
+
+    def _request(self, request, timeout):
+        """Sends a request, and returns the response and the other output.
+
+        The worker is stopped if it does not answer properly.
+        """
+
+        self._timed_out = False
+        try:
+            self._process.stdin.write(json.dumps(request) + "\n")
+            self._process.stdin.flush()
+        except EnvironmentError:
+            self._exited = True
+            self._kill()
+            raise exceptions.IronPythonWorkerError(
+                msg="The IronPython worker has exited.")
+        (response, output) = self._receive(timeout)
+        if not response.get("ok"):
+            raise exceptions.IronPythonWorkerError(msg=response.get("error"))
+        return (response, output)
+
+    def _receive(self, timeout):
+        """Waits for a response.
+
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        output = []
+        while True:
+            try:
+                if deadline is None:
+                    item = self._responses.get()
+                else:
+                    item = self._responses.get(
+                        timeout=max(deadline - time.time(), 0))
+            except Queue.Empty:
+                self._timed_out = True
+                self._kill()
+                raise exceptions.IronPythonWorkerError(
+                    msg="The IronPython worker did not respond within "
+                        "{} seconds.".format(timeout))
+            if item is None:
+                self._exited = True
+                self._kill()
+                raise exceptions.IronPythonWorkerError(
+                    msg="The IronPython worker has exited:\n" +
+                        "".join(output))
+            elif isinstance(item, dict):
+                return (item, "".join(output))
+            output.append(item)
+
+    def _kill(self):
+        """Kills the worker process.
+
+        """
+
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                process.kill()
+            except EnvironmentError:
+                pass
+        process.wait()
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except EnvironmentError:
+                pass
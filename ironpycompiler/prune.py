@@ -0,0 +1,678 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for dropping the modules which IronPython does not import.
+
+The analysis counts every module found in the import statements, including
+the imports which are never executed on IronPython, like::
+
+    if sys.platform == "win32":
+        import msvcrt
+    if sys.version_info[0] >= 3:
+        import urllib.request
+
+    try:
+        import json
+    except ImportError:
+        import simplejson as json
+
+    if __name__ == "__main__":
+        import unittest
+
+:class:`ImportPruner` evaluates such guards for the target (see
+:data:`IRONPYTHON`), and drops the compilable modules which are then no
+longer required by the scripts. The fallback imports in the handlers of
+``ImportError`` are dropped if all the modules imported in the ``try``
+block are available. Conditions which cannot be evaluated are kept, and
+so are those which do not depend on the target, like ``if 0:``, because
+such branches are used to tell :mod:`modulefinder` about the modules
+imported dynamically.
+
+.. versionadded:: 1.0.0
+"""
+
+import ast
+import fnmatch
+import os
+
+# Original modules
+from . import analysis
+from . import datatypes
+from . import tracing
+
+_UNKNOWN = object()  # 評価できない条件
+
+
+class _PartialVersion(tuple):
+
+    """The first items of :data:`sys.version_info`, whose length is known.
+
+    A comparison depending on the unknown items cannot be evaluated.
+    """
+
+    def __new__(cls, known, length=5):
+        self = tuple.__new__(cls, known)
+        self.length = length
+        return self
+
+    def compare(self, other):
+        """Returns the sign of comparing the version with a tuple, or
+        :data:`_UNKNOWN`.
+
+        """
+
+        for (mine, theirs) in zip(self, other):
+            if mine != theirs:
+                return -1 if mine < theirs else 1
+        if len(other) <= len(self):
+            # 実際の値のほうが長い
+            return 1
+        return _UNKNOWN
+
+    def item(self, index):
+        """Returns an item or a slice, or :data:`_UNKNOWN`.
+
+        """
+
+        if isinstance(index, slice):
+            indices = range(self.length)[index]
+            if all(i < len(self) for i in indices):
+                return tuple(self[i] for i in indices)
+            if indices == range(len(indices)):
+                return _PartialVersion(self, len(indices))
+            return _UNKNOWN
+        if isinstance(index, (int, long)) and 0 <= index < len(self):
+            return self[index]
+        return _UNKNOWN
+
+
+_ORDER = {ast.Eq: lambda sign: sign == 0,
+          ast.NotEq: lambda sign: sign != 0,
+          ast.Lt: lambda sign: sign < 0,
+          ast.LtE: lambda sign: sign <= 0,
+          ast.Gt: lambda sign: sign > 0,
+          ast.GtE: lambda sign: sign >= 0}
+
+#: The values with which the conditions are evaluated by default, i.e.
+#: those of IronPython 2.7 on Windows. Only the major and minor versions
+#: in ``sys.version_info`` are known, so comparisons depending on the micro
+#: version are not evaluated. See :func:`ironpython_environment`.
+IRONPYTHON = {"sys.platform": "cli",
+              "os.name": "nt",
+              "platform.python_implementation()": "IronPython",
+              "sys.version_info": _PartialVersion((2, 7)),
+              "sys.version_info.major": 2,
+              "sys.version_info.minor": 7}
+
+
+def ironpython_environment(version=None):
+    """Returns :data:`IRONPYTHON` with the full ``sys.version_info``.
+
+    :param version: (optional) The version of IronPython, like ``"2.7.5"``,
+                    such as the one returned by
+                    :func:`ironpycompiler.detect.validate_pythonexe`.
+                    Without it only the major and minor versions are known.
+    :type version: str or :class:`ironpycompiler.datatypes.HashableVersion`
+    :rtype: dict
+
+    .. versionadded:: 1.0.0
+    """
+
+    environment = dict(IRONPYTHON)
+    if version is None:
+        return environment
+    if not isinstance(version, datatypes.HashableVersion):
+        version = datatypes.HashableVersion(str(version))
+    (level, serial) = ("final", 0)
+    if version.prerelease is not None:
+        level = {"a": "alpha", "b": "beta"}[version.prerelease[0]]
+        serial = version.prerelease[1]
+    environment["sys.version_info"] = version.version + (level, serial)
+    environment["sys.version_info.major"] = version.major
+    environment["sys.version_info.minor"] = version.minor
+    environment["sys.version_info.micro"] = version.patch
+    return environment
+
+
+_COMPARE = {ast.Eq: lambda a, b: a == b,
+            ast.NotEq: lambda a, b: a != b,
+            ast.Lt: lambda a, b: a < b,
+            ast.LtE: lambda a, b: a <= b,
+            ast.Gt: lambda a, b: a > b,
+            ast.GtE: lambda a, b: a >= b,
+            ast.In: lambda a, b: a in b,
+            ast.NotIn: lambda a, b: a not in b,
+            ast.Is: lambda a, b: a is b,
+            ast.IsNot: lambda a, b: a is not b}
+
+
+def _dotted(node):
+    """Returns the dotted name of a node, like ``"sys.platform"``, or None.
+
+    """
+
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        value = _dotted(node.value)
+        if value is not None:
+            return value + "." + node.attr
+    elif isinstance(node, ast.Call) and not (
+            node.args or node.keywords or node.starargs or node.kwargs):
+        func = _dotted(node.func)
+        if func is not None:
+            return func + "()"
+    return None
+
+
+def evaluate(node, environment):
+    """Evaluates a condition with the values known in advance.
+
+    Comparisons, ``and``, ``or``, ``not``, subscripts, and the methods
+    ``startswith`` and ``endswith`` of the values in ``environment`` and
+    literals are supported.
+
+    :param node: The condition.
+    :type node: :class:`ast.expr`
+    :param dict environment: The values of the names, like
+                             ``{"sys.platform": "cli"}``.
+    :return: The value, or None if it cannot be evaluated.
+    """
+
+    value = _evaluate(node, environment)
+    if value is _UNKNOWN:
+        return None
+    return value
+
+
+def _evaluate(node, environment):
+    """Evaluates an expression, returning :data:`_UNKNOWN` if impossible.
+
+    """
+
+    name = _dotted(node)
+    if name is not None and name in environment:
+        return environment[name]
+    if isinstance(node, ast.BoolOp):
+        # 評価できない項があっても、結果が決まることがある
+        result = True if isinstance(node.op, ast.And) else False
+        for value in node.values:
+            value = _evaluate(value, environment)
+            if value is _UNKNOWN:
+                result = _UNKNOWN
+            elif isinstance(node.op, ast.And) and not value:
+                return value
+            elif isinstance(node.op, ast.Or) and value:
+                return value
+            elif result is not _UNKNOWN:
+                result = value
+        return result
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        value = _evaluate(node.operand, environment)
+        return _UNKNOWN if value is _UNKNOWN else not value
+    elif isinstance(node, ast.Compare):
+        left = _evaluate(node.left, environment)
+        for (op, comparator) in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, environment)
+            if left is _UNKNOWN or right is _UNKNOWN or \
+               type(op) not in _COMPARE:
+                return _UNKNOWN
+            if isinstance(left, _PartialVersion) or \
+               isinstance(right, _PartialVersion):
+                result = _compare_partial(op, left, right)
+                if result is not True:
+                    return result
+                left = right
+                continue
+            try:
+                if not _COMPARE[type(op)](left, right):
+                    return False
+            except TypeError:
+                return _UNKNOWN
+            left = right
+        return True
+    elif isinstance(node, ast.Subscript):
+        value = _evaluate(node.value, environment)
+        if value is _UNKNOWN:
+            return _UNKNOWN
+        if isinstance(node.slice, ast.Index):
+            index = _evaluate(node.slice.value, environment)
+            if index is _UNKNOWN:
+                return _UNKNOWN
+            if isinstance(value, _PartialVersion):
+                return value.item(index)
+            try:
+                return value[index]
+            except (IndexError, KeyError, TypeError):
+                return _UNKNOWN
+        elif isinstance(node.slice, ast.Slice):
+            bounds = [_evaluate(b, environment) if b is not None else None
+                      for b in (node.slice.lower, node.slice.upper,
+                                node.slice.step)]
+            if _UNKNOWN in bounds:
+                return _UNKNOWN
+            try:
+                if isinstance(value, _PartialVersion):
+                    return value.item(slice(*bounds))
+                return value[slice(*bounds)]
+            except (TypeError, ValueError):
+                return _UNKNOWN
+        return _UNKNOWN
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+            and node.func.attr in ("startswith", "endswith") and \
+            len(node.args) == 1 and not (node.keywords or node.starargs or
+                                         node.kwargs):
+        value = _evaluate(node.func.value, environment)
+        arg = _evaluate(node.args[0], environment)
+        if value is _UNKNOWN or arg is _UNKNOWN or \
+           not isinstance(value, basestring):
+            return _UNKNOWN
+        try:
+            return getattr(value, node.func.attr)(arg)
+        except TypeError:
+            return _UNKNOWN
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return _UNKNOWN
+
+
+def _compare_partial(op, left, right):
+    """Compares a :class:`_PartialVersion` with a tuple.
+
+    """
+
+    if type(op) not in _ORDER or \
+       isinstance(left, _PartialVersion) == isinstance(right, _PartialVersion):
+        return _UNKNOWN
+    if isinstance(left, _PartialVersion):
+        (version, other, sign) = (left, right, 1)
+    else:
+        (version, other, sign) = (right, left, -1)
+    if not isinstance(other, tuple):
+        return _UNKNOWN
+    result = version.compare(other)
+    if result is _UNKNOWN:
+        return _UNKNOWN
+    return _ORDER[type(op)](result * sign)
+
+
+class _Import(object):
+
+    """An import statement found in a module.
+
+    """
+
+    __slots__ = ("module", "fromlist", "level", "lineno", "reason",
+                 "fallback_for")
+
+    def __init__(self, module, fromlist, level, lineno, reason):
+        self.module = module  # from ... importの場合は空文字列のことがある
+        self.fromlist = fromlist  # import文ではNone
+        self.level = level  # -1は暗黙の相対インポートを許す
+        self.lineno = lineno
+        self.reason = reason  # 実行されない理由、またはNone
+        self.fallback_for = None  # ImportErrorを捕まえるtry節のインポート
+
+
+class _ImportCollector(object):
+
+    """Collects the import statements of a module with their guards.
+
+    """
+
+    def __init__(self, source, filename, environment):
+        self.lines = source.splitlines()
+        self.filename = filename
+        self.environment = environment
+        # 対象の環境によらず値が決まる定数
+        self.constants = {}
+        self.absolute = False
+        self.imports = []
+
+    def collect(self, tree):
+        stores = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and \
+               not isinstance(node.ctx, ast.Load):
+                stores[node.id] = stores.get(node.id, 0) + 1
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom) and \
+               node.module == "__future__" and \
+               any(a.name == "absolute_import" for a in node.names):
+                self.absolute = True
+            # mswindows = (sys.platform == "win32")のような定数を使う
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                    and isinstance(node.targets[0], ast.Name) and \
+                    stores[node.targets[0].id] == 1:
+                value = _evaluate(node.value, self.environment)
+                if value is not _UNKNOWN:
+                    self.environment = dict(self.environment)
+                    self.environment[node.targets[0].id] = value
+                value = _evaluate(node.value, self.constants)
+                if value is not _UNKNOWN:
+                    self.constants[node.targets[0].id] = value
+        self._visit(tree.body, None)
+        return self.imports
+
+    def _where(self, node):
+        line = ""
+        if 0 < node.lineno <= len(self.lines):
+            line = self.lines[node.lineno - 1].strip()
+        return "'{}' at {}:{}".format(
+            line, os.path.basename(self.filename), node.lineno)
+
+    def _visit(self, body, reason):
+        """Records the imports in a list of statements.
+
+        """
+
+        for node in body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.imports.append(_Import(
+                        alias.name, None, 0 if self.absolute else -1,
+                        node.lineno, reason))
+            elif isinstance(node, ast.ImportFrom):
+                level = node.level
+                if level == 0 and not self.absolute:
+                    level = -1
+                self.imports.append(_Import(
+                    node.module or "", tuple(a.name for a in node.names),
+                    level, node.lineno, reason))
+            elif isinstance(node, ast.If):
+                value = evaluate(node.test, self.environment)
+                dead = "false condition " + self._where(node)
+                # if 0:やif _false:の下のインポートは、modulefinderへの
+                # 指示として書かれる(例: xml.sax)ので残す
+                if value is None or \
+                   evaluate(node.test, self.constants) is not None:
+                    self._visit(node.body, reason)
+                    self._visit(node.orelse, reason)
+                elif value:
+                    self._visit(node.body, reason)
+                    self._visit(node.orelse, reason or dead.replace(
+                        "false condition", "else branch of true condition"))
+                else:
+                    self._visit(node.body, reason or dead)
+                    self._visit(node.orelse, reason)
+            elif isinstance(node, ast.TryExcept):
+                start = len(self.imports)
+                self._visit(node.body, reason)
+                guarded = [i for i in self.imports[start:]
+                           if i.reason is None]
+                for handler in node.handlers:
+                    start = len(self.imports)
+                    self._visit(handler.body, reason)
+                    if guarded and _catches_import_error(handler):
+                        for imp in self.imports[start:]:
+                            imp.fallback_for = (guarded,
+                                                self._where(handler))
+                self._visit(node.orelse, reason)
+            else:
+                for child in ast.iter_child_nodes(node):
+                    if isinstance(child, ast.stmt):
+                        self._visit([child], reason)
+                    elif isinstance(child, ast.excepthandler):
+                        self._visit(child.body, reason)
+
+
+def _catches_import_error(handler):
+    """Checks whether an exception handler catches ImportError.
+
+    """
+
+    types = handler.type
+    if types is None:
+        return False
+    if isinstance(types, ast.Tuple):
+        types = types.elts
+    else:
+        types = [types]
+    return any(_dotted(t) in ("ImportError", "exceptions.ImportError")
+               for t in types)
+
+
+def _module_name(path, dirs):
+    """Returns the name of a module from its path, or None.
+
+    The longest directory containing the module is used, because
+    site-packages may be in the standard library.
+    """
+
+    best = None
+    for d in dirs:
+        d = os.path.join(os.path.abspath(d), "")
+        if path.startswith(d) and (best is None or len(d) > len(best)):
+            best = d
+    if best is None:
+        return None
+    parts = os.path.splitext(path[len(best):])[0].split(os.sep)
+    if parts[-1] == "__init__":
+        parts.pop()
+    if not parts:
+        return None
+    return ".".join(parts)
+
+
+class ImportPruner(object):
+
+    """Drops the compilable modules which IronPython does not import.
+
+    The import statements of the scripts and the compilable modules are
+    parsed with :mod:`ast` (or extracted with
+    :class:`ironpycompiler.analysis.SourceScanner` if they cannot be
+    parsed), and the modules required by the live imports are followed
+    from the scripts. An import is dead if it is in a branch which is not
+    taken with ``environment`` (the conditions which are constant without
+    ``environment`` are ignored), or it is in a handler of ``ImportError``
+    and all the modules imported in the ``try`` block are built-in or
+    compilable. ``__name__`` is not ``"__main__"`` in the modules.
+
+    :param list include: (optional) Specify the glob patterns of the names
+                         of the modules, like ``"encodings.*"``, which
+                         should be kept with the modules they require,
+                         even if they are not required.
+    :param list exclude: (optional) Specify the glob patterns of the names
+                         of the modules, like ``"*.tests"`` or
+                         ``"unittest*"``, which should be dropped unless
+                         they match ``include``. The modules required only
+                         by them are also dropped.
+    :param dict environment: (optional) Specify the values with which the
+                             conditions are evaluated, or
+                             :data:`IRONPYTHON` is used. If only the major
+                             and minor versions in ``sys.version_info`` are
+                             known, the version passed to :meth:`prune`
+                             is used.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, include=None, exclude=None, environment=None):
+        """Initialization.
+
+        """
+
+        #: The glob patterns of the modules which are always kept.
+        self.include = list(include or [])
+        #: The glob patterns of the modules which are dropped.
+        self.exclude = list(exclude or [])
+        #: The values with which the conditions are evaluated.
+        self.environment = dict(IRONPYTHON if environment is None
+                                else environment)
+
+    def _match(self, name, patterns):
+        """Returns the first pattern matching the name, or None.
+
+        """
+
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(name, pattern):
+                return pattern
+        return None
+
+    def _parse(self, path, name, environment):
+        """Returns the imports of a file.
+
+        """
+
+        if name is not None:
+            environment = dict(environment, __name__=name)
+        with open(path, "U") as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source + "\n", path)
+        except (SyntaxError, TypeError, ValueError):
+            # CPythonで構文解析できない場合は、すべてのインポートを残す
+            imports = []
+            for (what, args) in analysis.SourceScanner().scan(source, path):
+                if what == "relative_import":
+                    (level, fromlist, module) = args
+                elif what == "absolute_import":
+                    (fromlist, module) = args
+                    level = 0
+                else:
+                    (fromlist, module) = args
+                    level = -1
+                imports.append(_Import(module, fromlist, level, 0, None))
+            return imports
+        return _ImportCollector(source, path, environment).collect(tree)
+
+    def _resolve(self, imp, importer, is_package, modules):
+        """Returns the names of the known modules required by an import.
+
+        """
+
+        importer = importer or ""
+        if is_package:
+            package = importer
+        else:
+            package = importer.rpartition(".")[0]
+        if imp.level > 0:
+            parts = package.split(".") if package else []
+            if imp.level - 1 > len(parts):
+                return []
+            base = ".".join(parts[:len(parts) - (imp.level - 1)])
+            names = [".".join(n for n in (base, imp.module) if n)]
+        elif imp.level < 0 and package:
+            # 暗黙の相対インポートを先に試す
+            relative = package + "." + imp.module
+            if package + "." + imp.module.split(".")[0] in modules:
+                names = [relative, imp.module]
+            else:
+                names = [imp.module]
+        else:
+            names = [imp.module]
+
+        required = []
+        for fullname in names:
+            if not fullname:
+                continue
+            parts = fullname.split(".")
+            found = [".".join(parts[:i + 1]) for i in range(len(parts))
+                     if ".".join(parts[:i + 1]) in modules]
+            if found:
+                required.extend(found)
+                if imp.fromlist:
+                    required.extend(fullname + "." + n for n in imp.fromlist
+                                    if fullname + "." + n in modules)
+                break
+        return required
+
+    def _available(self, imp, importer, is_package, modules, result):
+        """Checks whether the module imported by an import is available.
+
+        """
+
+        if self._resolve(imp, importer, is_package, modules):
+            return True
+        return imp.level <= 0 and (
+            imp.module in result.builtin_modules or
+            imp.module.split(".")[0] in result.builtin_modules)
+
+    def prune(self, result, version=None):
+        """Drops the modules which are not required.
+
+        :param result: The result of an analysis.
+        :type result: :class:`ironpycompiler.analysis.AnalysisResult`
+        :param version: (optional) The version of IronPython, which gives
+                        the micro version in ``sys.version_info`` (see
+                        :func:`ironpython_environment`).
+        :return: The result without the dropped modules, and a dictionary
+                 mapping the path to each dropped module to the reason.
+        :rtype: tuple
+        """
+
+        environment = self.environment
+        if version is not None and isinstance(
+                environment.get("sys.version_info"), _PartialVersion):
+            environment = dict(environment, **dict(
+                (k, v) for (k, v) in ironpython_environment(version).items()
+                if k.startswith("sys.version_info")))
+
+        with tracing.span("prune", "analysis",
+                          modules=len(result.compilable_modules)) as attrs:
+            modules = {}  # モジュール名 -> パス
+            unnamed = []
+            for path in result.compilable_modules:
+                name = _module_name(path, result.dirs_of_modules)
+                if name is None:
+                    unnamed.append(path)
+                else:
+                    modules[name] = path
+            packages = set(name for (name, path) in modules.iteritems()
+                           if os.path.splitext(os.path.basename(path))[0] ==
+                           "__init__")
+
+            # 必要なモジュールと、インポートされない理由(またはNone)
+            def required_by(name, path):
+                edges = []
+                is_package = name in packages
+                for imp in self._parse(path, name, environment):
+                    reason = imp.reason
+                    if reason is None and imp.fallback_for is not None:
+                        (guarded, where) = imp.fallback_for
+                        if all(self._available(g, name, is_package,
+                                               modules, result)
+                               for g in guarded):
+                            reason = "ImportError fallback " + where
+                    for required in self._resolve(imp, name, is_package,
+                                                  modules):
+                        edges.append((required, reason))
+                return edges
+
+            reasons = {}  # 残らなかったモジュール -> 理由
+            kept = set(name for name in modules
+                       if self._match(name, self.include))
+            # スクリプトの__name__は分からないのでNoneとする
+            pending = [(None, path) for path in result.paths_to_scripts]
+            pending += [(name, modules[name]) for name in sorted(kept)]
+            while pending:
+                (name, path) = pending.pop()
+                for (required, reason) in required_by(name, path):
+                    if required in kept:
+                        continue
+                    if reason is None:
+                        pattern = self._match(required, self.exclude)
+                        if pattern is not None:
+                            reason = "excluded by '{}'".format(pattern)
+                    if reason is None:
+                        kept.add(required)
+                        reasons.pop(required, None)
+                        pending.append((required, modules[required]))
+                    else:
+                        reasons.setdefault(required, reason)
+
+            dropped = {}
+            for (name, path) in modules.iteritems():
+                if name not in kept:
+                    dropped[path] = reasons.get(
+                        name, "required only by dropped modules")
+            compilable = set(modules[name] for name in kept) | set(unnamed)
+            attrs["dropped"] = len(dropped)
+
+        pruned = analysis.AnalysisResult(
+            result.paths_to_scripts, result.dirs_of_modules,
+            result.builtin_modules, compilable, result.uncompilable_modules,
+            result.analyzer)
+        return (pruned, dropped)
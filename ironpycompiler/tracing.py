@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for measuring where time goes in detection, analysis, and builds.
+
+IronPyCompiler reports timed spans, like the analysis of a script or a run
+of pyc.py, to the hooks registered with :func:`add_hook`. A hook is called
+with a dictionary containing:
+
+* ``"name"``: The name of the span, like ``"execute_ipy"``.
+* ``"cat"``: The category, like ``"process"``.
+* ``"start"``: The start time (:func:`time.time`).
+* ``"duration"``: The duration in seconds.
+* ``"thread"``: The identifier of the thread.
+* ``"args"``: A dictionary of attributes, like module counts, bytes, and
+  exit codes.
+
+If no hook is registered, :func:`span` returns a shared object doing
+nothing, so that tracing costs almost nothing.
+
+:class:`ChromeTraceRecorder` is a hook which writes the spans in the
+Chrome trace-event format, which can be viewed in ``chrome://tracing``.
+
+.. versionadded:: 1.0.0
+"""
+
+import os
+import sys
+import time
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 登録されたフック
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """Registers a function called with each span.
+
+    :param hook: A function with one argument, the dictionary describing a
+                 span. It may be called from several threads.
+
+    .. versionadded:: 1.0.0
+    """
+
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook):
+    """Unregisters a function registered with :func:`add_hook`.
+
+    .. versionadded:: 1.0.0
+    """
+
+    global _hooks
+    with _hooks_lock:
+        _hooks = [h for h in _hooks if h is not hook]
+
+
+def is_enabled():
+    """Returns whether any hook is registered.
+
+    :rtype: bool
+
+    .. versionadded:: 1.0.0
+    """
+
+    return bool(_hooks)
+
+
+def children_maxrss():
+    """Returns the peak resident set size of the child processes in KiB.
+
+    :return: The largest value among the terminated child processes, or
+             None if it is not available (e.g. on Windows).
+    :rtype: int
+
+    .. versionadded:: 1.0.0
+    """
+
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == "darwin":  # macOSではバイト単位
+        maxrss //= 1024
+    return maxrss
+
+
+class _NullArgs(dict):
+
+    """Dictionary ignoring all the attributes set while tracing is disabled.
+
+    """
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullSpan(object):
+
+    """Span doing nothing, returned while tracing is disabled.
+
+    """
+
+    __slots__ = ()
+
+    _args = _NullArgs()
+
+    def __enter__(self):
+        return self._args
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    """Span reported to the hooks when it exits.
+
+    """
+
+    __slots__ = ("name", "cat", "args", "start", "hooks")
+
+    def __init__(self, name, cat, args, hooks):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.hooks = hooks
+
+    def __enter__(self):
+        self.start = time.time()
+        return self.args
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.time() - self.start
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        event = {"name": self.name, "cat": self.cat, "start": self.start,
+                 "duration": duration,
+                 "thread": threading.current_thread().ident,
+                 "args": self.args}
+        for hook in self.hooks:
+            hook(event)
+        return False
+
+
+def span(name, cat="ironpycompiler", **args):
+    """Returns a context manager measuring a span.
+
+    The context manager returns the dictionary of the attributes, to which
+    more attributes can be added::
+
+        with tracing.span("compile", "compiler", modules=10) as attrs:
+            attrs["exit_code"] = run()
+
+    :param str name: The name of the span.
+    :param str cat: (optional) The category of the span.
+    :param args: The attributes of the span.
+
+    .. versionadded:: 1.0.0
+    """
+
+    hooks = _hooks
+    if not hooks:
+        return _NULL_SPAN
+    return _Span(name, cat, args, hooks)
+
+
+class ChromeTraceRecorder(object):
+
+    """Hook recording spans in the Chrome trace-event format.
+
+    Usage::
+
+        recorder = tracing.ChromeTraceRecorder()
+        tracing.add_hook(recorder)
+        try:
+            mc.create_asm()
+        finally:
+            tracing.remove_hook(recorder)
+        recorder.write("trace.json")
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self):
+        """Initialization.
+
+        """
+
+        #: The list of the recorded trace events.
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.time()
+
+    def __call__(self, event):
+        """Records a span.
+
+        """
+
+        trace_event = {"name": event["name"], "cat": event["cat"],
+                       "ph": "X", "pid": os.getpid(),
+                       "tid": event["thread"],
+                       "ts": int((event["start"] - self._origin) * 1e6),
+                       "dur": int(event["duration"] * 1e6),
+                       "args": dict((k, _jsonable(v))
+                                    for (k, v) in event["args"].items())}
+        with self._lock:
+            self.events.append(trace_event)
+
+    def write(self, path):
+        """Writes the recorded spans into a JSON file.
+
+        :param str path: The path to the file.
+        """
+
+        import json
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _jsonable(value):
+    """Converts an attribute into a value which can be written in JSON.
+
+    """
+
+    if value is None or isinstance(value, (bool, int, long, float,
+                                           basestring)):
+        return value
+    return str(value)
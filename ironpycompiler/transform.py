@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for transforming the source code of scripts before compilation.
+
+.. versionadded:: 1.0.0
+"""
+
+import os
+import re
+import codecs
+import tokenize
+import hashlib
+import StringIO
+
+# 単純文ではない文の最初のトークン
+_COMPOUND_KEYWORDS = frozenset(["if", "while", "for", "try", "with", "def",
+                                "class", "@"])
+
+# PEP 263のエンコーディング宣言
+_CODING_RE = re.compile(r"^[ \t\f]*#.*coding[:=][ \t]*(?P<name>[-\w.]+)")
+
+
+def reference_prologue(assemblies):
+    """Returns a statement adding references to the assemblies.
+
+    :param list assemblies: The names of the assemblies, like ``"foo"`` for
+                            foo.dll.
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    adds = "; ".join('_ipc_clr.AddReference("{}")'.format(a)
+                     for a in assemblies)
+    return "import clr as _ipc_clr; {}; del _ipc_clr".format(adds)
+
+
+def _statements(source):
+    """Yields the significant tokens of each statement at the top level.
+
+    """
+
+    tokens = []
+    depth = 0
+    readline = StringIO.StringIO(source).readline
+    for tok in tokenize.generate_tokens(readline):
+        tok_type = tok[0]
+        if tok_type == tokenize.INDENT:
+            depth += 1
+        elif tok_type == tokenize.DEDENT:
+            depth -= 1
+        elif tok_type == tokenize.NEWLINE:
+            if tokens and depth == 0:
+                yield tokens
+            tokens = []
+        elif tok_type not in (tokenize.COMMENT, tokenize.NL,
+                              tokenize.ENDMARKER):
+            tokens.append(tok)
+
+
+def insert_prologue(source, prologue):
+    """Inserts a statement which should be executed first into source code.
+
+    The statement is inserted after the docstring and the ``__future__``
+    imports, on an existing line so that the line numbers in tracebacks do
+    not change. If the first statement is compound, like ``if`` or
+    ``def``, the statement replaces a blank or comment line before it, the
+    shebang line, or the encoding declaration (a UTF-8 BOM is added if
+    necessary), or is put before the first statement in the ``try`` block.
+    Only if none of them is possible, a line is inserted.
+
+    :param str source: The source code.
+    :param str prologue: The simple statement to be inserted.
+    :return: The transformed source code.
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    bom = ""
+    if source.startswith(codecs.BOM_UTF8):
+        bom = codecs.BOM_UTF8
+        source = source[len(bom):]
+    lines = source.splitlines(True)
+    header_end = None
+    first_stmt = None
+    for (index, tokens) in enumerate(_statements(source)):
+        is_docstring = (index == 0 and len(tokens) == 1 and
+                        tokens[0][0] == tokenize.STRING)
+        is_future = [t[1] for t in tokens[:2]] == ["from", "__future__"]
+        if is_docstring or is_future:
+            header_end = tokens[-1][3]
+        else:
+            first_stmt = tokens[0]
+            break
+
+    if header_end is not None:
+        # ヘッダの最後の文と同じ行に追加する
+        (row, col) = header_end
+        line = lines[row - 1]
+        lines[row - 1] = line[:col] + "; " + prologue + line[col:]
+    elif first_stmt is None:
+        lines.append("\n" + prologue + "\n")
+    elif first_stmt[1] not in _COMPOUND_KEYWORDS:
+        (row, col) = first_stmt[2]
+        line = lines[row - 1]
+        lines[row - 1] = line[:col] + prologue + "; " + line[col:]
+    else:
+        row = first_stmt[2][0]
+        index = _free_line(source, lines[:row - 1])
+        body = _try_body(source, first_stmt[2])
+        if index is not None:
+            line = lines[index]
+            if _CODING_RE.match(line) and not _is_ascii(source):
+                # エンコーディング宣言の代わりにBOMでUTF-8を示す
+                bom = codecs.BOM_UTF8
+            # 改行文字は残す
+            lines[index] = prologue + \
+                (line[len(line.rstrip("\r\n")):] or "\n")
+        elif body is not None:
+            (row, col) = body
+            line = lines[row - 1]
+            lines[row - 1] = line[:col] + prologue + "; " + line[col:]
+        else:
+            lines.insert(row - 1, prologue + "\n")
+
+    return bom + "".join(lines)
+
+
+def _is_ascii(source):
+    """Returns whether the source code contains only ASCII characters.
+
+    """
+
+    try:
+        source.decode("ascii")
+    except UnicodeError:
+        return False
+    return True
+
+
+def _free_line(source, lines):
+    """Returns the index of the line which can be replaced, or None.
+
+    ``lines`` are the lines before the first statement.
+    """
+
+    # 空行かコメント行があれば置き換える
+    for i in range(len(lines) - 1, -1, -1):
+        stripped = lines[i].strip()
+        if (stripped == "" or stripped.startswith("#")) and \
+           not (i < 2 and (stripped.startswith("#!") or
+                           _CODING_RE.match(lines[i]))):
+            return i
+    # アセンブリではシバン行は使われない
+    if lines and lines[0].startswith("#!") and not _CODING_RE.match(lines[0]):
+        return 0
+    # 1行目のエンコーディング宣言は、UTF-8ならBOMで置き換えられる
+    m = _CODING_RE.match(lines[0]) if lines else None
+    if m is not None:
+        try:
+            name = codecs.lookup(m.group("name")).name
+        except LookupError:
+            return None
+        if _is_ascii(source) or name == "utf-8":
+            return 0
+    return None
+
+
+def _try_body(source, start):
+    """Returns the position of the first statement executed in a ``try``.
+
+    ``start`` is the position of the first statement of the source. None is
+    returned if it is not ``try``, or the first statement in the block is
+    compound.
+    """
+
+    skipped = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE,
+               tokenize.INDENT, tokenize.DEDENT)
+    readline = StringIO.StringIO(source).readline
+    tokens = (tok for tok in tokenize.generate_tokens(readline)
+              if tok[0] not in skipped and tok[2] >= start)
+    in_try = False
+    for tok in tokens:
+        if tok[1] == "try":
+            # try:の直後の文は必ず実行される
+            next(tokens)
+            in_try = True
+        elif in_try and tok[0] != tokenize.ENDMARKER and \
+                tok[1] not in _COMPOUND_KEYWORDS:
+            return tok[2]
+        else:
+            return None
+    return None
+
+
+def stage_script(path, staging_dir, prologue):
+    """Writes a copy of the script with a prologue into a directory.
+
+    The copy has the same file name as the script, in a subdirectory
+    specific to the path to the script and the prologue, so that the
+    compilations with different prologues can stage the same script at the
+    same time.
+
+    :param str path: The path to the script.
+    :param str staging_dir: The path to the directory where the copy is
+                            written.
+    :param str prologue: The statement inserted by :func:`insert_prologue`.
+    :return: The path to the copy.
+    :rtype: str
+
+    .. versionadded:: 1.0.0
+    """
+
+    from . import cache
+
+    with open(path, "U") as f:
+        source = f.read()
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(path)) + "\0" +
+                       prologue)
+    dest_dir = os.path.join(staging_dir, key.hexdigest()[:16])
+    if not os.path.isdir(dest_dir):
+        try:
+            os.makedirs(dest_dir)
+        except OSError:
+            # 他のスレッドが作成した
+            if not os.path.isdir(dest_dir):
+                raise
+    dest = os.path.join(dest_dir, os.path.basename(path))
+    transformed = insert_prologue(source, prologue)
+    if os.path.isfile(dest):
+        with open(dest, "U") as f:
+            if f.read() == transformed:
+                # 更新日時を変えないようにする
+                return dest
+    cache.atomic_write(dest, transformed)
+    return dest
+
+
+# 複合文の見出しを始めるキーワード
+_HEADER_KEYWORDS = frozenset(["if", "elif", "else", "while", "for", "try",
+                              "except", "finally", "with", "def", "class"])
+
+# 縮小したファイルの最後の行。元のファイルのダイジェストと削減量を記録する
+_MINIFIED_RE = re.compile(r"\n# ipc-minified (?P<digest>[0-9a-f]{40}) "
+                          r"(?P<saved>-?\d+)\n\Z")
+
+
+def minify(source, docstrings=True, asserts=True):
+    """Removes the code which is not executed with the option ``-OO``.
+
+    The docstrings, the ``assert`` statements, and the blocks of
+    ``if __debug__:``, ``if 0:``, and ``if False:`` are replaced with
+    ``pass`` and blank lines, so that the line numbers in tracebacks do not
+    change. A ``__debug__`` condition is replaced with ``0``, so that
+    ``else`` blocks are executed as with ``-O``. Like ``-OO``, this breaks
+    code using ``__doc__``.
+
+    :param str source: The source code.
+    :param bool docstrings: (optional) Specify whether to remove the
+                            docstrings.
+    :param bool asserts: (optional) Specify whether to remove the
+                         ``assert`` statements and the ``__debug__``
+                         blocks.
+    :return: The transformed source code.
+    :rtype: str
+    :raises tokenize.TokenError: if the source cannot be tokenized.
+
+    .. versionadded:: 1.0.0
+    """
+
+    tokens = [t for t in tokenize.generate_tokens(
+        StringIO.StringIO(source).readline) if t[0] != tokenize.COMMENT]
+    edits = []  # (開始, 終了, 置換後の文字列)
+    depth = 0  # 括弧の深さ
+    stmt_start = True
+    stmt_keyword = None  # 文の最初のトークン
+    expect_doc = docstrings
+    doc_replacement = ""  # モジュールのdocstringは空にできる
+    in_def = False
+    i = 0
+    while i < len(tokens):
+        (tok_type, tok_str, start, end, line) = tokens[i]
+        if tok_type in (tokenize.NL, tokenize.INDENT):
+            i += 1
+            continue
+        if tok_type in (tokenize.NEWLINE, tokenize.DEDENT):
+            stmt_start = True
+            expect_doc = expect_doc and tok_type == tokenize.NEWLINE
+            i += 1
+            continue
+        if tok_type == tokenize.ENDMARKER:
+            break
+
+        if stmt_start:
+            stmt_keyword = tok_str if tok_type == tokenize.NAME else None
+            stmt_end = _statement_end(tokens, i)
+            if expect_doc and tok_type == tokenize.STRING and \
+               all(t[0] == tokenize.STRING for t in tokens[i:stmt_end]):
+                # 後に;が続く場合は、文を空にできない
+                followed = tokens[stmt_end][0] == tokenize.OP
+                edits.append((start, tokens[stmt_end - 1][3],
+                              "pass" if followed else doc_replacement))
+                i = stmt_end
+                expect_doc = False
+                continue
+            expect_doc = False
+            if asserts and stmt_keyword == "assert":
+                edits.append((start, tokens[stmt_end - 1][3], "pass"))
+                i = stmt_end
+                continue
+            if stmt_keyword in ("if", "elif") and i + 2 < len(tokens) and \
+               tokens[i + 2][1] == ":" and (
+                   (asserts and tokens[i + 1][1] == "__debug__") or
+                   tokens[i + 1][1] in ("0", "False")):
+                if tokens[i + 1][1] == "__debug__":
+                    edits.append((tokens[i + 1][2], tokens[i + 1][3], "0"))
+                body_end = _block_end(tokens, i + 3)
+                edits.append(_blank_block(tokens, i + 3, body_end))
+                i = body_end
+                stmt_start = True
+                continue
+            if stmt_keyword in ("def", "class"):
+                in_def = True
+            stmt_start = False
+
+        if tok_type == tokenize.OP:
+            if tok_str in "([{":
+                depth += 1
+            elif tok_str in ")]}":
+                depth -= 1
+            elif depth == 0 and tok_str == ";":
+                stmt_start = True
+            elif depth == 0 and tok_str == ":" and \
+                    stmt_keyword in _HEADER_KEYWORDS:
+                # 同じ行にある本体の最初の文
+                stmt_start = True
+                if in_def:
+                    in_def = False
+                    expect_doc = docstrings
+                    doc_replacement = "pass"
+        i += 1
+
+    return _apply_edits(source, edits)
+
+
+def _statement_end(tokens, index):
+    """Returns the index of the NEWLINE or ``;`` ending a simple statement.
+
+    """
+
+    depth = 0
+    for i in range(index, len(tokens)):
+        (tok_type, tok_str) = tokens[i][:2]
+        if tok_type == tokenize.OP:
+            if tok_str in "([{":
+                depth += 1
+            elif tok_str in ")]}":
+                depth -= 1
+            elif tok_str == ";" and depth == 0:
+                return i
+        elif tok_type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            return i
+    return len(tokens) - 1
+
+
+def _block_end(tokens, index):
+    """Returns the index of the token after the body starting at ``index``.
+
+    """
+
+    if tokens[index][0] != tokenize.NEWLINE:
+        # 同じ行にある本体
+        while tokens[index][0] not in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            index += 1
+        return index
+    level = 0
+    for i in range(index + 1, len(tokens)):
+        if tokens[i][0] == tokenize.INDENT:
+            level += 1
+        elif tokens[i][0] == tokenize.DEDENT:
+            level -= 1
+            if level == 0:
+                return i
+    return len(tokens) - 1
+
+
+def _blank_block(tokens, index, end):
+    """Returns the edit replacing the body of a block with ``pass``.
+
+    """
+
+    if tokens[index][0] != tokenize.NEWLINE:
+        return (tokens[index][2], tokens[end - 1][3], "pass")
+    first = [t for t in tokens[index:end]
+             if t[0] not in (tokenize.NEWLINE, tokenize.NL,
+                             tokenize.INDENT)][0]
+    last = [t for t in tokens[index:end] if t[0] == tokenize.NEWLINE][-1]
+    indent = first[4][:first[2][1]]
+    return ((first[2][0], 0), last[2], indent + "pass")
+
+
+def _apply_edits(source, edits):
+    """Applies the edits, keeping the number of the lines.
+
+    The edits contained in another edit are ignored.
+    """
+
+    offsets = [0]
+    for line in source.splitlines(True):
+        offsets.append(offsets[-1] + len(line))
+
+    def offset(pos):
+        return offsets[pos[0] - 1] + pos[1]
+
+    result = []
+    pos = 0
+    for (start, end, text) in sorted(edits):
+        if offset(start) < pos:
+            continue
+        result.append(source[pos:offset(start)])
+        result.append(text + "\n" * (end[0] - start[0]))
+        pos = offset(end)
+    result.append(source[pos:])
+    return "".join(result)
+
+
+def stage_minified(path, root, staging_dir, docstrings=True, asserts=True):
+    """Writes a copy of a file transformed by :func:`minify`.
+
+    The copy is written at the same relative path from a subdirectory
+    specific to ``root`` as the file from ``root``, so that the packages
+    keep their structure. The digest of the file is recorded at the end of
+    the copy, which is reused while the file is unchanged. If the
+    transformed source cannot be parsed, the file is copied unchanged.
+
+    :param str path: The path to the file.
+    :param str root: The directory containing the file and its packages.
+    :param str staging_dir: The path to the directory where the copy is
+                            written.
+    :param bool docstrings: (optional) See :func:`minify`.
+    :param bool asserts: (optional) See :func:`minify`.
+    :return: The path to the copy, and the number of the bytes removed.
+    :rtype: tuple
+
+    .. versionadded:: 1.0.0
+    """
+
+    import ast
+    from . import cache
+
+    flags = "{}{}".format(int(docstrings), int(asserts))
+    root = os.path.abspath(root)
+    key = hashlib.sha1(os.path.normcase(root) + "\0" + flags)
+    dest = os.path.join(staging_dir, key.hexdigest()[:16],
+                        os.path.relpath(os.path.abspath(path), root))
+    digest = cache.file_digest(path)
+    if os.path.isfile(dest):
+        with open(dest, "rb") as f:
+            # 最後の行だけを読む
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 128))
+            m = _MINIFIED_RE.search(f.read().replace("\r\n", "\n"))
+        if m is not None and m.group("digest") == digest:
+            return (dest, int(m.group("saved")))
+
+    with open(path, "U") as f:
+        source = f.read()
+    try:
+        transformed = minify(source, docstrings, asserts)
+        ast.parse(transformed + "\n", path)
+    except (SyntaxError, TypeError, ValueError, tokenize.TokenError):
+        transformed = source
+    if not os.path.isdir(os.path.dirname(dest)):
+        try:
+            os.makedirs(os.path.dirname(dest))
+        except OSError:
+            # 他のスレッドが作成した
+            if not os.path.isdir(os.path.dirname(dest)):
+                raise
+    saved = len(source) - len(transformed)
+    if transformed and not transformed.endswith("\n"):
+        transformed += "\n"
+    cache.atomic_write(dest, "{}# ipc-minified {} {}\n".format(
+        transformed, digest, saved))
+    return (dest, saved)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Module for recompiling scripts automatically when they are changed.
+
+:class:`ProjectWatcher` keeps the imports of the scripts and the modules
+they require in memory, and observes those files. When some of them are
+saved, it waits until the changes stop, scans only the changed files, and
+calls :meth:`ironpycompiler.compiler.ModuleCompiler.create_asm`. The
+dependency graph is resolved again only if the imports of a changed file
+differ, or a module is added or removed, and then the observed files are
+updated.
+
+Changes are observed with inotify on Linux (:class:`InotifyObserver`), or
+by polling the modification times and sizes of the files
+(:class:`PollingObserver`).
+
+.. versionadded:: 1.0.0
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# Original modules
+from . import cache
+from . import constants
+from . import exceptions
+from . import tracing
+
+# inotifyのフラグ
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# 追加や削除でモジュールの解決が変わりうるイベント
+_IN_STRUCTURE = _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+_IN_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_STRUCTURE
+
+# 追加や削除がモジュールの解決に影響するファイル
+_MODULE_SUFFIXES = (".py", ".pyd")
+
+# stop()を確認する間隔
+_STOP_INTERVAL = 0.5
+
+
+def _stat(path):
+    """Returns the modification time and the size, or None.
+
+    """
+
+    try:
+        st = os.stat(path)
+    except EnvironmentError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+def _import_statements(imports):
+    """Removes the names stored in a module from its imports.
+
+    The stored names do not change which modules are found.
+    """
+
+    return [i for i in imports if i[0] != "store"]
+
+
+class PollingObserver(object):
+
+    """Observes files and directories by polling them.
+
+    A file is changed if its modification time or size changes. A
+    directory is changed if a file is added into or removed from it.
+
+    :param float interval: (optional) The number of seconds between the
+                           checks.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, interval=constants.WATCH_INTERVAL):
+        """Initialization.
+
+        """
+
+        #: The number of seconds between the checks.
+        self.interval = interval
+        self._snapshot = {}
+
+    def watch(self, paths):
+        """Sets the files and directories which are observed.
+
+        Changes of the paths which were observed before are not missed.
+
+        :param paths: The absolute paths to the files and directories.
+        """
+
+        self._snapshot = dict(
+            (p, self._snapshot[p] if p in self._snapshot else _stat(p))
+            for p in paths)
+
+    def wait(self, timeout=None):
+        """Waits for changes.
+
+        :param float timeout: (optional) The maximum number of seconds to
+                              wait.
+        :return: The set of the changed paths, which is empty if nothing
+                 was changed before the timeout.
+        :rtype: set
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if deadline is None:
+                time.sleep(self.interval)
+            else:
+                remaining = deadline - time.time()
+                time.sleep(max(0, min(self.interval, remaining)))
+            changed = set()
+            for (path, old) in self._snapshot.items():
+                new = _stat(path)
+                if new != old:
+                    self._snapshot[path] = new
+                    changed.add(path)
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+    def close(self):
+        """Does nothing; for compatibility with :class:`InotifyObserver`.
+
+        """
+
+        pass
+
+
+class InotifyObserver(object):
+
+    """Observes files and directories with inotify.
+
+    The directories containing the files are observed. A directory is
+    reported as changed if a module or a package is added into or removed
+    from it.
+
+    :raises EnvironmentError: if inotify is not available.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self):
+        """Initialization.
+
+        """
+
+        import ctypes
+        import ctypes.util
+
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c"),
+                                     use_errno=True)
+            init = self._libc.inotify_init1
+        except (OSError, AttributeError):
+            raise EnvironmentError(errno.ENOSYS, "inotify is not available.")
+        self._fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise EnvironmentError(error, os.strerror(error))
+        self._wds = {}  # 監視記述子 -> ディレクトリ
+        self._dirs = {}  # ディレクトリ -> 監視記述子
+        self._paths = frozenset()
+
+    def watch(self, paths):
+        """Sets the files and directories which are observed.
+
+        :param paths: The absolute paths to the files and directories.
+        """
+
+        self._paths = frozenset(paths)
+        dirs = set(p if os.path.isdir(p) else os.path.dirname(p)
+                   for p in self._paths)
+        for directory in set(self._dirs) - dirs:
+            wd = self._dirs.pop(directory)
+            del self._wds[wd]
+            self._libc.inotify_rm_watch(self._fd, wd)
+        for directory in dirs - set(self._dirs):
+            if isinstance(directory, unicode):
+                path = directory.encode(sys.getfilesystemencoding())
+            else:
+                path = directory
+            wd = self._libc.inotify_add_watch(self._fd, path, _IN_MASK)
+            if wd >= 0:
+                self._dirs[directory] = wd
+                self._wds[wd] = directory
+
+    def wait(self, timeout=None):
+        """Waits for changes.
+
+        :param float timeout: (optional) The maximum number of seconds to
+                              wait.
+        :return: The set of the changed paths, which is empty if nothing
+                 was changed before the timeout.
+        :rtype: set
+        """
+
+        try:
+            readable = select.select([self._fd], [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return set()
+            raise
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return set()
+            raise
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            (wd, mask, cookie, length) = struct.unpack_from("iIII", data,
+                                                            offset)
+            name = data[offset + 16:offset + 16 + length].rstrip("\0")
+            offset += 16 + length
+            if mask & _IN_Q_OVERFLOW:
+                # イベントが失われたので、すべて変更されたとみなす
+                changed |= self._paths
+                continue
+            directory = self._wds.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if path in self._paths:
+                changed.add(path)
+            elif mask & _IN_STRUCTURE and (mask & _IN_ISDIR or
+                                           name.endswith(_MODULE_SUFFIXES)):
+                changed.add(directory)
+        return changed
+
+    def close(self):
+        """Stops observing.
+
+        """
+
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_observer(polling=False, interval=constants.WATCH_INTERVAL):
+    """Returns the best observer available.
+
+    :param bool polling: (optional) Specify whether to use
+                         :class:`PollingObserver` even if inotify is
+                         available.
+    :param float interval: (optional) The interval of polling.
+
+    .. versionadded:: 1.0.0
+    """
+
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyObserver()
+        except EnvironmentError:
+            pass
+    return PollingObserver(interval)
+
+
+class ProjectWatcher(object):
+
+    """Rebuilds scripts when they or the modules they require are changed.
+
+    Usage::
+
+        mc = compiler.ModuleCompiler(["main.py"], cache_dir="cache")
+        watcher = watch.ProjectWatcher(mc, build_options={"out": "app.dll"})
+        try:
+            watcher.run()
+        finally:
+            watcher.close()
+
+    :param compiler: The compiler of the scripts. Its
+                     :attr:`import_cache` is replaced while watching.
+    :type compiler: :class:`ironpycompiler.compiler.ModuleCompiler`
+    :param list dirs_of_modules: (optional) The directories passed to
+                                 :meth:`check_compilability`.
+    :param dict build_options: (optional) The keyword arguments passed to
+                               :meth:`create_asm`.
+    :param float debounce: (optional) The number of seconds without changes
+                           after which the scripts are rebuilt.
+    :param observer: (optional) The observer, or the one returned by
+                     :func:`create_observer` will be used.
+    :param callback: (optional) A function called with a dictionary after
+                     each build. See :meth:`build`.
+
+    .. versionadded:: 1.0.0
+    """
+
+    def __init__(self, compiler, dirs_of_modules=None, build_options=None,
+                 debounce=constants.WATCH_DEBOUNCE, observer=None,
+                 callback=None):
+        """Initialization.
+
+        """
+
+        #: The compiler of the scripts.
+        self.compiler = compiler
+        #: The directories where the modules are searched for.
+        self.dirs_of_modules = dirs_of_modules
+        #: The keyword arguments passed to :meth:`create_asm`.
+        self.build_options = dict(build_options or {})
+        #: The number of seconds without changes before rebuilding.
+        self.debounce = debounce
+        #: The observer of the files.
+        self.observer = observer if observer is not None else \
+            create_observer()
+        #: The function called after each build, or None.
+        self.callback = callback
+        #: The set of the observed paths.
+        self.watched = frozenset()
+        self._original_cache = compiler.import_cache
+        self._imports = cache.MemoryImportCache(compiler.import_cache)
+        compiler.import_cache = self._imports
+        self._analyzed = False
+        self._stop = threading.Event()
+
+    def build(self, changed=()):
+        """Updates the analysis of the changed files, and compiles the scripts.
+
+        :param changed: (optional) The paths reported by the observer.
+        :return: A dictionary containing the sorted list of the changed
+                 paths (``"changed"``), whether the dependency graph was
+                 resolved again (``"analyzed"``), whether the assemblies
+                 were restored from the cache (``"cache_hit"``), the
+                 number of seconds (``"duration"``), and the exception
+                 which stopped the build, or None (``"error"``).
+        :rtype: dict
+        """
+
+        result = {"changed": sorted(changed), "analyzed": False,
+                  "cache_hit": False, "duration": None, "error": None}
+        start = time.time()
+        try:
+            with tracing.span("watch_build", "watch",
+                              changed=len(result["changed"])) as attrs:
+                if not self._analyzed or self._graph_changed(changed):
+                    self._analyze()
+                    result["analyzed"] = True
+                else:
+                    # 解析結果は変わらないので、create_asmに再解析させない
+                    self.compiler.use_analysis(
+                        self.compiler.analysis.refreshed())
+                self.compiler.create_asm(**self.build_options)
+                result["cache_hit"] = self.compiler.cache_hit
+                attrs.update(analyzed=result["analyzed"],
+                             cache_hit=result["cache_hit"])
+        except (SyntaxError, EnvironmentError, exceptions.IPCError) as e:
+            # 監視を続け、次の変更で再び試みる
+            result["error"] = e
+        result["duration"] = time.time() - start
+        if self.callback is not None:
+            self.callback(result)
+        return result
+
+    def _graph_changed(self, changed):
+        """Scans the changed files, and checks whether the graph changed.
+
+        """
+
+        scanner = self.compiler.analyzer
+        graph_changed = False
+        for path in changed:
+            old = self._imports.peek(path, scanner.name)
+            if old is None:
+                # ディレクトリ、または新しいファイル
+                graph_changed = True
+                continue
+            self._imports.invalidate([path])
+            if not os.path.isfile(path):
+                graph_changed = True
+                continue
+            with open(path, "U") as f:
+                new = scanner.scan(f.read(), path)
+            self._imports.set(path, new, scanner.name)
+            if _import_statements(new) != _import_statements(old):
+                graph_changed = True
+        return graph_changed
+
+    def _analyze(self):
+        """Resolves the dependency graph, and updates the observed files.
+
+        """
+
+        mc = self.compiler
+        self._analyzed = False
+        try:
+            mc.check_compilability(self.dirs_of_modules)
+            self._analyzed = True
+        finally:
+            files = set(mc.paths_to_scripts) | mc.compilable_modules
+            if self._analyzed:
+                self._imports.retain(files)
+            else:
+                # 失敗した場合も、修正されたことがわかるよう監視を続ける
+                files |= set(p for p in self.watched if os.path.isfile(p))
+            dirs = set(os.path.dirname(p) for p in files)
+            dirs |= set(os.path.abspath(d) for d in mc.dirs_of_modules or []
+                        if os.path.isdir(d))
+            self.watched = frozenset(files | dirs)
+            self.observer.watch(self.watched)
+
+    def run(self):
+        """Builds the scripts, and rebuilds them on changes.
+
+        This method returns after :meth:`stop` is called.
+
+        """
+
+        self.build()
+        while not self._stop.is_set():
+            changed = self.observer.wait(_STOP_INTERVAL)
+            if not changed:
+                continue
+            # 連続した保存をまとめる
+            while not self._stop.is_set():
+                more = self.observer.wait(self.debounce)
+                if not more:
+                    break
+                changed |= more
+            if not self._stop.is_set():
+                self.build(changed)
+
+    def stop(self):
+        """Makes :meth:`run` return. It can be called from any thread.
+
+        """
+
+        self._stop.set()
+
+    def close(self):
+        """Stops observing, and restores the import cache of the compiler.
+
+        """
+
+        self.observer.close()
+        self.compiler.import_cache = self._original_cache
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Builds minimal PE files containing a version resource.
+
+The files have one section ``.rsrc`` with the resource directory leading to
+``RT_VERSION``, which is enough for :mod:`ironpycompiler.peinfo`. They
+contain no code.
+"""
+
+import struct
+
+# VS_FIXEDFILEINFOの署名
+_SIGNATURE = 0xFEEF04BD
+
+
+def _align(data):
+    return data + b"\0" * ((-len(data)) % 4)
+
+
+def _node(key, value=b"", children=(), text=False):
+    """Returns a structure of VS_VERSIONINFO, like String or StringTable.
+
+    """
+
+    header = b"\0" * 6 + (key + u"\0").encode("utf-16-le")
+    body = _align(header)
+    if value:
+        body += _align(value)
+    for child in children:
+        body = _align(body) + child
+    value_length = len(value) // 2 if text else len(value)
+    return struct.pack("<HHH", len(body), value_length,
+                       1 if text else 0) + body[6:]
+
+
+def _string(key, value):
+    return _node(key, (value + u"\0").encode("utf-16-le"), text=True)
+
+
+def version_info(version, strings=None, flags=0):
+    """Returns the data of a version resource.
+
+    :param tuple version: Four integers used as the file and product
+                          versions.
+    :param dict strings: (optional) The strings in ``StringFileInfo``. By
+                         default ``ProductName`` is ``"IronPython"``, and
+                         ``FileVersion`` and ``ProductVersion`` are
+                         ``version``.
+    :param int flags: (optional) ``dwFileFlags``.
+    """
+
+    if strings is None:
+        text = u"{}.{}.{}.{}".format(*version)
+        strings = {u"ProductName": u"IronPython", u"FileVersion": text,
+                   u"ProductVersion": text}
+    ms = (version[0] << 16) | version[1]
+    ls = (version[2] << 16) | version[3]
+    fixed = struct.pack("<13I", _SIGNATURE, 0x10000, ms, ls, ms, ls, 0x3F,
+                        flags, 4, 1, 0, 0, 0)
+    table = _node(u"040904b0", text=True, children=[
+        _string(k, v) for (k, v) in sorted(strings.items())])
+    translation = _node(u"Translation", struct.pack("<HH", 0x409, 0x4b0))
+    return _node(u"VS_VERSION_INFO", fixed, [
+        _node(u"StringFileInfo", children=[table], text=True),
+        _node(u"VarFileInfo", children=[translation], text=True)])
+
+
+def pe_file(resource, pe32plus=False):
+    """Returns a PE file containing the version resource.
+
+    :param bytes resource: The data returned by :func:`version_info`.
+    :param bool pe32plus: (optional) Whether to build a PE32+ (64-bit)
+                          file.
+    """
+
+    section_rva = 0x1000
+    # 種類 -> 名前 -> 言語 -> データの3段のディレクトリ
+    rsrc = struct.pack("<12xHH", 0, 1) + struct.pack("<II", 16, 0x80000018)
+    rsrc += struct.pack("<12xHH", 0, 1) + struct.pack("<II", 1, 0x80000030)
+    rsrc += struct.pack("<12xHH", 0, 1) + struct.pack("<II", 0x409, 0x48)
+    rsrc += struct.pack("<IIII", section_rva + 0x58, len(resource), 0, 0)
+    rsrc += resource
+
+    dos = b"MZ" + b"\0" * 58 + struct.pack("<I", 0x40)
+    optional_size = 240 if pe32plus else 224
+    coff = b"PE\0\0" + struct.pack("<HHIIIHH", 0x14c, 1, 0, 0, 0,
+                                   optional_size, 0x102)
+    directories = (b"\0" * 16 + struct.pack("<II", section_rva, len(rsrc)) +
+                   b"\0" * (13 * 8))
+    if pe32plus:
+        optional = struct.pack("<H", 0x20b) + b"\0" * 106
+    else:
+        optional = struct.pack("<H", 0x10b) + b"\0" * 90
+    optional += struct.pack("<I", 16) + directories
+    section = b".rsrc\0\0\0" + struct.pack("<IIII", len(rsrc), section_rva,
+                                            len(rsrc), 0x200) + b"\0" * 16
+    headers = dos + coff + optional + section
+    return headers + b"\0" * (0x200 - len(headers)) + rsrc
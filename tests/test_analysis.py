@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.analysis`.
+
+"""
+
+import imp
+import modulefinder
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from ironpycompiler import analysis
+
+
+class ModuleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        self.index_path = os.path.join(self.root, "index")
+        os.makedirs(os.path.join(self.lib, "pkg"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def find(self, name):
+        index = analysis.ModuleIndex(self.index_path)
+        try:
+            return index.find_module(name, [self.lib])
+        except ImportError:
+            return None
+        finally:
+            index.save()
+
+    def touch(self, path, mtime):
+        open(path, "w").close()
+        # 親ディレクトリの更新日時は変わらない
+        os.utime(os.path.dirname(path), (mtime, mtime))
+
+    def test_package_added_and_removed(self):
+        lib_mtime = os.stat(self.lib).st_mtime
+        self.assertIsNone(self.find("pkg"))
+        init = os.path.join(self.lib, "pkg", "__init__.py")
+        self.touch(init, 1000000000)
+        self.assertEqual(os.stat(self.lib).st_mtime, lib_mtime)
+        self.assertEqual(self.find("pkg")[2][2], imp.PKG_DIRECTORY)
+        os.remove(init)
+        os.utime(os.path.dirname(init), (1000000100, 1000000100))
+        self.assertIsNone(self.find("pkg"))
+
+    def test_compiled_init(self):
+        self.touch(os.path.join(self.lib, "pkg", "__init__.pyo"),
+                   1000000000)
+        self.assertIsNotNone(self.find("pkg"))
+
+
+class AnalysisResultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.script = os.path.join(self.root, "main.py")
+        self.module = os.path.join(self.root, "lib", "a.py")
+        os.mkdir(os.path.dirname(self.module))
+        for path in (self.script, self.module):
+            with open(path, "w") as f:
+                f.write("x = 1\n")
+        self.result = analysis.AnalysisResult(
+            [self.script], [os.path.dirname(self.module)], ["sys"],
+            [self.module], ["_missing"])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_json_round_trip(self):
+        path = os.path.join(self.root, "analysis.json")
+        self.result.save(path)
+        loaded = analysis.AnalysisResult.load(path)
+        self.assertEqual(loaded, self.result)
+        self.assertEqual(hash(loaded), hash(self.result))
+        self.assertTrue(loaded.is_current())
+        self.assertEqual(pickle.loads(pickle.dumps(self.result, 2)),
+                         self.result)
+        with open(path, "w") as f:
+            f.write("{}")
+        with self.assertRaises(ValueError):
+            analysis.AnalysisResult.load(path)
+
+    def test_stale(self):
+        self.assertTrue(self.result.is_current())
+        with open(self.module, "a") as f:
+            f.write("y = 2\n")
+        self.assertFalse(self.result.is_current())
+        refreshed = self.result.refreshed()
+        self.assertTrue(refreshed.is_current())
+        self.assertEqual(refreshed.compilable_modules,
+                         self.result.compilable_modules)
+        os.utime(self.script, (1000000000, 1000000000))
+        self.assertFalse(refreshed.is_current())
+        refreshed = refreshed.refreshed()
+        os.remove(self.module)
+        self.assertFalse(refreshed.is_current())
+        with self.assertRaises(AttributeError):
+            self.result.analyzer = "source"
+
+
+# 探索の順序に関わる、パッケージ、相対インポート、存在しない名前を含む
+_TREE = {
+    "main.py": ("import a\n"
+                "from pkg import sub, missing_name\n"
+                "from pkg.sub import *\n"
+                "import nothere\n"),
+    "lib/a.py": ("import pkg.helper\n"
+                 "try:\n"
+                 "    import missing2\n"
+                 "except ImportError:\n"
+                 "    pass\n"),
+    "lib/b.py": "import a, c\n",
+    "lib/c.py": "from pkg.deep import mod\n",
+    "lib/pkg/__init__.py": "from . import helper\nimport a\n",
+    "lib/pkg/helper.py": "from .sub import f\nimport b\n",
+    "lib/pkg/sub.py": ("import sys\n"
+                       "def f():\n"
+                       "    import b\n"
+                       "    from .deep import mod as m\n"),
+    "lib/pkg/deep/__init__.py": "",
+    "lib/pkg/deep/mod.py": "from .. import helper\n",
+}
+
+
+class DependencyFinderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        for (name, source) in _TREE.items():
+            path = os.path.join(self.root, *name.split("/"))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(source)
+        self.script = os.path.join(self.root, "main.py")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def result(self, mf):
+        mf.run_script(self.script)
+        modules = dict((name, m.__file__)
+                       for (name, m) in mf.modules.items())
+        return (modules, mf.badmodules)
+
+    def test_same_as_modulefinder(self):
+        expected = self.result(modulefinder.ModuleFinder([self.lib]))
+        self.assertIn("pkg.deep.mod", expected[0])
+        self.assertIn("nothere", expected[1])
+        for jobs in (1, 2):
+            mf = analysis.DependencyFinder([self.lib], jobs=jobs)
+            try:
+                self.assertEqual(self.result(mf), expected)
+            finally:
+                mf.close()
+
+    def test_relative_import_too_deep(self):
+        # ModuleFinderと同じく、残りのインポートを無視する
+        with open(os.path.join(self.lib, "pkg", "deep", "mod.py"), "w") as f:
+            f.write("from ... import top\nimport after\n")
+        mf = analysis.DependencyFinder([self.lib])
+        (modules, badmodules) = self.result(mf)
+        self.assertIn("pkg.deep.mod", modules)
+        self.assertIn("pkg.deep.mod", badmodules)
+        self.assertNotIn("after", badmodules)
+
+
+if __name__ == "__main__":
+    unittest.main()
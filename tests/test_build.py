@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.build`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ironpycompiler import build
+from ironpycompiler import compiler
+from ironpycompiler import exceptions
+
+BASE_DIR = os.path.abspath(os.sep + "project")
+
+
+def _targets(*specs):
+    """Returns the targets of a manifest from (name, depends) pairs.
+
+    """
+
+    return [{"name": name, "scripts": [name + ".py"], "depends": depends}
+            for (name, depends) in specs]
+
+
+class ParseManifestTest(unittest.TestCase):
+
+    def assertInvalid(self, data, message):
+        with self.assertRaises(exceptions.ManifestError) as cm:
+            build.parse_manifest(data, BASE_DIR)
+        self.assertIn(message, str(cm.exception))
+
+    def test_defaults_and_paths(self):
+        manifest = build.parse_manifest({"targets": [
+            {"name": "app", "scripts": ["a.py", "main.py"],
+             "main": "main.py", "out": "build/app.exe",
+             "target_asm": "exe"}]}, BASE_DIR)
+        self.assertEqual(manifest["jobs"], 1)
+        self.assertFalse(manifest["prune"])
+        (target,) = manifest["targets"]
+        self.assertEqual(target.scripts,
+                         [os.path.join(BASE_DIR, "main.py"),
+                          os.path.join(BASE_DIR, "a.py")])
+        self.assertEqual(target.options, {
+            "out": os.path.join(BASE_DIR, "build", "app.exe"),
+            "target_asm": "exe"})
+
+    def test_unknown_keys(self):
+        self.assertInvalid({"targets": [], "job": 2}, "unknown keys: job")
+        self.assertInvalid({"targets": [{"name": "a", "scripts": ["a.py"],
+                                         "target": "exe"}]},
+                           "unknown keys: target")
+
+    def test_duplicate_names(self):
+        self.assertInvalid({"targets": _targets(("a", []), ("a", []))},
+                           "declared twice")
+
+    def test_unknown_dependency(self):
+        self.assertInvalid({"targets": _targets(("a", ["b"]))},
+                           "unknown target 'b'")
+
+    def test_cycle(self):
+        self.assertInvalid(
+            {"targets": _targets(("a", ["c"]), ("b", ["a"]), ("c", ["b"]))},
+            "Circular dependency: a -> c -> b -> a")
+
+    def test_jobs(self):
+        for jobs in ("4", 0, -1, 1.5, True, None):
+            self.assertInvalid({"targets": [], "jobs": jobs},
+                               "'jobs' of the manifest")
+            self.assertInvalid({"targets": [], "analysis_jobs": jobs},
+                               "'analysis_jobs' of the manifest")
+        self.assertEqual(build.parse_manifest(
+            {"targets": [], "jobs": 4}, BASE_DIR)["jobs"], 4)
+
+    def test_lists(self):
+        for key in ("lib", "include", "exclude"):
+            self.assertInvalid({"targets": [], key: "a"}, key)
+        self.assertInvalid({"targets": [{"name": "a", "scripts": "a.py"}]},
+                           "'scripts' of target 'a'")
+        self.assertInvalid({"targets": [{"name": "a", "scripts": ["a.py"],
+                                         "depends": "b"}]},
+                           "'depends' of target 'a'")
+
+
+class SelectTest(unittest.TestCase):
+
+    def setUp(self):
+        manifest = build.parse_manifest({"targets": _targets(
+            ("app", ["core", "util"]), ("core", []), ("tool", ["util"]),
+            ("util", ["core"]))}, BASE_DIR)
+        self.builder = build.ManifestBuilder(manifest)
+
+    def names(self, targets):
+        return [t.name for t in targets]
+
+    def test_sort_targets(self):
+        self.assertEqual(
+            self.names(build._sort_targets(
+                self.builder.manifest["targets"])),
+            ["core", "util", "app", "tool"])
+
+    def test_select(self):
+        self.assertEqual(self.names(self.builder._select(None)),
+                         ["core", "util", "app", "tool"])
+        self.assertEqual(self.names(self.builder._select(["tool"])),
+                         ["core", "util", "tool"])
+        self.assertEqual(self.names(self.builder._select(["core"])),
+                         ["core"])
+        with self.assertRaises(exceptions.ManifestError):
+            self.builder._select(["missing"])
+
+
+class ManifestBuilderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        for name in ("core", "app", "other"):
+            open(os.path.join(self.root, name + ".py"), "w").close()
+        os.mkdir(os.path.join(self.root, "lib"))
+        self.create_asm = compiler.ModuleCompiler.create_asm
+        self.built = []
+
+        def create_asm(mc, out=None, **kwargs):
+            if mc.paths_to_scripts[0].endswith("core.py"):
+                raise exceptions.ModuleCompilationError("failed")
+            self.built.append(out)
+            mc.output_asm = out
+            mc.cache_hit = False
+
+        compiler.ModuleCompiler.create_asm = create_asm
+
+    def tearDown(self):
+        compiler.ModuleCompiler.create_asm = self.create_asm
+        shutil.rmtree(self.root)
+
+    def test_skip_after_failure(self):
+        targets = _targets(("core", []), ("app", ["core"]), ("other", []))
+        for target in targets:
+            target["out"] = "build/{}.dll".format(target["name"])
+        manifest = build.parse_manifest(
+            {"targets": targets, "ipy_dir": ".", "lib": ["lib"], "jobs": 2},
+            self.root)
+        finished = []
+        summaries = build.ManifestBuilder(
+            manifest, callback=finished.append).run()
+        status = dict((s["name"], s["status"]) for s in summaries)
+        self.assertEqual(status, {"core": "failed", "app": "skipped",
+                                  "other": "ok"})
+        self.assertEqual(self.built,
+                         [os.path.join(self.root, "build", "other.dll")])
+        self.assertEqual(sorted(s["name"] for s in finished),
+                         ["app", "core", "other"])
+
+
+if __name__ == "__main__":
+    unittest.main()
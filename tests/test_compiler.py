@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.compiler`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from ironpycompiler import compiler
+from ironpycompiler import process
+from ironpycompiler import transform
+
+
+class _Worker(object):
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class WorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.script = os.path.join(self.root, "main.py")
+        open(self.script, "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_set_worker(self):
+        mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root)
+        self.assertIsNone(mc.worker)
+        given = _Worker()
+        mc.worker = given
+        self.assertIs(mc.worker, given)
+        mc.worker = True
+        self.assertFalse(given.closed)
+        created = mc.worker
+        self.assertIsInstance(created, process.IronPythonWorker)
+        closed = []
+        created.close = lambda: closed.append(created)
+        # 作成したワーカーだけが、置き換えると停止する
+        mc.worker = given
+        self.assertEqual(closed, [created])
+        mc.close()
+        self.assertFalse(given.closed)
+
+    def test_busy_or_other_pyc(self):
+        mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root)
+        ran = []
+        lock = threading.Lock()
+
+        def run(where):
+            with lock:
+                ran.append(where)
+            time.sleep(0.2)
+            return ("", 0)
+
+        worker = _Worker()
+        worker.path_to_exe = os.path.join(self.root, "ipy.exe")
+        worker.pyc_path = mc.pyc_abspath
+        worker.compile = lambda *args: run("worker")
+        mc.worker = worker
+        execute_ipy = process.execute_ipy
+        process.execute_ipy = lambda **kwargs: run("process")
+        try:
+            compile_ = lambda: mc._execute_pyc([], True, "ipy.exe", None)
+            compile_()
+            self.assertEqual(ran, ["worker"])
+            # ワーカーがコンパイル中の間は、別のプロセスで並行してコンパイルする
+            del ran[:]
+            threads = [threading.Thread(target=compile_) for i in range(2)]
+            start = time.time()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertLess(time.time() - start, 0.35)
+            self.assertEqual(sorted(ran), ["process", "worker"])
+            # pyc.pyが変わったら、古いpyc.pyを実行するワーカーは使わない
+            del ran[:]
+            mc.pyc_abspath = os.path.join(self.root, "other", "pyc.py")
+            compile_()
+            self.assertEqual(ran, ["process"])
+        finally:
+            process.execute_ipy = execute_ipy
+
+
+class ReanalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        os.mkdir(self.lib)
+        self.script = self.write("main.py", "import a\n")
+        self.write("lib/a.py", "")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    def test_module_added(self):
+        mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root)
+        mc.check_compilability([self.lib])
+        compiled = []
+        mc._compile = lambda output_asm, pyc_args, inputs, *args, **kwargs: \
+            compiled.append(inputs) or (False, "")
+        b = self.write("lib/b.py", "")
+        self.write("main.py", "import a\nimport b\n")
+        os.utime(self.script, (1000000000, 1000000000))
+        self.assertFalse(mc.analysis.is_current())
+        mc.create_asm(out=os.path.join(self.root, "main.dll"))
+        self.assertIn(b, mc.compilable_modules)
+        self.assertNotIn("b", mc.uncompilable_modules)
+        self.assertIn(b, compiled[0])
+
+    def test_jobs(self):
+        # 並列に走査しても結果は変わらない
+        names = ["m{}".format(i) for i in range(8)]
+        self.write("main.py", "".join(
+            "import {}\n".format(n) for n in names) + "import missing\n")
+        for (i, name) in enumerate(names):
+            self.write("lib/{}.py".format(name),
+                       "import m{}\nimport a\n".format((i + 3) % 8))
+        results = []
+        for jobs in (1, 2):
+            mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root,
+                                         jobs=jobs)
+            results.append((mc.check_compilability([self.lib]),
+                            mc.compilable_modules))
+        self.assertEqual(len(results[0][1]), 9)
+        self.assertEqual(results[0], results[1])
+
+
+class CreateAsmTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        self.ipy_dir = os.path.join(self.root, "ipy")
+        os.mkdir(self.lib)
+        os.mkdir(self.ipy_dir)
+        names = ["m{}".format(i) for i in range(4)]
+        self.script = os.path.join(self.root, "main.py")
+        with open(self.script, "w") as f:
+            f.write("".join("import {}\n".format(n) for n in names))
+        for name in names:
+            with open(os.path.join(self.lib, name + ".py"), "w") as f:
+                f.write("x = 1\n")
+        with open(os.path.join(self.ipy_dir, "IronPython.dll"), "wb") as f:
+            f.write(b"dll")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_jobs_with_copy(self):
+        mc = compiler.ModuleCompiler([self.script], ipy_dir=self.ipy_dir)
+        mc.check_compilability([self.lib])
+        lock = threading.Lock()
+        running = [0, 0]  # 実行中の数と、その最大値
+
+        def compile_stub(output_asm, pyc_args, inputs, *args, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.2)
+            with lock:
+                running[0] -= 1
+            return (False, "")
+
+        mc._compile = compile_stub
+        out_dir = os.path.join(self.root, "out")
+        os.mkdir(out_dir)
+        mc.create_asm(out=os.path.join(out_dir, "main.dll"), shards=3,
+                      jobs=2, copy_ipydll=True)
+        self.assertEqual(running[1], 2)
+        self.assertEqual(mc.ipydll_stats["copied"] +
+                         mc.ipydll_stats["linked"], 1)
+        self.assertTrue(os.path.isfile(os.path.join(out_dir,
+                                                    "IronPython.dll")))
+
+
+class CompileSharedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        os.mkdir(self.lib)
+        self.modules = {}
+        for name in ("common", "only1", "only2", "external"):
+            self.modules[name] = self.write("lib/{}.py".format(name), "")
+        self.compiled = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    def project(self, name, imports):
+        script = self.write(name + ".py", "".join(
+            "import {}\n".format(i) for i in imports))
+        mc = compiler.ModuleCompiler([script], ipy_dir=self.root)
+        mc.check_compilability([self.lib])
+
+        def compile_stub(output_asm, pyc_args, inputs, *args, **kwargs):
+            main = [a[len("/main:"):] for a in pyc_args
+                    if a.startswith("/main:")]
+            prologue = None
+            if main:
+                with open(main[0]) as f:
+                    prologue = f.readline()
+            # 主スクリプトはプロローグを挿入したコピーになる
+            self.compiled[output_asm] = (
+                sorted(set(inputs) - set(main)), prologue)
+            with open(output_asm, "wb") as f:
+                f.write(b"asm")
+            return (False, "")
+
+        mc._compile = compile_stub
+        out_dir = os.path.join(self.root, name)
+        os.mkdir(out_dir)
+        return (mc, {"out": os.path.join(out_dir, name + ".exe"),
+                     "target_asm": "exe"})
+
+    def test_compile_shared(self):
+        m = self.modules
+        projects = [self.project("app1", ["common", "only1", "external"]),
+                    self.project("app2", ["common", "only2", "external"])]
+        external = os.path.join(self.root, "external.dll")
+        projects[0][1]["references"] = {external: [m["external"]]}
+        shared_out = os.path.join(self.root, "shared", "ipcshared.dll")
+        os.mkdir(os.path.dirname(shared_out))
+        shared = compiler.compile_shared(projects, shared_out)
+        self.assertEqual(shared, sorted([m["common"], m["external"]]))
+        self.assertEqual(self.compiled[shared_out][0], shared)
+        (mc1, mc2) = [mc for (mc, options) in projects]
+        self.assertEqual(self.compiled[mc1.output_asm][0], [m["only1"]])
+        self.assertEqual(self.compiled[mc2.output_asm][0], [m["only2"]])
+        self.assertEqual(mc1.required_asms, sorted([external, shared_out]))
+        self.assertEqual(mc2.required_asms, [shared_out])
+        self.assertEqual(self.compiled[mc1.output_asm][1],
+                         transform.reference_prologue(
+                             ["external", "ipcshared"]) + "; import common\n")
+        self.assertEqual(self.compiled[mc2.output_asm][1],
+                         transform.reference_prologue(["ipcshared"]) +
+                         "; import common\n")
+        for mc in (mc1, mc2):
+            self.assertTrue(os.path.isfile(os.path.join(
+                os.path.dirname(mc.output_asm), "ipcshared.dll")))
+        # 渡したオプションは変更されない
+        self.assertEqual(projects[0][1]["references"],
+                         {external: [m["external"]]})
+
+
+class CompileVariantsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        os.mkdir(self.lib)
+        self.script = os.path.join(self.root, "main.py")
+        with open(self.script, "w") as f:
+            f.write("import a\n")
+        open(os.path.join(self.lib, "a.py"), "w").close()
+        self.compile_output = compiler.ModuleCompiler._compile_output
+        self.compiled = []
+
+        def compile_output(mc, output_asm, *args, **kwargs):
+            self.compiled.append(output_asm)
+            time.sleep(0.1)
+            return (False, "")
+
+        compiler.ModuleCompiler._compile_output = compile_output
+
+    def tearDown(self):
+        compiler.ModuleCompiler._compile_output = self.compile_output
+        shutil.rmtree(self.root)
+
+    def test_shared_layer(self):
+        result = compiler.ModuleCompiler(
+            [self.script], ipy_dir=self.root).check_compilability(
+                [self.lib])
+        out_dir = os.path.join(self.root, "out")
+        os.mkdir(out_dir)
+        compilers = compiler.compile_variants(result, [
+            {"out": os.path.join(out_dir, "main.dll"), "layered": True},
+            {"out": os.path.join(out_dir, "main.exe"), "target_asm": "exe",
+             "layered": True}], ipy_dir=self.root)
+        layer = compilers[0].dependency_asm
+        self.assertEqual(compilers[1].dependency_asm, layer)
+        self.assertEqual(sorted(self.compiled), sorted([
+            layer, compilers[0].output_asm, compilers[1].output_asm]))
+
+
+class GatherIpydllTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.ipy_dir = os.path.join(self.root, "ipy")
+        self.dest_dir = os.path.join(self.root, "dest")
+        os.mkdir(self.ipy_dir)
+        for name in ("IronPython.dll", "IronPython.Modules.dll",
+                     "Microsoft.Scripting.dll"):
+            self.write(os.path.join(self.ipy_dir, name), name)
+        # 結果がファイルシステムによらないよう、reflinkを使わない
+        self.reflink = compiler._reflink
+        compiler._reflink = lambda src, dest: False
+
+    def tearDown(self):
+        compiler._reflink = self.reflink
+        shutil.rmtree(self.root)
+
+    def write(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def gather(self, **kwargs):
+        return compiler.gather_ipydll(self.dest_dir, self.ipy_dir, **kwargs)
+
+    def dest(self, name):
+        return os.path.join(self.dest_dir, name)
+
+    def test_copy_and_skip(self):
+        stats = self.gather(link=False)
+        size = sum(os.path.getsize(os.path.join(self.ipy_dir, n))
+                   for n in os.listdir(self.ipy_dir))
+        self.assertEqual(stats, {"copied": 3, "linked": 0, "skipped": 0,
+                                 "bytes_written": size, "missing": []})
+        self.assertFalse(os.path.samefile(
+            self.dest("IronPython.dll"),
+            os.path.join(self.ipy_dir, "IronPython.dll")))
+        stats = self.gather(link=False)
+        self.assertEqual((stats["copied"], stats["skipped"],
+                          stats["bytes_written"]), (0, 3, 0))
+        # 同じ大きさと更新日時でも、verify_hashでは内容を比べる
+        dest = self.dest("IronPython.dll")
+        st = os.stat(dest)
+        self.write(dest, "IronPythoX.dll")
+        os.utime(dest, (st.st_atime, st.st_mtime))
+        self.assertEqual(self.gather(link=False)["skipped"], 3)
+        stats = self.gather(link=False, verify_hash=True)
+        self.assertEqual((stats["copied"], stats["skipped"]), (1, 2))
+        self.assertEqual(self.read(dest), "IronPython.dll")
+
+    @unittest.skipUnless(hasattr(os, "link"), "requires os.link")
+    def test_link(self):
+        stats = self.gather()
+        self.assertEqual((stats["linked"], stats["bytes_written"]), (3, 0))
+        self.assertTrue(os.path.samefile(
+            self.dest("IronPython.dll"),
+            os.path.join(self.ipy_dir, "IronPython.dll")))
+        self.assertEqual(self.gather()["skipped"], 3)
+
+    @unittest.skipUnless(hasattr(os, "link"), "requires os.link")
+    def test_outdated_link_is_replaced(self):
+        # 古いファイルへのハードリンクを書き換えずに置き換える
+        other = os.path.join(self.root, "other.dll")
+        self.write(other, "old")
+        os.mkdir(self.dest_dir)
+        os.link(other, self.dest("IronPython.dll"))
+        for link in (True, False):
+            self.gather(link=link, allowlist=["IronPython.dll"])
+            self.assertEqual(self.read(self.dest("IronPython.dll")),
+                             "IronPython.dll")
+            self.assertEqual(self.read(other), "old")
+            os.remove(self.dest("IronPython.dll"))
+            os.link(other, self.dest("IronPython.dll"))
+
+    def test_allowlist(self):
+        stats = self.gather(link=False, allowlist=[
+            "ironpython.*.DLL", "Microsoft.Scripting.dll", "Missing*.dll"])
+        self.assertEqual(sorted(os.listdir(self.dest_dir)),
+                         ["IronPython.Modules.dll",
+                          "Microsoft.Scripting.dll"])
+        self.assertEqual(stats["copied"], 2)
+        self.assertEqual(stats["missing"], ["Missing*.dll"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.datatypes`.
+
+"""
+
+import pickle
+import unittest
+from distutils.version import StrictVersion
+
+from ironpycompiler import datatypes
+
+VERSIONS = ["2.6", "2.6.1", "2.7a1", "2.7b1", "2.7b2", "2.7", "2.7.0",
+            "2.7.5", "2.7.10", "3.0"]
+
+
+class HashableVersionTest(unittest.TestCase):
+
+    def test_same_as_strict_version(self):
+        for a in VERSIONS:
+            for b in VERSIONS:
+                expected = cmp(StrictVersion(a), StrictVersion(b))
+                (va, vb) = (datatypes.HashableVersion(a),
+                            datatypes.HashableVersion(b))
+                self.assertEqual(cmp(va, vb), expected, (a, b))
+                self.assertEqual(va == b, expected == 0, (a, b))
+                if expected == 0:
+                    self.assertEqual(hash(va), hash(vb))
+            self.assertEqual(str(datatypes.HashableVersion(a)),
+                             str(StrictVersion(a)))
+
+    def test_hash(self):
+        # 以前のStrictVersionの派生クラスと同じハッシュ値
+        self.assertEqual(hash(datatypes.HashableVersion("2.7.5")),
+                         hash((2, 7, 5)))
+        self.assertEqual(hash(datatypes.HashableVersion("2.7b1")),
+                         hash((2, 7, 0, "b", 1)))
+        versions = set(datatypes.HashableVersion(v) for v in VERSIONS)
+        self.assertEqual(len(versions), len(VERSIONS) - 1)
+
+    def test_other_types(self):
+        version = datatypes.HashableVersion("2.7")
+        self.assertNotEqual(version, (2, 7))
+        self.assertNotEqual(version, None)
+        with self.assertRaises(ValueError):
+            version == "2.7.x"
+        with self.assertRaises(ValueError):
+            datatypes.HashableVersion("2")
+
+    def test_pickle(self):
+        for v in VERSIONS:
+            version = datatypes.HashableVersion(v)
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                loaded = pickle.loads(pickle.dumps(version, protocol))
+                self.assertEqual(loaded, version)
+                self.assertEqual(loaded.prerelease, version.prerelease)
+                self.assertEqual(hash(loaded), hash(version))
+                self.assertEqual(str(loaded), str(version))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.detect`.
+
+The Windows registry is replaced with a fake ``_winreg`` module.
+"""
+
+import __builtin__
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+
+from ironpycompiler import cache
+from ironpycompiler import datatypes
+from ironpycompiler import detect
+from ironpycompiler import exceptions
+
+
+class _WindowsError(EnvironmentError):
+    pass
+
+
+def _fake_winreg(keys):
+    """Returns a fake ``_winreg`` module with the registry keys.
+
+    ``keys`` maps the paths of the keys to the dictionaries mapping the
+    versions to the install paths.
+    """
+
+    winreg = types.ModuleType("_winreg")
+    winreg.HKEY_LOCAL_MACHINE = "HKLM"
+
+    class Key(object):
+
+        def __init__(self, path, value=None):
+            self.path = path
+            self.value = value
+            self.closed = False
+
+        def Close(self):
+            self.closed = True
+
+    def OpenKey(parent, sub_key):
+        if isinstance(parent, Key):
+            (ver, name) = sub_key.split("\\")
+            return Key(sub_key, keys[parent.path][ver])
+        if sub_key not in keys:
+            raise _WindowsError(sub_key)
+        return Key(sub_key)
+
+    def EnumKey(key, index):
+        vers = sorted(keys[key.path])
+        if index >= len(vers):
+            raise _WindowsError(index)
+        return vers[index]
+
+    winreg.OpenKey = OpenKey
+    winreg.EnumKey = EnumKey
+    winreg.QueryValue = lambda key, name: key.value
+    return winreg
+
+
+class RegDirsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.has_windows_error = hasattr(__builtin__, "WindowsError")
+        if not self.has_windows_error:
+            __builtin__.WindowsError = _WindowsError
+        self.winreg = sys.modules.get("_winreg")
+
+    def tearDown(self):
+        if not self.has_windows_error:
+            del __builtin__.WindowsError
+        if self.winreg is None:
+            sys.modules.pop("_winreg", None)
+        else:
+            sys.modules["_winreg"] = self.winreg
+
+    def test_no_key(self):
+        sys.modules["_winreg"] = _fake_winreg({})
+        with self.assertRaises(exceptions.IronPythonDetectionError) as cm:
+            detect._reg_dirs(["SOFTWARE\\A", "SOFTWARE\\B"])
+        self.assertIn("registry key", str(cm.exception))
+
+    def test_second_key(self):
+        sys.modules["_winreg"] = _fake_winreg({"SOFTWARE\\B": {
+            "2.7": os.path.join("IronPython 2.7", "ipy.exe"),
+            "2.6": os.path.join("IronPython 2.6", "ipy.exe")}})
+        self.assertEqual(detect._reg_dirs(["SOFTWARE\\A", "SOFTWARE\\B"]),
+                         ["IronPython 2.6", "IronPython 2.7"])
+
+
+class ValidateDirsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.validate = detect.validate_pythonexe
+        self.validated = []
+        detect.validate_pythonexe = self.validate_stub
+
+    def tearDown(self):
+        detect.validate_pythonexe = self.validate
+        shutil.rmtree(self.root)
+
+    def validate_stub(self, path_to_exe, timeout=None):
+        self.validated.append(path_to_exe)
+        if "bad" in path_to_exe:
+            raise exceptions.IronPythonValidationError("invalid")
+        return datatypes.HashableVersion("2.7.5")
+
+    def make_dir(self, name):
+        path = os.path.join(self.root, name)
+        os.mkdir(path)
+        open(os.path.join(path, "ipy.exe"), "w").close()
+        return path
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "requires os.symlink")
+    def test_same_executable(self):
+        ipy = self.make_dir("ipy")
+        bad = self.make_dir("bad")
+        link = os.path.join(self.root, "link")
+        os.symlink(ipy, link)
+        # 末尾の区切り文字や相対的な要素があっても同じ実行ファイルとみなす
+        alias = os.path.join(ipy, os.pardir, "ipy") + os.sep
+        versions = detect._validate_dirs([ipy, link, alias, bad], "ipy.exe",
+                                         10)
+        self.assertEqual(sorted(self.validated), sorted(
+            os.path.normcase(os.path.realpath(os.path.join(d, "ipy.exe")))
+            for d in (ipy, bad)))
+        self.assertEqual(versions, {
+            ipy: datatypes.HashableVersion("2.7.5"),
+            link: datatypes.HashableVersion("2.7.5"),
+            alias: datatypes.HashableVersion("2.7.5"),
+            bad: None})
+
+
+class DetectionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = detect._detection_cache
+        self.cache_class = cache.DetectionCache
+        detect._detection_cache = None
+
+    def tearDown(self):
+        detect._detection_cache = self.saved
+        cache.DetectionCache = self.cache_class
+
+    def test_created_once(self):
+        created = []
+
+        class SlowCache(object):
+
+            def __init__(self):
+                time.sleep(0.05)
+                created.append(self)
+
+        cache.DetectionCache = SlowCache
+        caches = []
+        threads = [threading.Thread(
+            target=lambda: caches.append(detect.get_detection_cache()))
+            for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(created), 1)
+        self.assertEqual(caches, created * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.peinfo`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ironpycompiler import peinfo
+from tests import pefixture
+
+
+class PEInfoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def write_pe(self, name, version=(2, 7, 5, 0), strings=None, flags=0,
+                 pe32plus=False):
+        return self.write(name, pefixture.pe_file(
+            pefixture.version_info(version, strings, flags), pe32plus))
+
+    def test_read_version_info(self):
+        for pe32plus in (False, True):
+            info = peinfo.read_version_info(self.write_pe(
+                "ipy.exe", (2, 7, 12, 1000), pe32plus=pe32plus))
+            self.assertEqual(info.file_version, (2, 7, 12, 1000))
+            self.assertEqual(info.product_version, (2, 7, 12, 1000))
+            self.assertEqual(info.strings[u"ProductName"], u"IronPython")
+            self.assertEqual(info.strings[u"FileVersion"], u"2.7.12.1000")
+            self.assertFalse(info.is_prerelease())
+
+    def test_not_pe(self):
+        with self.assertRaises(ValueError):
+            peinfo.read_version_info(self.write("ipy.exe", b"#!" * 64))
+
+    def test_prerelease(self):
+        info = peinfo.read_version_info(self.write_pe("a.exe", flags=0x2))
+        self.assertTrue(info.is_prerelease())
+        for tag in (u"2.7 Beta 2", u"2.7.6rc1", u"2.7.6 RC 1", u"2.7.8a1"):
+            info = peinfo.read_version_info(self.write_pe("b.exe", strings={
+                u"ProductName": u"IronPython", u"ProductVersion": tag}))
+            self.assertTrue(info.is_prerelease(), tag)
+
+    def test_ironpython_version(self):
+        exe = self.write_pe("ipy.exe")
+        self.assertEqual(peinfo.ironpython_version(exe), "2.7.5")
+        self.write_pe("IronPython.dll", (2, 7, 4, 0))
+        self.assertIsNone(peinfo.ironpython_version(exe))
+        self.write_pe("IronPython.dll", strings={
+            u"ProductName": u"IronPython", u"FileVersion": u"2.7.5 Beta 1"})
+        self.assertIsNone(peinfo.ironpython_version(exe))
+        self.write_pe("IronPython.dll")
+        self.assertEqual(peinfo.ironpython_version(exe), "2.7.5")
+
+
+if __name__ == "__main__":
+    unittest.main()
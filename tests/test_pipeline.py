@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.pipeline`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from ironpycompiler import compiler
+from ironpycompiler import pipeline
+
+
+class PipelinedCompilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        self.out_dir = os.path.join(self.root, "out")
+        os.mkdir(self.lib)
+        os.mkdir(self.out_dir)
+        names = ["m{}".format(i) for i in range(5)]
+        self.script = os.path.join(self.root, "main.py")
+        with open(self.script, "w") as f:
+            f.write("".join("import {}\n".format(n) for n in names))
+        self.modules = []
+        for name in names:
+            path = os.path.join(self.lib, name + ".py")
+            with open(path, "w") as f:
+                f.write("x = 1\n")
+            self.modules.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def run_pipeline(self, jobs):
+        mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root)
+        lock = threading.Lock()
+        running = [0, 0]  # 実行中の数と、その最大値
+        compiled = {}
+
+        def execute_stub(*args, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.2)
+            with lock:
+                running[0] -= 1
+            return (None, "", 0)
+
+        def compile_stub(output_asm, pyc_args, inputs, *args, **kwargs):
+            compiled[output_asm] = inputs
+            return compiler.ModuleCompiler._compile(
+                mc, output_asm, pyc_args, inputs, *args, **kwargs)
+
+        mc._execute_pyc = execute_stub
+        mc._compile = compile_stub
+        pc = pipeline.PipelinedCompiler(
+            mc, dirs_of_modules=[self.lib], batch_size=2, jobs=jobs)
+        pc.run(out=os.path.join(self.out_dir, "main.dll"))
+        return (mc, pc, compiled, running[1])
+
+    def test_parts_and_references(self):
+        (mc, pc, compiled, max_running) = self.run_pipeline(2)
+        parts = pc.part_asms
+        self.assertEqual(len(parts), 2)
+        self.assertEqual(
+            sorted(m for p in parts for m in compiled[p]),
+            self.modules[:4])
+        for part in parts:
+            self.assertEqual(os.path.dirname(part), self.out_dir)
+            self.assertTrue(os.path.basename(part).startswith("ipcpart_"))
+        # 残りのモジュールはメインのアセンブリに入る
+        self.assertEqual(compiled[mc.output_asm],
+                         [self.script, self.modules[4]])
+        self.assertEqual(mc.required_asms, sorted(parts))
+        self.assertEqual(mc.compilable_modules, set(self.modules))
+        self.assertLessEqual(max_running, 2)
+
+    def test_jobs_shared_with_create_asm(self):
+        max_running = self.run_pipeline(1)[3]
+        self.assertEqual(max_running, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
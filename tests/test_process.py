@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.process`.
+
+``/bin/sh`` and CPython are used instead of the IronPython executable.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+
+from ironpycompiler import exceptions
+from ironpycompiler import process
+
+SH = "/bin/sh"
+
+
+@unittest.skipUnless(os.path.exists(SH), "requires /bin/sh")
+class ExecuteIpyTest(unittest.TestCase):
+
+    def test_output(self):
+        lines = []
+        (output, retcode) = process.execute_ipy(
+            SH, ["-c", "echo hi; exit 3"], callback=lines.append,
+            timeout=10)
+        self.assertEqual(output, "hi\n")
+        self.assertEqual(retcode, 3)
+        self.assertEqual(lines, ["hi\n"])
+
+    def test_timeout(self):
+        for _ in range(5):
+            with self.assertRaises(
+                    exceptions.IronPythonInterruptedError) as cm:
+                process.execute_ipy(SH, ["-c", "echo hi; sleep 5"],
+                                    timeout=0.3)
+            self.assertEqual(cm.exception.reason, "timeout")
+            self.assertEqual(cm.exception.output, "hi\n")
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        timer = threading.Timer(0.3, cancel.set)
+        timer.start()
+        start = time.time()
+        with self.assertRaises(exceptions.IronPythonInterruptedError) as cm:
+            process.execute_ipy(SH, ["-c", "sleep 5"], cancel=cancel)
+        self.assertEqual(cm.exception.reason, "cancelled")
+        self.assertLess(time.time() - start, 4)
+
+    def test_callback_error_kills_children(self):
+        pids = []
+
+        def callback(line):
+            pids.append(int(line))
+            raise ValueError(line)
+
+        started = time.time()
+        with self.assertRaises(ValueError):
+            process.execute_ipy(SH, ["-c", "sleep 3 & echo $!; wait"],
+                                callback=callback)
+        self.assertLess(time.time() - started, 2)
+        time.sleep(0.1)
+        self.assertFalse(_is_running(pids[0]))
+
+
+# pyc.pyの代わり。引数で動作を選ぶ。crashはワーカーのプロセスごと終了し、
+# markerはマーカーで始まるがJSONではない行を出力する
+_STANDIN_PYC = textwrap.dedent("""\
+    import os
+    import sys
+    import time
+    (action, flag) = sys.argv[1:3]
+    if action == "crash" or (action == "crash-once" and
+                             not os.path.exists(flag)):
+        open(flag, "a").close()
+        os._exit(3)
+    elif action == "hang":
+        time.sleep(60)
+    elif action == "fail":
+        sys.exit(2)
+    elif action == "marker":
+        sys.__stdout__.write("@@ipc not json\\n")
+        sys.__stdout__.flush()
+    print "compiled in", os.getcwd()
+    """)
+
+
+class IronPythonWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp(prefix="IPC"))
+        self.pyc_path = os.path.join(self.root, "pyc.py")
+        with open(self.pyc_path, "w") as f:
+            f.write(_STANDIN_PYC)
+        self.flag = os.path.join(self.root, "flag")
+        # ipyworker.pyはCPythonでも動く
+        self.worker = process.IronPythonWorker(sys.executable,
+                                               self.pyc_path, timeout=30)
+
+    def tearDown(self):
+        self.worker.close()
+        shutil.rmtree(self.root)
+
+    def compile(self, action, timeout=None):
+        return self.worker.compile([action, self.flag], cwd=self.root,
+                                   timeout=timeout)
+
+    def test_compile(self):
+        self.assertEqual(self.compile("ok"),
+                         ("compiled in {}\n".format(self.root), 0))
+        self.assertEqual(self.compile("fail"), ("", 2))
+        self.assertTrue(self.worker.ping())
+        self.assertEqual(self.worker.restarts, 0)
+
+    def test_marker_in_output(self):
+        (output, status) = self.compile("marker")
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "@@ipc not json\ncompiled in {}\n".format(
+            self.root))
+
+    def test_killed_during_job_is_retried_once(self):
+        self.compile("ok")
+        pid = self.worker._process.pid
+        (output, status) = self.compile("crash-once")
+        self.assertEqual(status, 0)
+        self.assertEqual(self.worker.restarts, 1)
+        self.assertNotEqual(self.worker._process.pid, pid)
+
+    def test_killed_twice(self):
+        with self.assertRaises(exceptions.IronPythonWorkerError):
+            self.compile("crash")
+        self.assertEqual(self.worker.restarts, 1)
+        self.assertFalse(self.worker.is_alive())
+        # 次のジョブで再起動する
+        self.assertEqual(self.compile("ok")[1], 0)
+        self.assertEqual(self.worker.restarts, 2)
+
+    def test_killed_by_another_process(self):
+        self.worker.start()
+        os.kill(self.worker._process.pid, 9)
+        self.worker._process.wait()
+        self.assertFalse(self.worker.ping())
+        self.assertEqual(self.compile("ok")[1], 0)
+        self.assertEqual(self.worker.restarts, 1)
+
+    def test_timeout(self):
+        with self.assertRaises(exceptions.IronPythonInterruptedError):
+            self.compile("hang", timeout=0.5)
+        self.assertFalse(self.worker.is_alive())
+        self.assertEqual(self.compile("ok")[1], 0)
+
+
+def _is_running(pid):
+    """Returns whether the process is running and not a zombie.
+
+    """
+
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except EnvironmentError:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.prune`.
+
+"""
+
+import ast
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+from ironpycompiler import analysis
+from ironpycompiler import prune
+
+
+class ImportPrunerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        os.mkdir(self.lib)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, source):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(source))
+        return path
+
+    def prune(self, script, modules):
+        result = analysis.AnalysisResult(
+            [script], [self.lib], ["sys"], modules, [])
+        (pruned, dropped) = prune.ImportPruner().prune(result)
+        return (pruned.compilable_modules, dropped)
+
+    def test_platform_guard(self):
+        script = self.write("main.py", """\
+            import sys
+            if sys.platform == "win32":
+                import winonly
+            else:
+                import other
+            """)
+        winonly = self.write("lib/winonly.py", "")
+        other = self.write("lib/other.py", "")
+        (kept, dropped) = self.prune(script, [winonly, other])
+        self.assertEqual(kept, frozenset([other]))
+        self.assertIn("false condition", dropped[winonly])
+
+    def test_constant_false_hint(self):
+        # xml/sax/__init__.pyと同じく、modulefinderへの指示を残す
+        script = self.write("main.py", "import sax\n")
+        package = self.write("lib/sax/__init__.py", """\
+            import sys
+            _false = 0
+            if _false:
+                import sax.expatreader
+            if 0:
+                import sax.other
+            mswindows = (sys.platform == "win32")
+            if mswindows:
+                import sax.winonly
+            """)
+        modules = [package] + [
+            self.write("lib/sax/{}.py".format(name), "")
+            for name in ("expatreader", "other", "winonly")]
+        (kept, dropped) = self.prune(script, modules)
+        self.assertEqual(kept, frozenset(modules[:3]))
+        self.assertEqual(list(dropped), [modules[3]])
+
+    def test_micro_version_guard(self):
+        script = self.write("main.py", """\
+            import sys
+            if sys.version_info >= (2, 7, 9):
+                import new
+            if sys.version_info[:3] >= (2, 7, 4):
+                import newer
+            if sys.version_info >= (3,):
+                import py3
+            """)
+        modules = [self.write("lib/{}.py".format(name), "")
+                   for name in ("new", "newer", "py3")]
+        (kept, dropped) = self.prune(script, modules)
+        self.assertEqual(kept, frozenset(modules[:2]))
+        result = analysis.AnalysisResult(
+            [script], [self.lib], ["sys"], modules, [])
+        (pruned, dropped) = prune.ImportPruner().prune(result, "2.7.5")
+        self.assertEqual(pruned.compilable_modules, frozenset([modules[1]]))
+
+
+class EvaluateTest(unittest.TestCase):
+
+    def evaluate(self, condition, environment=prune.IRONPYTHON):
+        return prune.evaluate(ast.parse(condition).body[0].value,
+                              environment)
+
+    def test_partial_version(self):
+        for (condition, expected) in [
+                ("sys.version_info >= (2, 7, 9)", None),
+                ("sys.version_info[:3] >= (2,7,4)", None),
+                ("sys.version_info[2] > 0", None),
+                ("(2, 7, 9) <= sys.version_info", None),
+                ("sys.version_info >= (2, 7)", True),
+                ("sys.version_info >= (2, 6, 5)", True),
+                ("sys.version_info < (3,)", True),
+                ("sys.version_info == (2, 7)", False),
+                ("sys.version_info[:2] == (2, 7)", True),
+                ("sys.version_info[0] == 2", True),
+                ("sys.version_info.micro >= 4", None)]:
+            self.assertEqual(self.evaluate(condition), expected, condition)
+
+    def test_full_version(self):
+        environment = prune.ironpython_environment("2.7.5")
+        self.assertEqual(environment["sys.version_info"],
+                         (2, 7, 5, "final", 0))
+        self.assertFalse(self.evaluate("sys.version_info >= (2, 7, 9)",
+                                       environment))
+        self.assertTrue(self.evaluate("sys.version_info.micro >= 4",
+                                      environment))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.transform`.
+
+"""
+
+import ast
+import codecs
+import os
+import shutil
+import tempfile
+import textwrap
+import types
+import unittest
+
+from ironpycompiler import transform
+
+PROLOGUE = transform.reference_prologue(["deps"])
+
+
+class InsertPrologueTest(unittest.TestCase):
+
+    def assertInserted(self, source, expected):
+        transformed = transform.insert_prologue(source, PROLOGUE)
+        self.assertEqual(transformed, expected.replace("P", PROLOGUE))
+        # 行番号は変わらない
+        self.assertEqual(transformed.count("\n"), source.count("\n"))
+        compile(transformed, "main.py", "exec")
+
+    def test_simple_statement(self):
+        self.assertInserted("import os\n", "P; import os\n")
+        self.assertInserted('"""Doc."""\nif 1:\n    pass\n',
+                            '"""Doc."""; P\nif 1:\n    pass\n')
+
+    def test_compound_statement(self):
+        self.assertInserted("# comment\nif 1:\n    pass\n",
+                            "P\nif 1:\n    pass\n")
+        self.assertInserted("#!/usr/bin/env python\ndef f():\n    pass\n",
+                            "P\ndef f():\n    pass\n")
+        self.assertInserted(
+            "#!/usr/bin/env python\n# -*- coding: utf-8 -*-\nif 1:\n    "
+            "pass\n", "P\n# -*- coding: utf-8 -*-\nif 1:\n    pass\n")
+
+    def test_encoding_declaration(self):
+        source = "# -*- coding: utf-8 -*-\nif 1:\n    s = '\xc3\xa9'\n"
+        self.assertInserted(source, codecs.BOM_UTF8 +
+                            "P\nif 1:\n    s = '\xc3\xa9'\n")
+        self.assertInserted(codecs.BOM_UTF8 + source, codecs.BOM_UTF8 +
+                            "P\nif 1:\n    s = '\xc3\xa9'\n")
+        self.assertInserted("# -*- coding: latin-1 -*-\nif 1:\n    pass\n",
+                            "P\nif 1:\n    pass\n")
+
+    def test_try_block(self):
+        self.assertInserted("try:\n    import json\nexcept ImportError:\n"
+                            "    json = None\n",
+                            "try:\n    P; import json\nexcept ImportError:\n"
+                            "    json = None\n")
+
+    def test_no_free_line(self):
+        transformed = transform.insert_prologue("if 1:\n    pass\n", PROLOGUE)
+        self.assertEqual(transformed, PROLOGUE + "\nif 1:\n    pass\n")
+
+
+def _first_lines(co):
+    """Returns the names and the first line numbers of the nested code
+    objects.
+
+    """
+
+    lines = []
+    for const in co.co_consts:
+        if isinstance(const, types.CodeType):
+            lines.append((const.co_name, const.co_firstlineno))
+            lines.extend(_first_lines(const))
+    return lines
+
+
+class MinifyTest(unittest.TestCase):
+
+    def assertMinified(self, source, removed):
+        minified = transform.minify(source)
+        self.assertEqual(minified.count("\n"), source.count("\n"))
+        # 取り除かれたブロックの関数以外は、同じ行から始まる。
+        # 元のソースのif __debug__:はコンパイルで消えうるので、構文木を使う
+        lines = _first_lines(compile(minified, "m.py", "exec"))
+        self.assertTrue(lines)
+        self.assertLessEqual(set(lines), set(
+            (node.name, node.lineno) for node in ast.walk(ast.parse(source))
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef))))
+        for text in removed:
+            self.assertIn(text, source)
+            self.assertNotIn(text, minified)
+        return minified
+
+    def test_docstrings(self):
+        minified = self.assertMinified(textwrap.dedent('''\
+            """Module.
+
+            More.
+            """
+            def f():
+                """Function."""
+                return 1
+            class C(object):
+                """Class.
+
+                """
+                def g(self):
+                    'Method.'
+                    return 2
+            def h(): "Same line."; return 3
+            "Not a docstring."; x = 1
+            '''), ["Module.", "Function.", "Class.", "Method.",
+                   "Same line."])
+        namespace = {}
+        exec minified in namespace
+        self.assertIsNone(namespace["f"].__doc__)
+        self.assertEqual(namespace["C"]().g(), 2)
+        self.assertEqual(namespace["h"](), 3)
+
+    def test_multiline_assert(self):
+        minified = self.assertMinified(textwrap.dedent("""\
+            def f(x):
+                assert (x >
+                        0), \\
+                    "positive"
+                return x
+            def g():
+                pass
+            """), ["positive"])
+        namespace = {}
+        exec minified in namespace
+        self.assertEqual(namespace["f"](-1), -1)
+
+    def test_debug_block(self):
+        minified = self.assertMinified(textwrap.dedent("""\
+            if __debug__:
+                def check():
+                    return "debug"
+            else:
+                def check():
+                    return "release"
+            def f():
+                return check()
+            """), ["debug"])
+        namespace = {}
+        exec minified in namespace
+        self.assertEqual(namespace["f"](), "release")
+
+    def test_assert_after_semicolon(self):
+        minified = self.assertMinified("x = [1,\n2]; assert x\n"
+                                       "def f():\n    return x\n",
+                                       ["assert"])
+        namespace = {}
+        exec minified in namespace
+        self.assertEqual(namespace["f"](), [1, 2])
+
+
+class StageMinifiedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.staging_dir = os.path.join(self.root, "staging")
+        self.path = os.path.join(self.root, "pkg", "m.py")
+        os.mkdir(os.path.dirname(self.path))
+        self.write('"""Doc."""\nx = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, source):
+        with open(self.path, "w") as f:
+            f.write(source)
+
+    def stage(self):
+        return transform.stage_minified(self.path, self.root,
+                                        self.staging_dir)
+
+    def test_reused_while_unchanged(self):
+        (dest, saved) = self.stage()
+        self.assertEqual(os.path.relpath(dest, self.staging_dir).split(
+            os.sep)[1:], ["pkg", "m.py"])
+        self.assertEqual(saved, len('"""Doc."""'))
+        mtime = int(os.stat(dest).st_mtime) - 100
+        os.utime(dest, (mtime, mtime))
+        self.assertEqual(self.stage(), (dest, saved))
+        self.assertEqual(os.stat(dest).st_mtime, mtime)
+
+        self.write('"""Longer doc."""\nx = 2\n')
+        self.assertEqual(self.stage(), (dest, len('"""Longer doc."""')))
+        self.assertNotEqual(os.stat(dest).st_mtime, mtime)
+        with open(dest) as f:
+            self.assertTrue(f.read().startswith("\nx = 2\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for :mod:`ironpycompiler.watch`.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ironpycompiler import compiler
+from ironpycompiler import watch
+
+
+class _Observer(object):
+
+    """Records the observed paths instead of observing them.
+
+    """
+
+    def __init__(self):
+        self.paths = frozenset()
+
+    def watch(self, paths):
+        self.paths = frozenset(paths)
+
+    def close(self):
+        pass
+
+
+class PollingObserverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.path = os.path.join(self.root, "a.py")
+        with open(self.path, "w") as f:
+            f.write("x = 1\n")
+        self.observer = watch.PollingObserver(0.01)
+        self.observer.watch([self.path, self.root])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def set_mtime(self, path, mtime):
+        os.utime(path, (mtime, mtime))
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.observer.wait(0.05), set())
+
+    def test_modified(self):
+        with open(self.path, "a") as f:
+            f.write("y = 2\n")
+        self.assertEqual(self.observer.wait(1), set([self.path]))
+        self.assertEqual(self.observer.wait(0.05), set())
+
+    def test_added_and_removed(self):
+        # 更新日時の分解能に関わらず、追加で変わるようにする
+        self.set_mtime(self.root, 1000000000)
+        self.observer = watch.PollingObserver(0.01)
+        self.observer.watch([self.path, self.root])
+        added = os.path.join(self.root, "b.py")
+        open(added, "w").close()
+        self.assertEqual(self.observer.wait(1), set([self.root]))
+        os.remove(self.path)
+        self.assertIn(self.path, self.observer.wait(1))
+
+    def test_kept_snapshot(self):
+        # 監視を続けるパスの変更は、watchを呼んでも失われない
+        with open(self.path, "a") as f:
+            f.write("y = 2\n")
+        self.observer.watch([self.path])
+        self.assertEqual(self.observer.wait(1), set([self.path]))
+
+
+class ProjectWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="IPC")
+        self.lib = os.path.join(self.root, "lib")
+        os.mkdir(self.lib)
+        self.script = self.write("main.py", "import a\n")
+        self.a = self.write("lib/a.py", "x = 1\n")
+        self.mc = compiler.ModuleCompiler([self.script], ipy_dir=self.root)
+        self.builds = []
+        self.mc.create_asm = lambda **kwargs: self.builds.append(
+            set(self.mc.compilable_modules))
+        self.observer = _Observer()
+        self.watcher = watch.ProjectWatcher(
+            self.mc, dirs_of_modules=[self.lib], observer=self.observer)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.root)
+
+    def write(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    def test_graph_changed(self):
+        self.watcher.build()
+        self.write("lib/a.py", "x = 2\n")
+        self.assertFalse(self.watcher._graph_changed([self.a]))
+        self.write("lib/a.py", "import os\nx = 2\n")
+        self.assertTrue(self.watcher._graph_changed([self.a]))
+        # ディレクトリは常に解析し直す
+        self.assertTrue(self.watcher._graph_changed([self.lib]))
+
+    def test_build(self):
+        result = self.watcher.build()
+        self.assertTrue(result["analyzed"])
+        self.assertIsNone(result["error"])
+        self.assertEqual(self.builds, [set([self.a])])
+        self.assertEqual(self.observer.paths, frozenset(
+            [self.script, self.a, self.root, self.lib]))
+
+        self.write("lib/a.py", "x = 2\n")
+        result = self.watcher.build([self.a])
+        self.assertFalse(result["analyzed"])
+        self.assertEqual(result["changed"], [self.a])
+        self.assertTrue(self.mc.analysis.is_current())
+
+        # インポートを追加すると、新しいモジュールも監視する
+        b = self.write("lib/b.py", "")
+        self.write("main.py", "import a\nimport b\n")
+        result = self.watcher.build([self.script, self.lib])
+        self.assertTrue(result["analyzed"])
+        self.assertEqual(self.builds[-1], set([self.a, b]))
+        self.assertIn(b, self.observer.paths)
+
+    def test_build_error(self):
+        self.write("main.py", "import a\nif\n")
+        result = self.watcher.build()
+        self.assertIsInstance(result["error"], SyntaxError)
+        self.assertEqual(self.builds, [])
+        # 修正を検出できるよう、スクリプトを監視する
+        self.assertIn(self.script, self.observer.paths)
+
+
+if __name__ == "__main__":
+    unittest.main()